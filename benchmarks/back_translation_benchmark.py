@@ -0,0 +1,160 @@
+"""
+Бенчмарк back-translation: по одному тексту (BackTranslationAugmenter.augment в цикле,
+как раньше делал пайплайн) против augment_many с батчами по длине под бюджет токенов.
+С --max-segment-tokens дополнительно замеряется augment_many с делением длинных текстов
+на группы предложений под этот бюджет (без него тексты переводятся целиком).
+
+По умолчанию модели — маленькие Marian со случайными весами и SentencePiece-словарём,
+обученным на синтетическом корпусе (без загрузки из Hub): абсолютные числа не похожи
+на настоящие, но выигрыш от батчей виден. Случайная модель не выдаёт </s> и генерирует
+до max_length, поэтому длина её «перевода» фиксируется равной длине входа, как у настоящего
+перевода. С --pretrained берутся модели Helsinki-NLP.
+
+    poetry run python benchmarks/back_translation_benchmark.py --texts 64
+    poetry run python benchmarks/back_translation_benchmark.py --pretrained --texts 32 --max-length 512
+    poetry run python benchmarks/back_translation_benchmark.py --min-words 150 --max-words 300 \\
+        --max-length 512 --max-segment-tokens 128
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sentencepiece as spm  # noqa: E402
+import torch  # noqa: E402
+from transformers import MarianConfig, MarianMTModel, MarianTokenizer  # noqa: E402
+
+from src.data_augmentation.bt_augmenter import BackTranslationAugmenter  # noqa: E402
+
+SYLLABLES = ["ка", "ро", "ми", "на", "те", "ло", "ву", "пе", "ри", "ст", "да", "ны", "ко", "ле", "би", "зо"]
+
+
+def synthetic_texts(count: int, min_words: int, max_words: int, seed: int = 0) -> list:
+    """Тексты из псевдослов переменной длины."""
+    rnd = random.Random(seed)
+    words = ["".join(rnd.choices(SYLLABLES, k=rnd.randint(1, 4))) for _ in range(300)]
+    return [
+        " ".join(rnd.choices(words, k=rnd.randint(min_words, max_words))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def build_random_marian(path: str, corpus: list, vocab_size: int, d_model: int, layers: int, seed: int) -> None:
+    """Сохраняет в path случайную Marian-модель и MarianTokenizer с SentencePiece-словарём."""
+    os.makedirs(path, exist_ok=True)
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(corpus), model_prefix=os.path.join(path, "spm"),
+        vocab_size=vocab_size, character_coverage=1.0, hard_vocab_limit=False, minloglevel=2,
+    )
+    processor = spm.SentencePieceProcessor(model_file=os.path.join(path, "spm.model"))
+    vocab = {processor.id_to_piece(i): i for i in range(processor.get_piece_size())}
+    vocab["<pad>"] = len(vocab)
+    with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    spm_path = os.path.join(path, "spm.model")
+    MarianTokenizer(spm_path, spm_path, os.path.join(path, "vocab.json")).save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = MarianConfig(
+        vocab_size=len(vocab), d_model=d_model,
+        encoder_layers=layers, decoder_layers=layers, encoder_attention_heads=4, decoder_attention_heads=4,
+        encoder_ffn_dim=d_model * 4, decoder_ffn_dim=d_model * 4, max_position_embeddings=512,
+        pad_token_id=vocab["<pad>"], eos_token_id=vocab["</s>"], decoder_start_token_id=vocab["<pad>"],
+    )
+    MarianMTModel(config).save_pretrained(path)
+
+
+def same_length_output(model) -> None:
+    """Генерация случайной модели ровно на столько токенов, сколько во входе (с padding)."""
+    generate = model.generate
+
+    def wrapped(input_ids, attention_mask, **kwargs):
+        width = min(input_ids.shape[1], model.config.max_position_embeddings - 1)
+        kwargs.update(max_length=None, min_new_tokens=width, max_new_tokens=width)
+        return generate(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+    model.generate = wrapped
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back-translation throughput benchmark")
+    parser.add_argument("--texts", type=int, default=48)
+    parser.add_argument("--min-words", type=int, default=5)
+    parser.add_argument("--max-words", type=int, default=80)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--beams", type=int, default=5)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--max-batch-tokens", type=int, default=4096)
+    parser.add_argument("--max-segment-tokens", type=int, default=0, help="Бюджет сегмента (0 — без деления)")
+    parser.add_argument("--pretrained", action="store_true", help="Модели Helsinki-NLP из Hub вместо случайных")
+    parser.add_argument("--d-model", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--output", type=str, help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts, args.min_words, args.max_words)
+    with tempfile.TemporaryDirectory() as models_dir:
+        template = "Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
+        if not args.pretrained:
+            corpus = synthetic_texts(2000, 3, 30, seed=1)
+            for i, pair in enumerate(("ru-en", "en-ru")):
+                build_random_marian(os.path.join(models_dir, pair), corpus, 800, args.d_model, args.layers, seed=i)
+            template = os.path.join(models_dir, "{src_lang}-{tgt_lang}")
+
+        augmenter = BackTranslationAugmenter(
+            rounds=args.rounds, model_name_template=template, device="cpu", beam_size=args.beams,
+            max_length=args.max_length, max_batch_tokens=args.max_batch_tokens, max_segment_tokens=0,
+        )
+        if not args.pretrained:
+            same_length_output(augmenter._model_src2mid)
+            same_length_output(augmenter._model_mid2src)
+        augmenter.augment(texts[0])  # прогрев
+
+        per_sample = timed(lambda: [augmenter.augment(t) for t in texts])
+        batched = timed(lambda: augmenter.augment_many(texts))
+        segmented = None
+        if args.max_segment_tokens:
+            augmenter.max_segment_tokens = args.max_segment_tokens
+            segmented = timed(lambda: augmenter.augment_many(texts))
+            augmenter.max_segment_tokens = 0
+
+    lengths = [len(ids) for ids in augmenter._tokenizer_src2mid(texts)["input_ids"]]
+    results = {
+        "texts": len(texts),
+        "rounds": args.rounds,
+        "beams": args.beams,
+        "batches": len(augmenter.length_batches(lengths)),
+        "per_sample_texts_per_sec": round(len(texts) / per_sample, 2),
+        "batched_texts_per_sec": round(len(texts) / batched, 2),
+        "speedup": round(per_sample / batched, 2),
+        "max_tokens": max(lengths),
+    }
+    print(
+        f"per-sample: {results['per_sample_texts_per_sec']:8.2f} texts/sec\n"
+        f"   batched: {results['batched_texts_per_sec']:8.2f} texts/sec "
+        f"(x{results['speedup']}, {results['batches']} batches)"
+    )
+    if segmented is not None:
+        results["segmented_texts_per_sec"] = round(len(texts) / segmented, 2)
+        results["segmented_speedup"] = round(batched / segmented, 2)
+        print(
+            f" segmented: {results['segmented_texts_per_sec']:8.2f} texts/sec "
+            f"(x{results['segmented_speedup']} к batched, сегменты до {args.max_segment_tokens} токенов)"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Бенчмарк CPU-профиля обучения: samples/sec с настройками Trainer по умолчанию
+и с training_profile: cpu на синтетическом датасете.
+
+Модель — маленький BERT со случайными весами (без загрузки из Hub), примеры —
+случайные ID переменной длины, батчи собираются тем же PaddingCollator, что и в fine_tune_model.
+Каждый профиль запускается в отдельном процессе: число потоков torch задаётся на процесс.
+
+    poetry run python benchmarks/cpu_training_benchmark.py --steps 30
+    poetry run python benchmarks/cpu_training_benchmark.py --profile cpu --compile --grad-accum 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+from torch.utils.data import Dataset  # noqa: E402
+from transformers import (  # noqa: E402
+    BertConfig,
+    BertForSequenceClassification,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments,
+)
+
+from src.batching import PaddingCollator  # noqa: E402
+from src.cpu_profile import apply_cpu_profile  # noqa: E402
+from src.utils.config_model import CpuProfileConfig  # noqa: E402
+
+
+class SyntheticDataset(Dataset):
+    """Случайные примеры длиной от min_length до max_length токенов."""
+
+    def __init__(self, size: int, vocab_size: int, min_length: int, max_length: int, num_labels: int, seed: int = 0):
+        generator = torch.Generator().manual_seed(seed)
+        lengths = torch.randint(min_length, max_length + 1, (size,), generator=generator)
+        self.items = [
+            {
+                "input_ids": torch.randint(5, vocab_size, (int(n),), generator=generator),
+                "labels": torch.randint(0, num_labels, (), generator=generator),
+            }
+            for n in lengths
+        ]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, idx):
+        return self.items[idx]
+
+
+class StepTimer(TrainerCallback):
+    """Время окончания каждого шага оптимизатора."""
+
+    def __init__(self, timings: list):
+        self.timings = timings
+
+    def on_step_end(self, *args, **kwargs):
+        self.timings.append(time.perf_counter())
+
+
+def run_profile(args: argparse.Namespace) -> dict:
+    """Обучает args.steps шагов в текущем процессе и возвращает замеры."""
+    torch.manual_seed(0)
+    profile_args = {"use_cpu": True}
+    if args.profile == "cpu":
+        profile_args = apply_cpu_profile(CpuProfileConfig(
+            num_threads=args.threads,
+            compile=args.compile,
+            gradient_accumulation_steps=args.grad_accum,
+            dataloader_workers=args.workers,
+        ))
+
+    config = BertConfig(
+        vocab_size=args.vocab_size,
+        hidden_size=args.hidden_size,
+        num_hidden_layers=args.layers,
+        num_attention_heads=args.hidden_size // 64,
+        intermediate_size=args.hidden_size * 4,
+        max_position_embeddings=args.max_length,
+        num_labels=4,
+    )
+    model = BertForSequenceClassification(config)
+    samples_per_step = args.batch_size * profile_args.get("gradient_accumulation_steps", 1)
+    dataset = SyntheticDataset(
+        (args.steps + args.warmup) * samples_per_step, args.vocab_size, 16, args.max_length, num_labels=4
+    )
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        training_args = TrainingArguments(
+            output_dir=output_dir,
+            per_device_train_batch_size=args.batch_size,
+            max_steps=args.warmup + args.steps,
+            learning_rate=3e-5,
+            save_strategy="no",
+            report_to=[],
+            logging_strategy="no",
+            disable_tqdm=True,
+            **profile_args,
+        )
+        trainer = Trainer(
+            model=model,
+            args=training_args,
+            train_dataset=dataset,
+            data_collator=PaddingCollator(),
+        )
+
+        timings = []
+        trainer.add_callback(StepTimer(timings))
+        trainer.train()
+
+    # первые warmup шагов (в том числе компиляция) не учитываются
+    steps = len(timings) - args.warmup
+    elapsed = timings[-1] - timings[args.warmup - 1]
+    return {
+        "profile": args.profile,
+        "threads": torch.get_num_threads(),
+        "bf16": bool(profile_args.get("bf16")),
+        "compile": bool(profile_args.get("torch_compile")),
+        "samples_per_step": samples_per_step,
+        "steps": steps,
+        "samples_per_sec": round(steps * samples_per_step / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU training profile benchmark")
+    parser.add_argument("--profile", choices=["default", "cpu", "both"], default="both")
+    parser.add_argument("--steps", type=int, default=20, help="Замеряемых шагов оптимизатора")
+    parser.add_argument("--warmup", type=int, default=3, help="Шагов прогрева (не замеряются)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--vocab-size", type=int, default=30000)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op потоки CPU-профиля")
+    parser.add_argument("--grad-accum", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--output", type=str, help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+    args.warmup = max(args.warmup, 1)
+
+    if args.profile != "both":
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = []
+    for profile in ("default", "cpu"):
+        argv = [a for a in sys.argv[1:] if not a.startswith("--output") and a != args.output]
+        command = [sys.executable, os.path.abspath(__file__), *argv, "--profile", profile]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    baseline = results[0]["samples_per_sec"]
+    for result in results:
+        result["speedup"] = round(result["samples_per_sec"] / baseline, 2)
+        print(
+            f"{result['profile']:>8}: {result['samples_per_sec']:8.2f} samples/sec "
+            f"(x{result['speedup']}, threads={result['threads']}, bf16={result['bf16']}, compile={result['compile']})"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
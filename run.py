@@ -1,13 +1,28 @@
 import argparse
+import os
 import subprocess
+from src.binary_dataset import binary_path, convert_json_to_binary
+from src.dataset_saver import DatasetSaver
+from src.dataset_splitter import DatasetSplitter
+from src.processing.near_duplicates import NearDuplicateFilter
+from src.utils.dataset_io import iter_records
 from src.utils.config_loader import ConfigLoader
 from src.utils.logger_loader import LoggerLoader
+from src.utils.model_registry import get_registry
 from src.youtube_dataset_builder import YouTubeDatasetBuilder
 from src.fine_tune import fine_tune_model
+from src.sweep import run_sweep
 from src.data_augmentation.augmenter_pipeline import DataAugmentationPipeline
 
 logger = LoggerLoader().get_logger()
 
+def near_duplicate_filter(cfg):
+    return NearDuplicateFilter(
+        threshold=cfg.dedup.threshold,
+        num_perm=cfg.dedup.num_perm,
+        shingle_size=cfg.dedup.shingle_size
+    )
+
 def run_eda():
     logger.info("Launching EDA notebook...")
     subprocess.run(["jupyter", "notebook", "notebooks/eda.ipynb"], check=True)
@@ -23,7 +38,7 @@ def main():
     parser.add_argument(
         "--task",
         type=str,
-        choices=["scrape", "eda", "train", "augment"],
+        choices=["scrape", "eda", "train", "augment", "binarize", "split", "dedup", "sweep"],
         required=True,
         help="Choose task to run"
     )
@@ -32,12 +47,18 @@ def main():
     parser.add_argument(
         "--override_input",
         type=str,
-        help="(Optional) Переопределить путь к входному JSON для аугментации"
+        help="(Optional) Переопределить путь к входному JSON для аугментации, разбиения или дедупликации"
     )
     parser.add_argument(
         "--override_output",
         type=str,
-        help="(Optional) Переопределить путь к выходному JSON для аугментации"
+        help="(Optional) Переопределить путь к выходному JSON для аугментации или дедупликации"
+    )
+
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="(Optional) Перескачать субтитры даже для видео, уже учтённых в манифесте"
     )
 
     args = parser.parse_args()
@@ -46,10 +67,13 @@ def main():
     cfg = ConfigLoader(args.config).get_config()
     logger.info(f"Loaded config from {args.config}")
     logger.info(f"Using model: {cfg.model_name}")
+    get_registry().max_bytes = cfg.registry.max_bytes
 
     if args.task == "scrape":
         logger.info("Running data scraper...")
-        builder = YouTubeDatasetBuilder(args.config)
+        if args.refresh:
+            cfg.scraping.refresh = True
+        builder = YouTubeDatasetBuilder(cfg)
         builder.build_dataset()
 
     elif args.task == "eda":
@@ -57,7 +81,36 @@ def main():
 
     elif args.task == "train":
         logger.info("Starting fine-tuning...")
-        fine_tune_model(args.config, cfg.model_name)
+        fine_tune_model(cfg, cfg.model_name)
+
+    elif args.task == "sweep":
+        logger.info("Starting hyperparameter sweep...")
+        run_sweep(cfg)
+
+    elif args.task == "split":
+        input_path = args.override_input or os.path.join(cfg.output_dir, "dataset.json")
+        logger.info(f"Splitting {input_path} into train/val by video...")
+        splitter = DatasetSplitter(
+            val_fraction=cfg.dataset.val_fraction,
+            seed=cfg.dataset.split_seed,
+            max_shard_bytes=cfg.dataset.max_shard_bytes
+        )
+        splitter.split(input_path, cfg.train_data_path, cfg.val_data_path)
+
+    elif args.task == "dedup":
+        input_path = args.override_input or os.path.join(cfg.output_dir, "dataset.json")
+        output_path = args.override_output or input_path
+        logger.info(f"Removing near-duplicates from {input_path}...")
+        dedup = near_duplicate_filter(cfg)
+        saver = DatasetSaver(output_path, max_shard_bytes=cfg.dataset.max_shard_bytes)
+        saver.save(dedup.filter(iter_records(input_path)))
+        logger.info(f"Near-duplicates dropped: {dedup.duplicates} of {dedup.seen}")
+
+    elif args.task == "binarize":
+        logger.info("Converting train/val JSON to the memory-mapped binary format...")
+        tokenizer = get_registry().tokenizer(cfg.model_name)
+        for json_path in (cfg.train_data_path, cfg.val_data_path):
+            convert_json_to_binary(json_path, binary_path(json_path), tokenizer, cfg.categories)
 
     elif args.task == "augment":
         logger.info("Starting data augmentation (back-translation)…")
@@ -77,12 +130,26 @@ def main():
             output_json=output_path,
             min_examples=min_examples,
             bt_rounds=bt_rounds,
-            bt_beam_size=bt_beam_size
+            bt_beam_size=bt_beam_size,
+            max_shard_bytes=cfg.dataset.max_shard_bytes,
+            dedup=near_duplicate_filter(cfg) if cfg.dedup.enabled else None,
+            bt_batch_samples=aug_cfg.bt_batch_samples,
+            bt_max_batch_tokens=aug_cfg.bt_max_batch_tokens,
+            bt_max_segment_tokens=aug_cfg.bt_max_segment_tokens,
+            plan=aug_cfg.plan,
+            bt_oversample=aug_cfg.bt_oversample,
+            cache_path=aug_cfg.cache_path,
+            resume=aug_cfg.resume,
+            workers=aug_cfg.workers,
+            threads_per_worker=aug_cfg.threads_per_worker
         )
         pipeline.run()
 
     else:
         logger.error("Unknown task")
 
+    for key, stats in get_registry().stats().items():
+        logger.info(f"Model registry {key}: {stats}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,190 @@
+import math
+import random
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+
+class PaddingCollator:
+    """
+    Динамический padding: батч дополняется до длины самого длинного примера в нём,
+    а не до max_length модели.
+
+    Батч собирается без цикла по примерам: все ID склеиваются одним torch.cat
+    и раскладываются в заранее выделенный тензор [batch, max_len] по маске.
+    Коллатор копит статистику реальных и padding-токенов (padding_waste).
+    """
+
+    def __init__(
+        self,
+        pad_token_id: int = 0,
+        padding_side: str = "right",
+        pad_to_multiple_of: Optional[int] = None,
+        return_token_type_ids: bool = False,
+        max_length: Optional[int] = None,
+    ):
+        """
+        :param pad_token_id: ID padding-токена.
+        :param padding_side: с какой стороны дополнять ("right" или "left").
+        :param pad_to_multiple_of: округлять длину батча вверх до кратной (удобно для тензорных ядер).
+        :param return_token_type_ids: добавлять нулевые token_type_ids (для BERT-подобных моделей).
+        :param max_length: длина, до которой дополнялись бы примеры без динамического padding
+                           (только для сравнения в статистике).
+        """
+        if padding_side not in ("right", "left"):
+            raise ValueError("padding_side должен быть 'right' или 'left'")
+        self.pad_token_id = pad_token_id
+        self.padding_side = padding_side
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.return_token_type_ids = return_token_type_ids
+        self.max_length = max_length
+        self.reset_stats()
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer: Any, **kwargs: Any) -> "PaddingCollator":
+        """Коллатор с pad-токеном, стороной padding и входами модели из токенизатора."""
+        return cls(
+            pad_token_id=getattr(tokenizer, "pad_token_id", None) or 0,
+            padding_side=getattr(tokenizer, "padding_side", "right"),
+            return_token_type_ids="token_type_ids" in getattr(tokenizer, "model_input_names", ()),
+            **kwargs,
+        )
+
+    def reset_stats(self) -> None:
+        self.batches = 0
+        self.examples = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.fixed_tokens = 0
+
+    @property
+    def padding_waste(self) -> float:
+        """Доля padding-токенов во всех собранных батчах."""
+        return 1 - self.real_tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Статистика padding с начала работы (или последнего reset_stats)."""
+        stats = {
+            "batches": self.batches,
+            "real_tokens": self.real_tokens,
+            "padded_tokens": self.padded_tokens,
+            "padding_waste": round(self.padding_waste, 4),
+        }
+        if self.fixed_tokens:
+            stats["fixed_padding_waste"] = round(1 - self.real_tokens / self.fixed_tokens, 4)
+        return stats
+
+    def __call__(self, batch: Sequence[Dict[str, Any]]) -> Dict[str, torch.Tensor]:
+        """
+        :param batch: примеры {"input_ids": 1D-тензор без padding, "labels": метка}.
+        :return: {"input_ids", "attention_mask"[, "token_type_ids"], "labels"} размера [batch, max_len].
+        """
+        ids = [torch.as_tensor(item["input_ids"], dtype=torch.long) for item in batch]
+        lengths = torch.tensor([len(x) for x in ids], dtype=torch.long)
+        width = int(lengths.max()) if len(ids) else 0
+        if self.pad_to_multiple_of:
+            width = math.ceil(width / self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        positions = torch.arange(width).unsqueeze(0)
+        if self.padding_side == "right":
+            mask = positions < lengths.unsqueeze(1)
+        else:
+            mask = positions >= (width - lengths).unsqueeze(1)
+
+        input_ids = torch.full((len(ids), width), self.pad_token_id, dtype=torch.long)
+        # построчный порядок маски совпадает с порядком склеенных ID
+        input_ids[mask] = torch.cat(ids) if ids else torch.empty(0, dtype=torch.long)
+
+        result = {"input_ids": input_ids, "attention_mask": mask.long()}
+        if self.return_token_type_ids:
+            result["token_type_ids"] = torch.zeros_like(input_ids)
+        result["labels"] = torch.tensor([int(item["labels"]) for item in batch], dtype=torch.long)
+
+        self.batches += 1
+        self.examples += len(ids)
+        self.real_tokens += int(lengths.sum())
+        self.padded_tokens += input_ids.numel()
+        if self.max_length:
+            self.fixed_tokens += len(ids) * self.max_length
+        return result
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Сэмплер, группирующий в батч примеры близкой длины.
+
+    Индексы перемешиваются, режутся на корзины по batch_size * bucket_size_multiplier,
+    внутри корзины сортируются по длине и нарезаются на батчи; порядок батчей снова
+    перемешивается. Выдаёт индексы подряд, поэтому подходит DataLoader с тем же batch_size.
+    Перемешивание детерминировано по seed и номеру эпохи (set_epoch).
+    """
+
+    def __init__(
+        self,
+        lengths: Sequence[int],
+        batch_size: int,
+        bucket_size_multiplier: int = 50,
+        shuffle: bool = True,
+        seed: int = 0,
+    ):
+        """
+        :param lengths: длина каждого примера в токенах.
+        :param batch_size: размер батча DataLoader.
+        :param bucket_size_multiplier: размер корзины в батчах (больше — плотнее группировка, меньше случайности).
+        :param shuffle: перемешивать корзины и батчи (False — просто сортировка по длине).
+        :param seed: базовое зерно перемешивания.
+        """
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.bucket_size = batch_size * bucket_size_multiplier
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self._epoch_set = False
+
+    @classmethod
+    def from_dataset(cls, dataset: Any, batch_size: int, **kwargs: Any) -> "LengthBucketSampler":
+        """Сэмплер по датасету: длины берутся из dataset.lengths или из самих примеров."""
+        lengths = getattr(dataset, "lengths", None)
+        if lengths is None:
+            lengths = [len(dataset[i]["input_ids"]) for i in range(len(dataset))]
+        return cls(lengths, batch_size, **kwargs)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+        self._epoch_set = True
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def batches(self) -> List[List[int]]:
+        """Батчи индексов текущей эпохи."""
+        rng = random.Random(self.seed + self.epoch)
+        order = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(order)
+
+        grouped: List[int] = []
+        for start in range(0, len(order), self.bucket_size):
+            grouped.extend(sorted(order[start:start + self.bucket_size], key=lambda i: -self.lengths[i]))
+        # батчи режутся по общей последовательности: неполным может быть только последний,
+        # и границы батчей совпадают с теми, что нарежет DataLoader
+        batches = [grouped[i:i + self.batch_size] for i in range(0, len(grouped), self.batch_size)]
+
+        if self.shuffle and batches:
+            tail = batches.pop() if len(batches[-1]) < self.batch_size else None
+            rng.shuffle(batches)
+            if tail is not None:
+                batches.append(tail)
+        return batches
+
+    def __iter__(self) -> Iterator[int]:
+        batches = self.batches()
+        if not self._epoch_set:
+            # без set_epoch следующая итерация всё равно перемешивается по-новому
+            self.epoch += 1
+        self._epoch_set = False
+        for batch in batches:
+            yield from batch
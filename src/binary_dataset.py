@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from transformers import PreTrainedTokenizerBase
+
+from src.utils.dataset_io import iter_records
+from src.utils.logger_loader import LoggerLoader
+from src.utils.tokenizer_fingerprint import tokenizer_fingerprint
+
+logger = LoggerLoader().get_logger()
+
+# Файлы бинарного датасета в его каталоге
+TOKENS_FILE = "tokens.bin"
+OFFSETS_FILE = "offsets.npy"
+LENGTHS_FILE = "lengths.npy"
+LABELS_FILE = "labels.npy"
+META_FILE = "meta.json"
+
+FORMAT_VERSION = 1
+
+
+def binary_path(json_path: str) -> str:
+    """Каталог бинарной версии датасета: data/processed/train.json → data/processed/train_bin."""
+    return f"{os.path.splitext(json_path)[0]}_bin"
+
+
+def token_dtype(vocab_size: int) -> np.dtype:
+    """Самый компактный тип для ID токенов словаря заданного размера."""
+    return np.dtype(np.uint16) if vocab_size <= np.iinfo(np.uint16).max + 1 else np.dtype(np.uint32)
+
+
+class BinaryDataset:
+    """
+    Компактный датасет токенов: все ID подряд в одном плоском массиве
+    и индекс offsets/lengths/labels по примерам.
+
+    На диске — каталог с tokens.bin (сырые ID), offsets.npy, lengths.npy, labels.npy
+    и meta.json. open() отображает файлы в память (np.memmap): данные не читаются
+    при старте, а страницы делятся между процессами DataLoader после fork,
+    поэтому время запуска и RSS не растут с размером корпуса.
+    """
+
+    def __init__(
+        self,
+        tokens: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        labels: np.ndarray,
+        meta: Dict[str, Any],
+    ):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.lengths = lengths
+        self.labels = labels
+        self.meta = meta
+
+    @staticmethod
+    def is_binary(path: str) -> bool:
+        """Проверяет, что path — каталог бинарного датасета."""
+        return os.path.isfile(os.path.join(path, META_FILE))
+
+    @classmethod
+    def open(cls, path: str) -> "BinaryDataset":
+        """Открывает каталог бинарного датасета без чтения данных в память."""
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия бинарного датасета: {meta.get('format_version')}")
+
+        tokens_path = os.path.join(path, TOKENS_FILE)
+        if meta["num_tokens"]:
+            tokens = np.memmap(tokens_path, dtype=np.dtype(meta["dtype"]), mode="r", shape=(meta["num_tokens"],))
+        else:
+            # пустой файл отобразить нельзя
+            tokens = np.zeros(0, dtype=np.dtype(meta["dtype"]))
+        return cls(
+            tokens=tokens,
+            offsets=np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r"),
+            lengths=np.load(os.path.join(path, LENGTHS_FILE), mmap_mode="r"),
+            labels=np.load(os.path.join(path, LABELS_FILE), mmap_mode="r"),
+            meta=meta,
+        )
+
+    @classmethod
+    def pack(
+        cls,
+        input_ids: Sequence[Sequence[int]],
+        labels: Sequence[int],
+        meta: Optional[Dict[str, Any]] = None,
+        dtype: np.dtype = np.dtype(np.int64),
+    ) -> "BinaryDataset":
+        """Собирает датасет в памяти из списков ID (тот же формат, что и на диске)."""
+        lengths = np.fromiter((len(ids) for ids in input_ids), dtype=np.int32, count=len(input_ids))
+        offsets = np.zeros(len(input_ids), dtype=np.int64)
+        if len(lengths) > 1:
+            np.cumsum(lengths[:-1], out=offsets[1:])
+        tokens = np.fromiter(
+            (token for ids in input_ids for token in ids), dtype=dtype, count=int(lengths.sum())
+        )
+        return cls(tokens, offsets, lengths, np.asarray(labels, dtype=np.int64), dict(meta or {}))
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def ids(self, idx: int) -> np.ndarray:
+        """ID токенов примера idx — срез без копирования."""
+        start = int(self.offsets[idx])
+        return self.tokens[start:start + int(self.lengths[idx])]
+
+    def label(self, idx: int) -> int:
+        return int(self.labels[idx])
+
+
+class BinaryDatasetWriter:
+    """
+    Потоковая запись бинарного датасета: ID дописываются в tokens.bin по мере поступления,
+    в памяти держится только индекс (три числа на пример).
+    Всё пишется во временный каталог <path>.<pid>.tmp, который в commit() переносится на место итогового:
+    недописанный датасет никогда не оказывается по основному пути.
+    """
+
+    def __init__(self, path: str, dtype: np.dtype, meta: Optional[Dict[str, Any]] = None):
+        """
+        :param path: каталог бинарного датасета.
+        :param dtype: тип ID токенов (см. token_dtype).
+        :param meta: дополнительные поля meta.json (отпечаток токенизатора, категории и т. п.).
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.meta = dict(meta or {})
+        # pid в имени: два процесса, собирающие один датасет, не мешают друг другу
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self._tokens = open(os.path.join(self.tmp_path, TOKENS_FILE), "wb")
+        self._offsets = array("q")
+        self._lengths = array("i")
+        self._labels = array("q")
+        self._num_tokens = 0
+        self._longest = 0
+
+    def write(self, ids: Sequence[int], label: int) -> None:
+        """Дописывает один пример."""
+        np.asarray(ids, dtype=self.dtype).tofile(self._tokens)
+        self._offsets.append(self._num_tokens)
+        self._lengths.append(len(ids))
+        self._labels.append(label)
+        self._num_tokens += len(ids)
+        self._longest = max(self._longest, len(ids))
+
+    def commit(self) -> str:
+        """Записывает индекс и meta.json и переносит каталог на место итогового."""
+        self._tokens.close()
+        np.save(os.path.join(self.tmp_path, OFFSETS_FILE), np.frombuffer(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.tmp_path, LENGTHS_FILE), np.frombuffer(self._lengths, dtype=np.int32))
+        np.save(os.path.join(self.tmp_path, LABELS_FILE), np.frombuffer(self._labels, dtype=np.int64))
+        meta = {
+            **self.meta,
+            "format_version": FORMAT_VERSION,
+            "dtype": self.dtype.name,
+            "num_examples": len(self._lengths),
+            "num_tokens": self._num_tokens,
+            "longest": self._longest,
+        }
+        with open(os.path.join(self.tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        # каталог нельзя заменить одним rename поверх непустого: убираем старый прямо перед переносом
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self._tokens.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def convert_json_to_binary(
+    json_path: str,
+    out_path: str,
+    tokenizer: PreTrainedTokenizerBase,
+    categories: Iterable[str],
+    max_length: int = 512,
+    batch_size: int = 1000,
+) -> str:
+    """
+    Конвертирует JSON/JSONL-датасет в бинарный формат.
+
+    Сохранённые при сборке input_ids берутся как есть, если отпечаток токенизатора
+    совпадает и длина не больше max_length; остальные тексты токенизируются
+    пакетами по batch_size (с обрезкой до max_length). Файл читается потоково.
+
+    :param json_path: путь к JSON/JSONL-датасету (или логический путь шардов).
+    :param out_path: каталог бинарного датасета.
+    :param tokenizer: токенизатор модели.
+    :param categories: категории в порядке индексов меток.
+    :param max_length: максимальная длина примера в токенах.
+    :param batch_size: сколько текстов токенизировать за один вызов.
+    :return: out_path.
+    """
+    fingerprint = tokenizer_fingerprint(tokenizer)
+    label_to_idx = {cat: idx for idx, cat in enumerate(categories)}
+    writer = BinaryDatasetWriter(
+        out_path,
+        dtype=token_dtype(len(tokenizer)),
+        meta={
+            "tokenizer": fingerprint,
+            "tokenizer_name": tokenizer.name_or_path,
+            "max_length": max_length,
+            "categories": list(label_to_idx),
+            "source": json_path,
+        },
+    )
+
+    # порядок примеров сохраняется: (ID или текст, метка) копятся пачкой до batch_size
+    pending: List[Tuple[Any, int]] = []
+    reused = tokenized = 0
+
+    def flush() -> None:
+        nonlocal tokenized
+        texts = [payload for payload, _ in pending if isinstance(payload, str)]
+        encoded = iter(
+            tokenizer(
+                texts,
+                truncation=True,
+                max_length=max_length,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )["input_ids"]
+            if texts else ()
+        )
+        for payload, label in pending:
+            if isinstance(payload, str):
+                writer.write(next(encoded), label)
+                tokenized += 1
+            else:
+                writer.write(payload, label)
+        pending.clear()
+
+    try:
+        for record in iter_records(json_path):
+            label = label_to_idx[record["category"]]
+            ids = record.get("input_ids")
+            if ids and record.get("tokenizer") == fingerprint and len(ids) <= max_length:
+                pending.append((ids, label))
+                reused += 1
+            else:
+                pending.append((record["text"], label))
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+    except Exception:
+        writer.abort()
+        raise
+
+    writer.commit()
+    logger.info(
+        f"💾 Бинарный датасет {out_path}: {reused + tokenized} примеров "
+        f"(готовые ID: {reused}, токенизировано: {tokenized})"
+    )
+    return out_path
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import safetensors.torch
+import torch
+from peft import PeftModel, get_peft_model_state_dict
+from transformers import TrainerCallback
+from transformers.trainer import (
+    ADAPTER_SAFE_WEIGHTS_NAME,
+    OPTIMIZER_NAME,
+    SAFE_WEIGHTS_NAME,
+    SCHEDULER_NAME,
+    TRAINER_STATE_NAME,
+    TRAINING_ARGS_NAME,
+    WEIGHTS_NAME,
+)
+from transformers.trainer_callback import ExportableState
+from transformers.trainer_utils import PREFIX_CHECKPOINT_DIR
+
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+_CHECKPOINT_DIR = re.compile(rf"^{PREFIX_CHECKPOINT_DIR}-(\d+)$")
+# Каталоги недописанных чекпоинтов: не совпадают с шаблоном checkpoint-*, поэтому
+# их не видят ни ротация Trainer, ни поиск чекпоинта для продолжения
+TMP_PREFIX = ".tmp-"
+WEIGHT_FILES = (ADAPTER_SAFE_WEIGHTS_NAME, SAFE_WEIGHTS_NAME, WEIGHTS_NAME)
+
+
+def _to_cpu(value: Any) -> Any:
+    """Глубокая копия на CPU: тензоры копируются, чтобы следующие шаги их не изменили."""
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, dict):
+        return {k: _to_cpu(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_cpu(v) for v in value)
+    return value
+
+
+def is_valid_checkpoint(path: str) -> bool:
+    """Чекпоинт полный: есть состояние Trainer, веса и состояние оптимизатора."""
+    return (
+        os.path.isfile(os.path.join(path, TRAINER_STATE_NAME))
+        and os.path.isfile(os.path.join(path, OPTIMIZER_NAME))
+        and any(os.path.isfile(os.path.join(path, name)) for name in WEIGHT_FILES)
+    )
+
+
+def _valid_checkpoints(run_dir: str) -> Iterator[str]:
+    """Полные чекпоинты checkpoint-N в run_dir, от последнего к первому."""
+    if not os.path.isdir(run_dir):
+        return
+    steps = []
+    for name in os.listdir(run_dir):
+        match = _CHECKPOINT_DIR.match(name)
+        if match and os.path.isdir(os.path.join(run_dir, name)):
+            steps.append((int(match.group(1)), name))
+    for _, name in sorted(steps, reverse=True):
+        path = os.path.join(run_dir, name)
+        if is_valid_checkpoint(path):
+            yield path
+        else:
+            logger.warning(f"⚠️ Неполный чекпоинт пропущен: {path}")
+
+
+def latest_checkpoint(run_dir: str) -> Optional[str]:
+    """
+    Последний полный чекпоинт checkpoint-N в run_dir (None, если его нет).
+    Неполные чекпоинты (процесс убит во время синхронной записи) пропускаются.
+    """
+    return next(_valid_checkpoints(run_dir), None)
+
+
+def config_hash(settings: Dict[str, Any]) -> str:
+    """Хэш настроек прогона, от которых зависят форма модели и ход обучения."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class RunConfigCallback(TrainerCallback, ExportableState):
+    """
+    Записывает хэш настроек прогона в trainer_state.json каждого чекпоинта
+    (stateful_callbacks — их сохраняют и Trainer, и AsyncCheckpointer).
+    По нему resumable_checkpoint отличает чекпоинты этого прогона от оставшихся
+    в save_dir после прогона с другими настройками.
+    """
+
+    def __init__(self, config_hash: str):
+        self.config_hash = config_hash
+
+    def state(self) -> Dict[str, Any]:
+        return {"args": {"config_hash": self.config_hash}, "attributes": {}}
+
+
+def resumable_checkpoint(run_dir: str, run_hash: str) -> Optional[str]:
+    """
+    Чекпоинт, с которого можно продолжить прогон с хэшем настроек run_hash, или None.
+
+    Берётся последний полный чекпоинт с тем же хэшем. Если по trainer_state.json
+    прогон уже дошёл до max_steps, продолжать нечего — обучение начинается заново.
+    Чекпоинты без хэша или с другим хэшем (изменились lora_r, lora_preset, число
+    классов и т. п.) не подходят: их веса и оптимизатор не совпадут с моделью по форме.
+    """
+    for path in _valid_checkpoints(run_dir):
+        try:
+            with open(os.path.join(path, TRAINER_STATE_NAME), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Состояние чекпоинта {path} не прочитано: {e}")
+            continue
+        saved = state.get("stateful_callbacks", {}).get(RunConfigCallback.__name__, {})
+        if saved.get("args", {}).get("config_hash") != run_hash:
+            logger.info(f"Чекпоинт {path} сохранён с другими настройками, пропущен")
+            continue
+        if state.get("global_step", 0) >= state.get("max_steps", 0):
+            logger.info(f"Прогон в {run_dir} уже завершён ({path}), обучение начинается заново")
+            return None
+        return path
+    return None
+
+
+def remove_partial_checkpoints(run_dir: str) -> None:
+    """Удаляет временные каталоги чекпоинтов, оставшиеся от прерванного прогона."""
+    if not os.path.isdir(run_dir):
+        return
+    for name in os.listdir(run_dir):
+        if name.startswith(TMP_PREFIX + PREFIX_CHECKPOINT_DIR):
+            shutil.rmtree(os.path.join(run_dir, name), ignore_errors=True)
+
+
+class AsyncCheckpointer:
+    """
+    Асинхронные чекпоинты для transformers.Trainer.
+
+    Подменяет trainer._save_checkpoint. Чекпоинт сохраняется в два этапа.
+    В потоке обучения делается снимок на CPU: веса (в режиме LoRA только адаптеры
+    и modules_to_save — get_peft_model_state_dict), состояние оптимизатора и
+    планировщика, RNG и состояние Trainer. Запись на диск, атомарное переименование
+    .tmp-checkpoint-N → checkpoint-N и ротация старых чекпоинтов идут в фоновом потоке.
+    Формат файлов тот же, что у Trainer, поэтому resume_from_checkpoint работает как обычно.
+    Одновременно пишется не больше одного чекпоинта: следующий ждёт предыдущий.
+    """
+
+    def __init__(self, trainer: Any):
+        self.trainer = trainer
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    @classmethod
+    def attach(cls, trainer: Any) -> "AsyncCheckpointer":
+        checkpointer = cls(trainer)
+        trainer._save_checkpoint = checkpointer.save_checkpoint
+        return checkpointer
+
+    def wait(self) -> None:
+        """Дожидается фоновой записи; ошибку записи пробрасывает в поток обучения."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Фоновая запись чекпоинта завершилась ошибкой") from error
+
+    def _snapshot_weights(self, model: Any) -> Callable[[str], None]:
+        """Снимок весов на CPU и функция, которая запишет его в каталог чекпоинта."""
+        unwrapped = self.trainer.accelerator.unwrap_model(model)
+        if isinstance(unwrapped, PeftModel):
+            state = _to_cpu(get_peft_model_state_dict(unwrapped))
+            config = unwrapped.peft_config[unwrapped.active_adapter]
+
+            def write(path: str) -> None:
+                safetensors.torch.save_file(state, os.path.join(path, ADAPTER_SAFE_WEIGHTS_NAME), metadata={"format": "pt"})
+                config.save_pretrained(path)
+            return write
+
+        state = _to_cpu(unwrapped.state_dict())
+        config = getattr(unwrapped, "config", None)
+
+        def write(path: str) -> None:
+            # torch.save, а не safetensors: связанные веса (tied embeddings) сохраняются без ошибок
+            torch.save(state, os.path.join(path, WEIGHTS_NAME))
+            if config is not None:
+                config.save_pretrained(path)
+        return write
+
+    def save_checkpoint(self, model: Any, trial: Any = None) -> None:
+        trainer = self.trainer
+        self.wait()
+        started = time.perf_counter()
+
+        checkpoint_folder = f"{PREFIX_CHECKPOINT_DIR}-{trainer.state.global_step}"
+        if trainer.hp_search_backend is None and trial is None:
+            trainer.store_flos()
+        run_dir = trainer._get_output_dir(trial=trial)
+        output_dir = os.path.join(run_dir, checkpoint_folder)
+        tmp_dir = os.path.join(run_dir, TMP_PREFIX + checkpoint_folder)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        # ---- снимок в потоке обучения ----
+        write_weights = self._snapshot_weights(model)
+        payload: Dict[str, Any] = {OPTIMIZER_NAME: _to_cpu(trainer.optimizer.state_dict())}
+        if trainer.lr_scheduler is not None:
+            payload[SCHEDULER_NAME] = trainer.lr_scheduler.state_dict()
+        # мелкие файлы пишутся сразу
+        trainer._save_scaler(tmp_dir)
+        trainer._save_rng_state(tmp_dir)
+        for cb in [c for c in trainer.callback_handler.callbacks + [trainer.control] if isinstance(c, ExportableState)]:
+            name = cb.__class__.__name__
+            if isinstance(trainer.state.stateful_callbacks.get(name), list):
+                trainer.state.stateful_callbacks[name].append(cb.state())
+            else:
+                trainer.state.stateful_callbacks[name] = cb.state()
+        trainer.state.save_to_json(os.path.join(tmp_dir, TRAINER_STATE_NAME))
+        processing_class = getattr(trainer, "processing_class", None)
+        args = trainer.args
+        snapshot_time = time.perf_counter() - started
+
+        def write() -> None:
+            try:
+                write_started = time.perf_counter()
+                write_weights(tmp_dir)
+                for name, state in payload.items():
+                    torch.save(state, os.path.join(tmp_dir, name))
+                torch.save(args, os.path.join(tmp_dir, TRAINING_ARGS_NAME))
+                if processing_class is not None:
+                    processing_class.save_pretrained(tmp_dir)
+
+                shutil.rmtree(output_dir, ignore_errors=True)
+                os.replace(tmp_dir, output_dir)
+                trainer._rotate_checkpoints(use_mtime=False, output_dir=run_dir)
+                logger.info(
+                    f"💾 Чекпоинт {output_dir}: снимок {snapshot_time:.2f} с (блокирует обучение), "
+                    f"запись {time.perf_counter() - write_started:.2f} с в фоне"
+                )
+            except BaseException as e:  # noqa: BLE001 — передаётся в поток обучения через wait()
+                self._error = e
+                logger.error(f"❌ Ошибка записи чекпоинта {output_dir}: {e}")
+
+        if not args.should_save:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._thread = threading.Thread(target=write, name=f"checkpoint-{trainer.state.global_step}")
+        self._thread.start()
+
+
+class PreemptionCallback(TrainerCallback):
+    """
+    Корректная остановка по SIGTERM (вытеснение задачи планировщиком, остановка контейнера).
+
+    Обработчик сигнала только ставит флаг; в конце текущего шага Trainer сохраняет чекпоинт
+    и завершает обучение, так что теряется не больше одного шага, а при следующем запуске
+    обучение продолжится с него.
+    """
+
+    def __init__(self, signals: List[int] = (signal.SIGTERM,)):
+        self.signals = list(signals)
+        self.preempted = False
+        self._previous: Dict[int, Any] = {}
+
+    def _handle(self, signum, frame) -> None:
+        logger.warning(f"⚠️ Получен сигнал {signum}: сохраняем чекпоинт и останавливаем обучение")
+        self.preempted = True
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        for signum in self.signals:
+            try:
+                self._previous[signum] = signal.signal(signum, self._handle)
+            except ValueError:
+                # обработчик сигнала можно поставить только из главного потока
+                logger.warning("⚠️ Обучение не в главном потоке: остановка по сигналу недоступна")
+                break
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self.preempted:
+            control.should_save = True
+            control.should_training_stop = True
+        return control
+
+    def restore(self) -> None:
+        """Возвращает прежние обработчики сигналов (повторный вызов ничего не делает)."""
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous = {}
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self.restore()
@@ -0,0 +1,89 @@
+import os
+from typing import Any, Dict, List
+
+import psutil
+import torch
+
+from src.utils.config_model import CpuProfileConfig
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+
+def physical_cores() -> int:
+    """Число физических ядер (потоки гипертрединга в матричных операциях только мешают друг другу)."""
+    return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+
+
+def core_slices(workers: int, threads: int) -> List[List[int]]:
+    """
+    Непересекающиеся наборы CPU для воркеров, по threads в каждом.
+    Берутся первые логические CPU из доступных процессу: в Linux номера 0..N-1
+    обычно соответствуют разным физическим ядрам, а их SMT-соседи идут следом.
+    """
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    return [cpus[i * threads:(i + 1) * threads] or cpus for i in range(workers)]
+
+
+def pin_to_cores(cores: List[int]) -> None:
+    """Закрепляет текущий процесс за набором CPU и задаёт столько же intra-op потоков torch."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+
+def cpu_supports_bf16() -> bool:
+    """Есть ли у CPU аппаратная поддержка bf16 (AVX512-BF16 / AMX), которой пользуется oneDNN."""
+    try:
+        return bool(torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def apply_cpu_profile(profile: CpuProfileConfig) -> Dict[str, Any]:
+    """
+    Настраивает процесс для обучения на CPU и возвращает аргументы TrainingArguments профиля.
+
+    - intra-op потоки — по числу физических ядер (или profile.num_threads),
+      inter-op — небольшое число (параллельных независимых операций в энкодере мало);
+    - bf16 autocast, только если CPU поддерживает bf16 аппаратно (иначе он медленнее fp32);
+    - torch.compile по желанию (первый шаг заметно дольше из-за компиляции);
+    - накопление градиентов: эффективный батч больше без роста памяти и пиков на шаге;
+    - воркеры DataLoader без pin_memory (на CPU копировать в pinned-память незачем).
+      Токенизатор при этом однопоточный (TOKENIZERS_PARALLELISM=false): токенизация
+      и так вынесена из цикла обучения (готовые input_ids, бинарный датасет, кэш токенов),
+      а пул потоков Rust-токенизатора в форкнутых воркерах конкурирует с потоками torch.
+
+    :param profile: секция cpu_profile конфига.
+    :return: словарь аргументов для TrainingArguments.
+    """
+    threads = profile.num_threads or physical_cores()
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(profile.interop_threads)
+    except RuntimeError as e:
+        # inter-op пул задаётся один раз до первой параллельной операции
+        logger.warning(f"⚠️ Число inter-op потоков уже зафиксировано ({torch.get_num_interop_threads()}): {e}")
+
+    if profile.dataloader_workers:
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    bf16 = profile.bf16 and cpu_supports_bf16()
+    if profile.bf16 and not bf16:
+        logger.info("CPU без аппаратной поддержки bf16 — обучение в fp32")
+
+    args = {
+        "use_cpu": True,
+        "bf16": bf16,
+        "torch_compile": profile.compile,
+        "gradient_accumulation_steps": profile.gradient_accumulation_steps,
+        "dataloader_num_workers": profile.dataloader_workers,
+        "dataloader_pin_memory": False,
+        "dataloader_persistent_workers": profile.dataloader_workers > 0,
+    }
+    logger.info(
+        f"🖥️ CPU-профиль: intra-op потоков {threads}, inter-op {torch.get_num_interop_threads()}, "
+        f"bf16={bf16}, compile={profile.compile}, "
+        f"накопление градиентов {profile.gradient_accumulation_steps}, воркеров {profile.dataloader_workers}"
+    )
+    return args
@@ -0,0 +1,106 @@
+import math
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+
+@dataclass
+class AugmentationPlan:
+    """
+    План back-translation: сколько вариантов не хватает каждой категории
+    и сколько раундов выполнить для каких исходных записей.
+
+    counts — число записей категорий во входных данных,
+    deficits — сколько примеров не хватает до min_examples,
+    rounds — номер записи во входном потоке → число вариантов (раундов) для неё,
+    max_rounds — наибольшее число раундов на запись,
+    skipped — номера записей, которые при подсчёте отбросил фильтр почти-дубликатов.
+    """
+    max_rounds: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    deficits: Dict[str, int] = field(default_factory=dict)
+    rounds: Dict[int, int] = field(default_factory=dict)
+    skipped: Set[int] = field(default_factory=set)
+
+    @property
+    def planned_variants(self) -> int:
+        return sum(self.rounds.values())
+
+    @property
+    def full_variants(self) -> int:
+        """Сколько вариантов получилось бы при аугментации всех записей (для сравнения)."""
+        return sum(self.counts.values()) * self.max_rounds
+
+
+class AugmentationPlanner:
+    """
+    Планирует аугментацию по дефициту категорий до перевода.
+
+    Для категории с дефицитом d и n записями выбирается минимум раундов на запись
+    v = min(max_rounds, ⌈d·oversample / n⌉) и ⌈d·oversample / v⌉ случайных записей
+    (seed воспроизводим) — варианты распределяются по разным исходным текстам,
+    а цепочки раундов не длиннее, чем нужно. Запас oversample покрывает варианты,
+    которые не удалось перевести или отбросил фильтр почти-дубликатов; пайплайн всё равно
+    прекращает перевод категории, как только она добирает min_examples.
+    Категории без дефицита не переводятся совсем.
+    """
+
+    def __init__(self, min_examples: int, max_rounds: int, oversample: float = 1.2, seed: int = 0):
+        """
+        :param min_examples: целевое число примеров на категорию.
+        :param max_rounds: наибольшее число раундов back-translation на запись.
+        :param oversample: запас плана относительно дефицита (≥ 1).
+        :param seed: seed выбора исходных записей.
+        """
+        self.min_examples = min_examples
+        self.max_rounds = max_rounds
+        self.oversample = oversample
+        self.seed = seed
+
+    def plan(self, records: Iterable[Optional[Dict[str, Any]]]) -> AugmentationPlan:
+        """
+        Считает категории (один потоковый проход по данным) и строит план.
+
+        :param records: записи входного датасета (в том же порядке, что и при аугментации);
+            None — запись, отброшенная фильтром почти-дубликатов: она занимает номер в потоке,
+            но не учитывается в числе примеров категории и не выбирается для перевода.
+        """
+        indices: Dict[str, List[int]] = defaultdict(list)
+        skipped: Set[int] = set()
+        for i, record in enumerate(records):
+            if record is None:
+                skipped.add(i)
+                continue
+            indices[record.get('category', '')].append(i)  # type: ignore
+
+        plan = AugmentationPlan(
+            self.max_rounds, counts={cat: len(idx) for cat, idx in indices.items()}, skipped=skipped
+        )
+        rnd = random.Random(self.seed)
+        for cat in sorted(indices):
+            sources = indices[cat]
+            deficit = self.min_examples - len(sources)
+            if deficit <= 0 or self.max_rounds <= 0 or not sources:
+                continue
+            plan.deficits[cat] = deficit
+            wanted = math.ceil(deficit * self.oversample)
+            per_source = min(self.max_rounds, math.ceil(wanted / len(sources)))
+            chosen = rnd.sample(sources, min(len(sources), math.ceil(wanted / per_source)))
+            for i in chosen:
+                plan.rounds[i] = per_source
+            if per_source * len(sources) < deficit:
+                logger.warning(
+                    f"Категории '{cat}' не хватает {deficit} примеров, а {len(sources)} записей "
+                    f"по {self.max_rounds} раундов дадут не больше {len(sources) * self.max_rounds}"
+                )
+
+        logger.info(
+            f"🗺️ План аугментации: дефицит {plan.deficits or 'нет'}; вариантов {plan.planned_variants} "
+            f"вместо {plan.full_variants} при аугментации всех записей"
+        )
+        return plan
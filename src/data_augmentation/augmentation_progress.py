@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Optional
+
+from src.dataset_saver import DatasetSaver
+from src.utils.dataset_io import Record, dataset_files
+from src.utils.logger_loader import LoggerLoader
+
+
+def input_fingerprint(input_path: str, settings: Dict[str, Any]) -> str:
+    """sha256 содержимого входного датасета (всех шардов) и настроек аугментации."""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for path in dataset_files(input_path):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class AugmentationProgress:
+    """
+    Промежуточный вывод аугментации с курсором прогресса.
+
+    Записи дописываются в <output>.partial.jsonl по мере готовности. В точках, где
+    все начатые переводы завершены, checkpoint() сбрасывает файл на диск и атомарно
+    пишет курсор <output>.progress.json: сколько входных записей обработано, смещение
+    в partial-файле и состояние пайплайна. Повторный запуск с тем же входом и настройками
+    (fingerprint) обрезает partial-файл до последнего курсора и продолжает с него.
+    finish() переносит результат в итоговый датасет (DatasetSaver, атомарно)
+    и удаляет служебные файлы.
+    """
+
+    def __init__(self, output_path: str, fingerprint: str):
+        """
+        :param output_path: логический путь итогового датасета.
+        :param fingerprint: отпечаток входа и настроек (input_fingerprint).
+        """
+        self.output_path = output_path
+        self.fingerprint = fingerprint
+        self.partial_path = f"{os.path.splitext(output_path)[0]}.partial.jsonl"
+        self.cursor_path = f"{os.path.splitext(output_path)[0]}.progress.json"
+        self.logger = LoggerLoader().get_logger()
+        self.cursor: Dict[str, Any] = {"consumed": 0, "offset": 0, "records": 0, "state": {}}
+        self._file = None
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Читает курсор прошлого прогона. Если его нет или вход/настройки изменились,
+        прогресс начинается заново.
+        """
+        try:
+            with open(self.cursor_path, "r", encoding="utf-8") as f:
+                cursor = json.load(f)
+        except FileNotFoundError:
+            return self.cursor
+        except Exception as e:
+            self.logger.warning(f"⚠️ Курсор {self.cursor_path} не прочитан, начинаем заново: {e}")
+            return self.cursor
+        if cursor.get("fingerprint") != self.fingerprint:
+            self.logger.info("Вход или настройки аугментации изменились — прогресс прошлого прогона не используется")
+            return self.cursor
+        if not os.path.exists(self.partial_path) or os.path.getsize(self.partial_path) < cursor["offset"]:
+            self.logger.warning(f"⚠️ {self.partial_path} короче записанного в курсоре, начинаем заново")
+            return self.cursor
+        self.cursor = cursor
+        self.logger.info(
+            f"🔁 Продолжаем аугментацию: обработано {cursor['consumed']} входных записей, "
+            f"записано {cursor['records']}"
+        )
+        return self.cursor
+
+    def open(self) -> None:
+        """Открывает partial-файл на дозапись с позиции курсора (хвост после него отбрасывается)."""
+        os.makedirs(os.path.dirname(self.partial_path) or ".", exist_ok=True)
+        mode = "r+b" if self.cursor["offset"] and os.path.exists(self.partial_path) else "wb"
+        self._file = open(self.partial_path, mode)
+        self._file.truncate(self.cursor["offset"])
+        self._file.seek(self.cursor["offset"])
+
+    def written(self) -> Iterator[Record]:
+        """Записи, сохранённые до курсора (для восстановления счётчиков и фильтра дубликатов)."""
+        if not self.cursor["offset"]:
+            return
+        with open(self.partial_path, "rb") as f:
+            while f.tell() < self.cursor["offset"]:
+                yield json.loads(f.readline())
+
+    def write(self, record: Record) -> None:
+        self._file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.cursor["records"] += 1
+
+    def checkpoint(self, consumed: int, state: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Фиксирует прогресс: всё записанное до этого момента сохранено на диске.
+
+        :param consumed: сколько входных записей обработано полностью.
+        :param state: состояние пайплайна для продолжения (JSON-совместимое).
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.cursor.update(
+            fingerprint=self.fingerprint, consumed=consumed, offset=self._file.tell(), state=state or {}
+        )
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cursor, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cursor_path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self, saver: DatasetSaver) -> int:
+        """Сохраняет всё записанное в итоговый датасет и удаляет partial-файл и курсор."""
+        self._file.flush()
+        self.cursor["offset"] = self._file.tell()
+        self.close()
+        written = saver.save(self.written())
+        if written != self.cursor["records"]:
+            raise RuntimeError(f"Итоговый датасет не сохранён, промежуточный вывод остался в {self.partial_path}")
+        for path in (self.partial_path, self.cursor_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return written
@@ -1,14 +1,33 @@
-import json
 import traceback
 from collections import defaultdict
-from pathlib import Path
-from typing import Any, Dict, List
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from src.utils.logger_loader import LoggerLoader
+from src.data_augmentation.augmentation_planner import AugmentationPlan, AugmentationPlanner
+from src.data_augmentation.augmentation_progress import AugmentationProgress, input_fingerprint
 from src.data_augmentation.bt_augmenter import BackTranslationAugmenter
+from src.data_augmentation.parallel_augmenter import ParallelAugmenter
+from src.data_augmentation.translation_cache import TranslationCache
+from src.dataset_saver import DatasetSaver
+from src.processing.near_duplicates import NearDuplicateFilter
+from src.utils.dataset_io import iter_records
 
 logger = LoggerLoader().get_logger()
 
+# Фиксация прогресса: (сколько входных записей обработано, состояние для продолжения)
+Checkpoint = Callable[[int, Dict[str, Any]], None]
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Разбивает поток на списки по size элементов (последний может быть короче)."""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class DataAugmentationPipeline:
     def __init__(
@@ -17,68 +36,215 @@ class DataAugmentationPipeline:
         output_json: str,
         min_examples: int = 500,
         bt_rounds: int = 2,
-        bt_beam_size: int = 5
+        bt_beam_size: int = 5,
+        max_shard_bytes: Optional[int] = None,
+        dedup: Optional[NearDuplicateFilter] = None,
+        bt_batch_samples: int = 64,
+        bt_max_batch_tokens: int = 4096,
+        bt_max_segment_tokens: Optional[int] = 128,
+        plan: bool = True,
+        bt_oversample: float = 1.2,
+        cache_path: Optional[str] = None,
+        resume: bool = True,
+        workers: int = 1,
+        threads_per_worker: Optional[int] = None
     ) -> None:
         self.input_json: str = input_json
         self.output_json: str = output_json
         self.min_examples: int = min_examples
+        # Сколько записей переводится за один вызов augment_many
+        self.bt_batch_samples: int = bt_batch_samples
+        # Переводить только то, что нужно для min_examples (иначе — все записи всех категорий)
+        self.plan: bool = plan
+        self.bt_oversample: float = bt_oversample
+        # Промежуточный вывод с курсором: прерванный прогон продолжается с последнего батча
+        self.resume: bool = resume
+        # Фильтр почти-дубликатов: парафразы, почти совпадающие с оригиналом или друг с другом
+        self.dedup: Optional[NearDuplicateFilter] = dedup
+        self.saver: DatasetSaver = DatasetSaver(output_json, max_shard_bytes=max_shard_bytes)
 
         # Инициализируем BT аугментатор
         self.bt_augmenter: BackTranslationAugmenter = BackTranslationAugmenter(
             src_lang="ru",
             mid_lang="en",
             rounds=bt_rounds,
-            beam_size=bt_beam_size
+            beam_size=bt_beam_size,
+            max_batch_tokens=bt_max_batch_tokens,
+            max_segment_tokens=bt_max_segment_tokens,
+            cache=TranslationCache(cache_path) if cache_path else None
         )
 
+        # Пул процессов для перевода: воркеры делят веса моделей с родительским процессом
+        self.parallel: Optional[ParallelAugmenter] = None
+        if workers > 1:
+            if self.bt_augmenter.device != "cpu":
+                logger.warning(
+                    f"Пул процессов back-translation только для CPU, на {self.bt_augmenter.device} — один процесс"
+                )
+            else:
+                self.parallel = ParallelAugmenter(
+                    self.bt_augmenter, workers, threads_per_worker, batch_samples=bt_batch_samples
+                )
+        # Сколько записей отдаётся на один перевод: в пуле — по целой пачке bt_batch_samples на воркер
+        self.call_samples: int = bt_batch_samples * workers if self.parallel is not None else bt_batch_samples
+
+    def iter_data(self) -> Iterator[Dict[str, Any]]:
+        """Потоково читаем данные из JSON/JSONL (включая шарды) по одной записи."""
+        logger.info(f"Читаем данные из {self.input_json}...")
+        return iter_records(self.input_json)
+
     def load_data(self) -> List[Dict[str, Any]]:
         """Загружаем данные из JSON."""
         try:
-            logger.info(f"Загружаем данные из {self.input_json}...")
-            with open(self.input_json, 'r', encoding='utf-8') as file:
-                data: List[Dict[str, Any]] = json.load(file)
+            data: List[Dict[str, Any]] = list(self.iter_data())
             logger.info(f"Данные загружены, количество записей: {len(data)}")
             return data
         except Exception as e:
             logger.error(f"Ошибка при загрузке данных: {e}")
             raise
 
-    def save_data(self, data: List[Dict[str, Any]]) -> None:
-        """Сохраняем данные в JSON."""
-        try:
-            logger.info(f"Сохраняем данные в {self.output_json}...")
-            Path(self.output_json).parent.mkdir(parents=True, exist_ok=True)
-            with open(self.output_json, 'w', encoding='utf-8') as file:
-                json.dump(data, file, ensure_ascii=False, indent=4)
-            logger.info(f"Данные успешно сохранены в {self.output_json}")
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении данных: {e}")
-            raise
+    def save_data(self, data: Iterable[Dict[str, Any]]) -> None:
+        """Сохраняем данные потоково (data может быть генератором), с атомарной фиксацией."""
+        logger.info(f"Сохраняем данные в {self.output_json}...")
+        with self.saver.writer() as writer:
+            writer.write_many(data)
+        logger.info(f"Данные успешно сохранены в {self.output_json}: {writer.count} записей")
+
+    def _augment_many(self, texts: List[str], rounds: Optional[List[int]] = None) -> List[List[str]]:
+        """Back-translation пачки текстов — в пуле процессов, если он задан."""
+        if self.parallel is not None:
+            return self.parallel.augment_many(texts, rounds)
+        return self.bt_augmenter.augment_many(texts, rounds)
+
+    def _unique(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Отбрасывает почти-дубликаты уже пропущенных записей (если фильтр задан)."""
+        return list(self.dedup.filter(records)) if self.dedup is not None else records
+
+    def iter_augmented(
+        self,
+        data: Iterable[Dict[str, Any]],
+        start: int = 0,
+        checkpoint: Optional[Checkpoint] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Отдаём каждую запись и её back-translation варианты.
+        Записи переводятся пачками по bt_batch_samples (augment_many батчует их по длине;
+        в пуле процессов за раз переводится по пачке на воркер),
+        порядок вывода тот же: запись, затем её варианты. Почти-дубликаты отбрасываются здесь же.
+
+        :param data: записи (при продолжении — начиная с записи номер start).
+        :param start: сколько входных записей уже обработано прошлым прогоном.
+        :param checkpoint: вызывается после каждой пачки, когда всё отданное уже забрано.
+        """
+        logger.info("Начинаем back-translation аугментацию...")
+        consumed = start
+        for samples in batched(data, self.call_samples):
+            texts: List[str] = [sample.get('text', '') for sample in samples]  # type: ignore
+
+            # Back-translation: ошибки отдельных текстов augment_many обрабатывает сам,
+            # исключение здесь — сбой всей пачки (OOM, упавший воркер): прогон прерывается
+            # до checkpoint, и повторный запуск переведёт пачку заново
+            bt_texts: List[List[str]] = self._augment_many(texts)
+
+            out: List[Dict[str, Any]] = []
+            for sample, variants in zip(samples, bt_texts):
+                # Оригинальная запись (с сохранёнными input_ids, если они есть)
+                out.append(sample)
+                category: str = sample.get('category', '')  # type: ignore
+                out.extend({'category': category, 'text': aug_text} for aug_text in variants)
+            yield from self._unique(out)
+
+            consumed += len(samples)
+            if checkpoint is not None:
+                checkpoint(consumed, {})
+
+        logger.info("Back-translation аугментация завершена.")
+
+    def iter_planned(
+        self,
+        data: Iterable[Dict[str, Any]],
+        plan: AugmentationPlan,
+        start: int = 0,
+        produced: Optional[Dict[str, int]] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        deficits: Optional[Dict[str, int]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Отдаём все записи и back-translation варианты только для записей из плана.
+        Перевод категории прекращается, как только принятых вариантов хватает до min_examples.
+        Фильтр почти-дубликатов (если задан) применяется здесь же, чтобы в счёт шли
+        только варианты, которые попадут в выходной файл.
+
+        :param data: записи в том же порядке, что и при построении плана (при продолжении —
+            начиная с записи номер start).
+        :param plan: план AugmentationPlanner.
+        :param start: сколько входных записей уже обработано прошлым прогоном.
+        :param produced: принятые прошлым прогоном варианты по категориям.
+        :param checkpoint: вызывается после каждого перевода пачки, когда всё отданное уже забрано;
+            состояние — {"produced": ..., "deficits": ...}.
+        :param deficits: дефициты категорий, уточнённые прошлым прогоном (None — из плана).
+        """
+        logger.info("Начинаем back-translation аугментацию по плану...")
+        produced = defaultdict(int, produced or {})
+        # план считал записи после фильтра дубликатов; если здесь фильтр отбросил запись,
+        # которую план учёл (например, как дубликат уже выданного варианта), цель категории растёт
+        deficits = dict(deficits if deficits is not None else plan.deficits)
+        pending: List[Tuple[Dict[str, Any], int]] = []
+        unique = self._unique
+
+        def translate() -> Iterator[Dict[str, Any]]:
+            # категории, уже добравшие цель, не переводятся
+            todo = [
+                (s, r) for s, r in pending
+                if produced[s.get('category', '')] < deficits[s.get('category', '')]  # type: ignore
+            ]
+            pending.clear()
+            if not todo:
+                return
+            # сбой всей пачки прерывает прогон до checkpoint (см. iter_augmented)
+            bt_texts: List[List[str]] = self._augment_many(
+                [s.get('text', '') for s, _ in todo], rounds=[r for _, r in todo]  # type: ignore
+            )
+            variants = [
+                {'category': s.get('category', ''), 'text': text}
+                for (s, _), texts in zip(todo, bt_texts) for text in texts
+            ]
+            for variant in unique(variants):
+                category: str = variant['category']  # type: ignore
+                if produced[category] < deficits[category]:
+                    produced[category] += 1
+                    yield variant
+
+        consumed = start
+        for chunk in batched(enumerate(data, start), self.bt_batch_samples):
+            kept = {id(sample) for sample in unique([sample for _, sample in chunk])}
+            for i, sample in chunk:
+                if id(sample) not in kept:
+                    category: str = sample.get('category', '')  # type: ignore
+                    if i not in plan.skipped and category in deficits:
+                        deficits[category] += 1
+                    continue
+                yield sample
+                if i in plan.rounds:
+                    pending.append((sample, plan.rounds[i]))
+            consumed = chunk[-1][0] + 1
+            if len(pending) >= self.call_samples:
+                yield from translate()
+                if checkpoint is not None:
+                    checkpoint(consumed, {"produced": dict(produced), "deficits": deficits})
+        yield from translate()
+        if checkpoint is not None:
+            checkpoint(consumed, {"produced": dict(produced), "deficits": deficits})
+
+        logger.info(
+            f"Back-translation по плану завершена: вариантов {dict(produced)} при дефиците {deficits}, "
+            f"переводов выполнено {self.bt_augmenter.translated}"
+        )
 
     def augment_data(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Аугментируем данные с помощью back-translation."""
         try:
-            logger.info("Начинаем back-translation аугментацию...")
-            augmented_data: List[Dict[str, Any]] = []
-
-            for sample in data:
-                category: str = sample.get('category', '')  # type: ignore
-                text: str = sample.get('text', '')  # type: ignore
-
-                # Оригинальный текст
-                augmented_data.append({'category': category, 'text': text})
-
-                # Back-translation
-                try:
-                    bt_texts: List[str] = self.bt_augmenter.augment(text)
-                    for aug_text in bt_texts:
-                        augmented_data.append({'category': category, 'text': aug_text})
-                except Exception as e:
-                    logger.error(f"Ошибка в back-translation аугментации: {e}")
-                    logger.error(traceback.format_exc())
-
-            logger.info("Back-translation аугментация завершена.")
-            return augmented_data
+            return list(self.iter_augmented(data))
         except Exception as e:
             logger.error(f"Ошибка при аугментации данных: {e}")
             logger.error(traceback.format_exc())
@@ -86,16 +252,19 @@ class DataAugmentationPipeline:
 
     def balance_data(
         self,
-        augmented_data: List[Dict[str, Any]]
+        augmented_data: Iterable[Dict[str, Any]]
     ) -> Dict[str, int]:
         """Проверяем, хватает ли примеров в каждой категории."""
+        counts: Dict[str, int] = defaultdict(int)
+        for sample in augmented_data:
+            counts[sample.get('category', '')] += 1  # type: ignore
+        return self.balance_counts(counts)
+
+    def balance_counts(self, counts: Dict[str, int]) -> Dict[str, int]:
+        """Проверяем, хватает ли примеров в каждой категории, по уже посчитанным количествам."""
         try:
             logger.info("Проверка на минимальное количество примеров...")
 
-            counts: Dict[str, int] = defaultdict(int)
-            for sample in augmented_data:
-                counts[sample.get('category', '')] += 1  # type: ignore
-
             missing: Dict[str, int] = {}
             for cat, cnt in counts.items():
                 if cnt < self.min_examples:
@@ -112,23 +281,110 @@ class DataAugmentationPipeline:
             logger.error(f"Ошибка при проверке баланса данных: {e}")
             raise
 
+    def iter_plan_records(self) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Записи входа для подсчёта плана: почти-дубликаты (отдельным фильтром с теми же
+        параметрами) заменены на None, чтобы план видел столько примеров, сколько попадёт в вывод.
+        """
+        data = self.iter_data()
+        if self.dedup is None:
+            yield from data
+            return
+        counting = self.dedup.empty_copy()
+        for chunk in batched(data, counting.batch_size):
+            kept = {id(sample) for sample in counting.filter(chunk)}
+            for sample in chunk:
+                yield sample if id(sample) in kept else None
+
+    def settings(self) -> Dict[str, Any]:
+        """Настройки, от которых зависит результат (часть отпечатка для продолжения прогона)."""
+        aug = self.bt_augmenter
+        return {
+            "min_examples": self.min_examples,
+            "rounds": aug.rounds,
+            "beam_size": aug.beam_size,
+            "max_length": aug.max_length,
+            "max_segment_tokens": aug.max_segment_tokens,
+            "plan": self.plan,
+            "oversample": self.bt_oversample,
+            "batch_samples": self.bt_batch_samples,
+            "dedup": None if self.dedup is None else [
+                self.dedup.threshold, self.dedup.num_perm, self.dedup.shingle_size
+            ],
+        }
+
     def run(self) -> None:
         """Запуск полного пайплайна."""
+        progress: Optional[AugmentationProgress] = None
         try:
-            data: List[Dict[str, Any]] = self.load_data()
-            augmented: List[Dict[str, Any]] = self.augment_data(data)
-            missing_info: Dict[str, int] = self.balance_data(augmented)
+            # Чтение, аугментация и запись идут потоком: в памяти одна запись за раз
+            counts: Dict[str, int] = defaultdict(int)
+
+            def counted(samples: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+                for sample in samples:
+                    counts[sample.get('category', '')] += 1  # type: ignore
+                    yield sample
+
+            cursor: Dict[str, Any] = {"consumed": 0, "state": {}}
+            checkpoint: Optional[Checkpoint] = None
+            if self.resume:
+                progress = AugmentationProgress(self.output_json, input_fingerprint(self.input_json, self.settings()))
+                cursor = progress.load()
+                progress.open()
+                checkpoint = progress.checkpoint
+                # записи прошлого прогона: счётчики категорий и индекс фильтра дубликатов
+                for sample in progress.written():
+                    counts[sample.get('category', '')] += 1  # type: ignore
+                if self.dedup is not None:
+                    for _ in self.dedup.filter(progress.written()):
+                        pass
+            start: int = cursor["consumed"]
+            data = islice(self.iter_data(), start, None)
+
+            samples: Iterable[Dict[str, Any]]
+            if self.plan:
+                # первый проход — подсчёт категорий после фильтра дубликатов, второй — аугментация по плану
+                planner = AugmentationPlanner(self.min_examples, self.bt_augmenter.rounds, self.bt_oversample)
+                samples = self.iter_planned(
+                    data, planner.plan(self.iter_plan_records()), start,
+                    produced=cursor["state"].get("produced"), checkpoint=checkpoint,
+                    deficits=cursor["state"].get("deficits")
+                )
+            else:
+                samples = self.iter_augmented(data, start, checkpoint=checkpoint)
+
+            if progress is not None:
+                for sample in counted(samples):
+                    progress.write(sample)
+                progress.finish(self.saver)
+            else:
+                self.save_data(counted(samples))
+            if self.bt_augmenter.cache is not None:
+                cache = self.bt_augmenter.cache
+                logger.info(f"Кэш переводов {cache.path}: попаданий {cache.hits}, промахов {cache.misses}")
+            if self.dedup is not None:
+                logger.info(
+                    f"Почти-дубликатов отброшено: {self.dedup.duplicates} из {self.dedup.seen} записей"
+                )
+            missing_info: Dict[str, int] = self.balance_counts(counts)
 
             if missing_info:
                 logger.warning("Недостаточно данных для некоторых категорий:")
                 for cat, miss in missing_info.items():
                     logger.warning(f"  - {cat}: {miss} примеров не хватает.")
 
-            self.save_data(augmented)
             logger.info("Пайплайн завершен успешно.")
 
         except Exception as e:
             logger.error(f"Процесс завершился с ошибкой: {e}")
+            logger.error(traceback.format_exc())
+            if progress is not None:
+                logger.info(f"Прогресс сохранён в {progress.cursor_path}: повторный запуск продолжит с него")
+        finally:
+            if progress is not None:
+                progress.close()
+            if self.parallel is not None:
+                self.parallel.close()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,24 @@
-from typing import List
+import math
+import re
+from typing import Dict, List, Optional
 from transformers import MarianMTModel, MarianTokenizer
 import torch
 
+from src.data_augmentation.translation_cache import TranslationCache
+from src.processing.chunker import SENTENCE_TERMINATORS
+from src.utils.logger_loader import LoggerLoader
+from src.utils.model_registry import get_registry
+
+logger = LoggerLoader().get_logger()
+
+# Граница предложений: пробелы после знака конца предложения
+_SENTENCE_BOUNDARY = re.compile(rf"(?<=[{re.escape(SENTENCE_TERMINATORS)}])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Делит текст на предложения по знакам конца предложения, за которыми идёт пробел."""
+    return [sentence for sentence in _SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
 
 class BackTranslationAugmenter:
     def __init__(
@@ -12,54 +29,246 @@ class BackTranslationAugmenter:
         model_name_template: str = "Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}",
         device: str = None,
         beam_size: int = 5,
+        max_length: int = 512,
+        max_batch_tokens: int = 4096,
+        cache: Optional[TranslationCache] = None,
+        max_segment_tokens: Optional[int] = 128,
     ) -> None:
         """
         src_lang: исходный язык (например, 'ru')
         mid_lang: промежуточный язык (например, 'en')
         rounds: количество проходов back-translation
         beam_size: размер beam search для генерации
+        max_length: предел длины входа и перевода в токенах
+        max_batch_tokens: бюджет батча augment_many — число токенов входа с учётом padding
+        cache: персистентный кэш переводов (None — без кэша)
+        max_segment_tokens: бюджет сегмента — длинный текст переводится группами предложений
+            не длиннее этого числа токенов (None или 0 — текст целиком)
         """
         self.src_lang = src_lang
         self.mid_lang = mid_lang
         self.rounds = rounds
         self.beam_size = beam_size
+        self.max_length = max_length
+        self.max_batch_tokens = max_batch_tokens
+        self.cache = cache
+        self.max_segment_tokens = max_segment_tokens
+        # Число выполненных моделью переводов (сегмент × направление) — мера затраченных вычислений
+        self.translated = 0
 
         # Определяем устройство: GPU если доступно
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
 
-        # Загружаем модели и токенизаторы
-        self._model_src2mid = MarianMTModel.from_pretrained(
-            model_name_template.format(src_lang=src_lang, tgt_lang=mid_lang)
-        ).to(self.device)
-        self._tokenizer_src2mid = MarianTokenizer.from_pretrained(
-            model_name_template.format(src_lang=src_lang, tgt_lang=mid_lang)
-        )
+        # Модели и токенизаторы берём из общего реестра: повторное создание
+        # аугментатора в том же процессе не перезагружает веса
+        registry = get_registry()
+        src2mid = model_name_template.format(src_lang=src_lang, tgt_lang=mid_lang)
+        mid2src = model_name_template.format(src_lang=mid_lang, tgt_lang=src_lang)
+        self._name_src2mid = src2mid
+        self._name_mid2src = mid2src
 
-        self._model_mid2src = MarianMTModel.from_pretrained(
-            model_name_template.format(src_lang=mid_lang, tgt_lang=src_lang)
-        ).to(self.device)
-        self._tokenizer_mid2src = MarianTokenizer.from_pretrained(
-            model_name_template.format(src_lang=mid_lang, tgt_lang=src_lang)
-        )
+        self._model_src2mid = registry.model(MarianMTModel, src2mid, device=self.device)
+        self._tokenizer_src2mid = registry.tokenizer(src2mid, MarianTokenizer)
+
+        self._model_mid2src = registry.model(MarianMTModel, mid2src, device=self.device)
+        self._tokenizer_mid2src = registry.tokenizer(mid2src, MarianTokenizer)
 
     def _translate(self, text: str, model: MarianMTModel, tokenizer: MarianTokenizer) -> str:
         """Выполняет перевод одного текста на модель и токенизатор."""
+        return self._generate([text], model, tokenizer)[0]
+
+    def _generate(self, texts: List[str], model: MarianMTModel, tokenizer: MarianTokenizer) -> List[str]:
+        """Переводит один батч текстов (с padding до самого длинного)."""
         batch = tokenizer(
-            [text],
+            texts,
             return_tensors="pt",
             padding=True,
-            truncation=True,       # ← обрезание для более 512 токенов
-            max_length=512         # ← максимальная длинна
+            truncation=True,       # ← обрезание для более max_length токенов
+            max_length=self.max_length
         ).to(self.device)
 
-        translated = model.generate(
-            **batch,
-            num_beams=self.beam_size,
-            max_length=512,
-            early_stopping=True,
+        with torch.inference_mode():
+            translated = model.generate(
+                **batch,
+                num_beams=self.beam_size,
+                max_length=self.max_length,
+                early_stopping=True,
+            )
+        return tokenizer.batch_decode(translated, skip_special_tokens=True)
+
+    def length_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Группирует индексы текстов в батчи по длине: тексты сортируются по убыванию длины
+        и набираются в батч, пока (размер батча × длина самого длинного) ≤ max_batch_tokens.
+        Тексты близкой длины попадают в один батч — padding почти не тратит вычислений.
+        Текст длиннее бюджета идёт отдельным батчем.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for i in order:
+            # первый (самый длинный) текст батча задаёт его длину
+            if current and (len(current) + 1) * max(lengths[current[0]], 1) > self.max_batch_tokens:
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    def segment(self, texts: List[str], tokenizer: MarianTokenizer) -> List[List[str]]:
+        """
+        Делит каждый текст на сегменты не длиннее max_segment_tokens токенов: соседние
+        предложения собираются в группу, пока она укладывается в бюджет; предложение
+        длиннее бюджета (например, субтитры без пунктуации) делится по словам на равные части.
+        Текст, который укладывается в бюджет, остаётся одним сегментом.
+        """
+        budget = self.max_segment_tokens
+        if not budget or not texts:
+            return [[text] for text in texts]
+
+        def lengths(items: List[str]) -> List[int]:
+            return [len(ids) for ids in tokenizer(items)["input_ids"]] if items else []
+
+        # предложения длинных текстов; длины всех предложений считаются одним вызовом токенизатора
+        split = [split_sentences(text) if n > budget else [] for text, n in zip(texts, lengths(texts))]
+        sentence_lengths = iter(lengths([sentence for sentences in split for sentence in sentences]))
+
+        segmented: List[List[str]] = []
+        for text, sentences in zip(texts, split):
+            if not sentences:
+                segmented.append([text])
+                continue
+            units: List[str] = []
+            unit_lengths: List[int] = []
+            for sentence in sentences:
+                n = next(sentence_lengths)
+                words = sentence.split()
+                parts = min(len(words), math.ceil(n / budget))
+                bounds = [round(i * len(words) / parts) for i in range(parts + 1)]
+                units.extend(" ".join(words[a:b]) for a, b in zip(bounds, bounds[1:]))
+                unit_lengths.extend([math.ceil(n / parts)] * parts)
+
+            # соседние предложения (части предложения) собираются в сегменты под бюджет
+            segments: List[str] = []
+            current: List[str] = []
+            used = 0
+            for unit, n in zip(units, unit_lengths):
+                if current and used + n > budget:
+                    segments.append(" ".join(current))
+                    current, used = [], 0
+                current.append(unit)
+                used += n
+            segments.append(" ".join(current))
+            segmented.append(segments)
+        return segmented
+
+    def _translate_batch(
+        self, texts: List[str], model: MarianMTModel, tokenizer: MarianTokenizer, model_name: Optional[str] = None
+    ) -> List[Optional[str]]:
+        """
+        Переводит список текстов; порядок результатов совпадает с порядком texts.
+        Длинные тексты делятся на сегменты (segment), сегменты всех текстов переводятся
+        вместе и склеиваются обратно; текст, у которого не перевёлся хотя бы один сегмент, — None.
+        """
+        segmented = self.segment(texts, tokenizer)
+        translated = self._translate_segments(
+            [segment for segments in segmented for segment in segments], model, tokenizer, model_name
         )
-        output = tokenizer.batch_decode(translated, skip_special_tokens=True)
-        return output[0]
+        results: List[Optional[str]] = []
+        start = 0
+        for segments in segmented:
+            parts = translated[start:start + len(segments)]
+            start += len(segments)
+            results.append(None if any(part is None for part in parts) else " ".join(parts))
+        return results
+
+    def _translate_segments(
+        self, texts: List[str], model: MarianMTModel, tokenizer: MarianTokenizer, model_name: Optional[str] = None
+    ) -> List[Optional[str]]:
+        """
+        Переводит список текстов (сегментов) без деления; порядок результатов совпадает с порядком texts.
+        Одинаковые тексты переводятся один раз; с кэшем (и model_name) уже переведённые
+        берутся из кэша, а новые переводы туда сохраняются.
+        """
+        if not texts:
+            return []
+        unique = list(dict.fromkeys(texts))
+        cached: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        if self.cache is not None and model_name is not None:
+            keys = {t: TranslationCache.key(t, model_name, self.beam_size, self.max_length) for t in unique}
+            found = self.cache.get_many(list(keys.values()))
+            cached = {t: found[k] for t, k in keys.items() if k in found}
+
+        todo = [t for t in unique if t not in cached]
+        translated = dict(zip(todo, self._translate_uncached(todo, model, tokenizer)))
+        if keys:
+            self.cache.put_many((keys[t], model_name, out) for t, out in translated.items() if out is not None)
+        translated.update(cached)
+        return [translated[t] for t in texts]
+
+    def _translate_uncached(
+        self, texts: List[str], model: MarianMTModel, tokenizer: MarianTokenizer
+    ) -> List[Optional[str]]:
+        """
+        Переводит список текстов батчами под бюджет токенов; порядок результатов
+        совпадает с порядком texts. Если батч падает, его тексты переводятся по одному;
+        не переведённые тексты — None.
+        """
+        if not texts:
+            return []
+        lengths = [
+            len(ids)
+            for ids in tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+        ]
+        results: List[Optional[str]] = [None] * len(texts)
+        self.translated += len(texts)
+        for batch in self.length_batches(lengths):
+            try:
+                for i, translated in zip(batch, self._generate([texts[i] for i in batch], model, tokenizer)):
+                    results[i] = translated
+            except Exception as e:
+                logger.warning(f"[!] Ошибка при переводе батча из {len(batch)} текстов, переводим по одному: {e}")
+                for i in batch:
+                    try:
+                        results[i] = self._translate(texts[i], model, tokenizer)
+                    except Exception as e:
+                        logger.warning(f"[!] Ошибка при back-translation: {e}")
+        return results
+
+    def augment_many(self, texts: List[str], rounds: Optional[List[int]] = None) -> List[List[str]]:
+        """
+        Back-translation для списка текстов: оба направления перевода выполняются батчами.
+        Раунды идут цепочкой по всему списку: вход раунда k — результаты раунда k−1
+        тех текстов, перевод которых удался.
+
+        :param texts: исходные тексты.
+        :param rounds: число раундов для каждого текста (None — self.rounds для всех).
+        :return: для каждого текста список его вариантов (по одному на удачный раунд).
+        """
+        rounds = rounds if rounds is not None else [self.rounds] * len(texts)
+        augmented: List[List[str]] = [[] for _ in texts]
+        current = [(i, text) for i, text in enumerate(texts) if text and rounds[i] > 0]
+
+        for r in range(max(rounds, default=0)):
+            current = [(i, t) for i, t in current if rounds[i] > r]
+            if not current:
+                break
+            mids = self._translate_batch(
+                [t for _, t in current], self._model_src2mid, self._tokenizer_src2mid, self._name_src2mid
+            )
+            ok = [(i, mid) for (i, _), mid in zip(current, mids) if mid is not None]
+            backs = self._translate_batch(
+                [m for _, m in ok], self._model_mid2src, self._tokenizer_mid2src, self._name_mid2src
+            )
+            current = []
+            for (i, _), back in zip(ok, backs):
+                if back is not None:
+                    augmented[i].append(back)
+                    current.append((i, back))
+
+        return augmented
 
     def augment(self, text: str) -> List[str]:
         """
@@ -67,20 +276,4 @@ class BackTranslationAugmenter:
         Будет выполнено `rounds` проходов:
         text -> mid_lang -> src_lang
         """
-        augmented_texts: List[str] = []
-        current_texts = [text]
-
-        for _ in range(self.rounds):
-            new_texts: List[str] = []
-            for t in current_texts:
-                try:
-                    mid = self._translate(t, self._model_src2mid, self._tokenizer_src2mid)
-                    back = self._translate(mid, self._model_mid2src, self._tokenizer_mid2src)
-                    new_texts.append(back)
-                    augmented_texts.append(back)
-                except Exception as e:
-                    print(f"[!] Ошибка при back-translation: {e}")
-                    continue
-            current_texts = new_texts
-
-        return augmented_texts
+        return self.augment_many([text])[0]
@@ -0,0 +1,145 @@
+import gc
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from src.cpu_profile import core_slices, physical_cores, pin_to_cores
+from src.data_augmentation.bt_augmenter import BackTranslationAugmenter
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+# Аугментатор родительского процесса: воркеры получают его (вместе с весами моделей) через fork
+_AUGMENTER: Optional[BackTranslationAugmenter] = None
+
+
+def _init_worker(cores_queue) -> None:
+    """Закрепляет процесс-воркер за своим набором ядер."""
+    pin_to_cores(cores_queue.get())
+
+
+def _augment_shard(texts: List[str], rounds: List[int]) -> Tuple[List[List[str]], int, int, int]:
+    """
+    augment_many для части текстов в процессе-воркере.
+
+    :return: варианты и приросты счётчиков воркера (переводов, попаданий и промахов кэша).
+    """
+    aug = _AUGMENTER
+    cache = aug.cache
+    translated = aug.translated
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    result = aug.augment_many(texts, rounds)
+    if cache is None:
+        return result, aug.translated - translated, 0, 0
+    return result, aug.translated - translated, cache.hits - hits, cache.misses - misses
+
+
+def batch_bounds(count: int, size: int) -> List[Tuple[int, int]]:
+    """Границы [start, end) пачек по size элементов подряд в списке длины count (последняя может быть короче)."""
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+class ParallelAugmenter:
+    """
+    Back-translation в пуле процессов: тексты вызова augment_many делятся на целые пачки
+    по batch_samples, каждая пачка целиком уходит одному воркеру (внутри неё augment_many
+    батчует тексты по длине в пределах бюджета токенов, как в одном процессе), результаты
+    склеиваются в исходном порядке. Чтобы каждый воркер получил целую пачку, вызывающий
+    код передаёт за раз batch_samples * workers текстов — накладные расходы пула
+    на вызов делятся на все воркеры.
+    Результат не зависит от числа воркеров — перевод текста не зависит от соседей по батчу
+    (padding маскируется), а порядок и решения пайплайна (план, фильтр дубликатов,
+    курсор прогресса) остаются в родительском процессе.
+
+    Воркеры создаются через fork после загрузки моделей: веса opus-mt-ru-en/en-ru
+    в каждом воркере — те же страницы памяти родителя (copy-on-write). Веса лежат
+    в хранилищах тензоров, которые при инференсе не изменяются, а gc.freeze() не даёт
+    сборщику мусора трогать заголовки объектов — страницы не копируются.
+    Родительский процесс до запуска пула сам не переводит: форк процесса с уже
+    работающими потоками torch может зависнуть.
+
+    Каждый воркер закреплён за своим набором ядер с тем же числом потоков torch.
+    Кэш переводов воркеры открывают каждый своим соединением SQLite.
+    """
+
+    def __init__(
+        self,
+        augmenter: BackTranslationAugmenter,
+        workers: int,
+        threads: Optional[int] = None,
+        batch_samples: int = 64,
+    ):
+        """
+        :param augmenter: аугментатор с загруженными моделями (на CPU).
+        :param workers: число процессов пула.
+        :param threads: ядер (потоков torch) на воркер; None — поровну физических ядер.
+        :param batch_samples: текстов в пачке одного воркера.
+        """
+        self.augmenter = augmenter
+        self.workers = workers
+        self.batch_samples = batch_samples
+        self.threads = threads or max(1, physical_cores() // workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._broken = False
+
+    def start(self) -> None:
+        global _AUGMENTER
+        if self._pool is not None:
+            return
+        _AUGMENTER = self.augmenter
+        if self.augmenter.cache is not None:
+            # база (режим WAL и таблица) создаётся до форка: иначе воркеры создают её одновременно
+            self.augmenter.cache.conn
+        # объекты, созданные до форка, сборщик мусора больше не обходит
+        gc.freeze()
+        ctx = mp.get_context("fork")
+        cores_queue = ctx.Queue()
+        slices = core_slices(self.workers, self.threads)
+        for cores in slices:
+            cores_queue.put(cores)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=ctx, initializer=_init_worker, initargs=(cores_queue,)
+        )
+        logger.info(
+            f"🧵 Back-translation в {self.workers} процессах, ядра воркеров: "
+            f"{'; '.join(','.join(map(str, cores)) for cores in slices)}"
+        )
+
+    def augment_many(self, texts: List[str], rounds: Optional[List[int]] = None) -> List[List[str]]:
+        """То же, что BackTranslationAugmenter.augment_many, с переводом пачек текстов в воркерах."""
+        rounds = rounds if rounds is not None else [self.augmenter.rounds] * len(texts)
+        if self._broken:
+            return self.augmenter.augment_many(texts, rounds)
+        if not texts:
+            return []
+        bounds = batch_bounds(len(texts), self.batch_samples)
+        self.start()
+        try:
+            parts = list(self._pool.map(
+                _augment_shard, [texts[s:e] for s, e in bounds], [rounds[s:e] for s, e in bounds]
+            ))
+        except BrokenProcessPool as e:
+            # воркер упал (например, OOM): дальше переводим в родительском процессе
+            logger.error(f"Пул back-translation остановлен ({e}), продолжаем в одном процессе")
+            self.close()
+            self._broken = True
+            return self.augmenter.augment_many(texts, rounds)
+
+        augmented: List[List[str]] = []
+        cache = self.augmenter.cache
+        for result, translated, hits, misses in parts:
+            augmented.extend(result)
+            self.augmenter.translated += translated
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+        return augmented
+
+    def close(self) -> None:
+        global _AUGMENTER
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        _AUGMENTER = None
+        gc.unfreeze()
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.logger_loader import LoggerLoader
+
+
+class TranslationCache:
+    """
+    Персистентный кэш переводов в SQLite.
+
+    Ключ — sha256 от имени модели направления (например, opus-mt-ru-en), beam size,
+    предела длины и исходного текста. Раунды back-translation кэшируются по цепочке:
+    вход раунда k — результат раунда k−1, поэтому повтор прогона (или тот же чанк
+    в другом месте датасета) не переводит ничего, что уже переводилось с теми же настройками.
+
+    Записи фиксируются пачкой на каждый put_many (журнал WAL): прерванный прогон
+    теряет только перевод батча, который был в работе.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: путь к файлу базы SQLite.
+        """
+        self.path = path
+        self.logger = LoggerLoader().get_logger()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # соединение SQLite нельзя переносить через fork: в дочернем процессе открываем своё
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, translation TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def key(text: str, model: str, beam_size: int, max_length: int) -> str:
+        payload = "\0".join((model, str(beam_size), str(max_length), text))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Найденные переводы {ключ: перевод}; отсутствующих ключей в ответе нет."""
+        found: Dict[str, str] = {}
+        unique = list(dict.fromkeys(keys))
+        # ограничение SQLite на число параметров запроса
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, translation FROM translations WHERE key IN ({','.join('?' * len(part))})", part
+            )
+            found.update(rows.fetchall())
+        self.hits += sum(key in found for key in keys)
+        self.misses += sum(key not in found for key in keys)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, str, str]]) -> None:
+        """Сохраняет переводы (ключ, модель, перевод) одной транзакцией."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, model, translation, created) VALUES (?, ?, ?, ?)",
+                [(key, model, translation, now) for key, model, translation in items],
+            )
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def close(self) -> None:
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
@@ -1,10 +1,20 @@
-import json
+import numpy as np
+import random
 import torch
-from torch.utils.data import Dataset
-from transformers import AutoTokenizer
+from torch.utils.data import Dataset, IterableDataset, get_worker_info
 import os
+from itertools import islice
+from typing import Any, Dict, Iterator, List
 from torch.utils.data import DataLoader
 
+from src.batching import PaddingCollator
+from src.binary_dataset import BinaryDataset, token_dtype
+from src.token_cache import TokenCache
+from src.utils.dataset_io import dataset_files, iter_records
+from src.utils.logger_loader import LoggerLoader
+from src.utils.model_registry import get_registry
+from src.utils.tokenizer_fingerprint import tokenizer_fingerprint
+
 
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
@@ -14,63 +24,139 @@ class TextDataset(Dataset):
         """
         Загружает данные из JSON, токенизирует текст и преобразует категории в числовые индексы.
 
-        :param json_path: путь к JSON-файлу с данными.
-        :param config: конфиг с категориями.
+        Записи, собранные YouTubeDatasetBuilder, содержат готовые input_ids и отпечаток токенизатора:
+        если отпечаток совпадает с токенизатором model_name, ID берутся как есть.
+        Остальные тексты токенизируются один раз здесь же, одним пакетным вызовом,
+        поэтому в __getitem__ токенизатор не вызывается.
+
+        Вместо JSON можно передать каталог бинарного датасета (см. src/binary_dataset.py):
+        тогда ID и метки читаются из memmap без загрузки корпуса в память.
+        Если в config["dataset"] включён cache, JSON токенизируется один раз в TokenCache,
+        а дальше открывается бинарная версия из кэша.
+        В обоих случаях примеры хранятся одним плоским массивом токенов с индексом.
+
+        :param json_path: путь к JSON/JSONL-файлу с данными, логический путь шардов
+                          или каталог бинарного датасета.
+        :param config: конфиг с категориями (и, опционально, секцией dataset с настройками кэша).
         :param model_name: имя предобученной модели (используется для загрузки соответствующего токенизатора).
         :param max_length: максимальная длина токенизированного текста (по умолчанию 512).
         """
-        with open(json_path, "r", encoding="utf-8") as f:
-            self.data = json.load(f)
-
         # Загружаем список категорий из конфига и создаем маппинг категория -> индекс
         self.config = config
         self.label_to_idx = {cat: idx for idx, cat in enumerate(self.config["categories"])}
         self.idx_to_label = {idx: cat for cat, idx in self.label_to_idx.items()}
 
         # Загружаем токенизатор от модели
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.tokenizer = get_registry().tokenizer(model_name)
         self.max_length = max_length
 
-        # Проверяем, что JSON содержит нужные ключи
-        for item in self.data:
+        dataset_cfg = self.config.get("dataset") or {}
+        if BinaryDataset.is_binary(json_path):
+            self.store = self._open_binary(json_path)
+        elif dataset_cfg.get("cache"):
+            # токенизированная версия из дискового кэша (строится при первом обращении)
+            cache = TokenCache(
+                dataset_cfg["cache_dir"],
+                max_bytes=int(dataset_cfg["cache_max_gb"] * 1024 ** 3) or None,
+            )
+            path = cache.get_or_build(json_path, self.tokenizer, self.label_to_idx, self.max_length)
+            self.store = self._open_binary(path)
+        else:
+            self.store = self._load_json(json_path)
+        self.labels = self.store.labels
+
+    def _open_binary(self, path: str) -> BinaryDataset:
+        """Открывает бинарный датасет и проверяет, что он совместим с моделью и конфигом."""
+        store = BinaryDataset.open(path)
+        meta = store.meta
+        if meta.get("tokenizer") != tokenizer_fingerprint(self.tokenizer):
+            raise ValueError(
+                f"Бинарный датасет {path} построен другим токенизатором ({meta.get('tokenizer_name')}), "
+                "пересоберите его из JSON"
+            )
+        if meta.get("categories") != list(self.label_to_idx):
+            raise ValueError(f"Категории бинарного датасета {path} не совпадают с конфигом")
+        if meta.get("longest", 0) > self.max_length:
+            raise ValueError(
+                f"В бинарном датасете {path} есть примеры длиннее max_length={self.max_length} "
+                f"({meta['longest']} токенов), пересоберите его с меньшим max_length"
+            )
+        LoggerLoader().get_logger().info(f"Бинарный датасет {path}: {len(store)} примеров (memmap)")
+        return store
+
+    def _load_json(self, json_path: str) -> BinaryDataset:
+        """
+        Читает записи потоково и упаковывает ID в плоский массив.
+        ID берутся сохранённые при сборке датасета, если они получены тем же токенизатором
+        и влезают в max_length, иначе текст токенизируется.
+        """
+        fingerprint = tokenizer_fingerprint(self.tokenizer)
+        input_ids: List[List[int]] = []
+        labels: List[int] = []
+        to_tokenize: List[int] = []
+        texts: List[str] = []
+        for item in iter_records(json_path):
+            # Проверяем, что JSON содержит нужные ключи
             if "text" not in item or "category" not in item:
                 raise ValueError("JSON-файл должен содержать ключи 'text' и 'category'.")
+            # Преобразуем категории в индексы
+            labels.append(self.label_to_idx[item["category"]])
+            ids = item.get("input_ids")
+            if ids and item.get("tokenizer") == fingerprint and len(ids) <= self.max_length:
+                input_ids.append(ids)
+            else:
+                # тексты держим только для тех примеров, которые нужно токенизировать
+                to_tokenize.append(len(input_ids))
+                texts.append(item["text"])
+                input_ids.append([])
+
+        if texts:
+            encoding = self.tokenizer(
+                texts,
+                truncation=True,
+                max_length=self.max_length,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )
+            for i, ids in zip(to_tokenize, encoding["input_ids"]):
+                input_ids[i] = ids
 
-        # Извлекаем тексты и метки, преобразуем категории в индексы
-        self.texts = [item["text"] for item in self.data]
-        self.labels = [self.label_to_idx[item["category"]] for item in self.data]
+        LoggerLoader().get_logger().info(
+            f"Готовые input_ids: {len(input_ids) - len(to_tokenize)}/{len(input_ids)}, "
+            f"токенизировано заново: {len(to_tokenize)}"
+        )
+        return BinaryDataset.pack(input_ids, labels, dtype=token_dtype(len(self.tokenizer)))
 
     def __len__(self):
         """ Возвращает количество примеров в датасете. """
-        return len(self.texts)
+        return len(self.store)
 
     def __getitem__(self, idx):
         """
         Возвращает токенизированный текст и числовой индекс категории.
 
         :param idx: индекс примера.
-        :return: словарь с токенизированным текстом (input_ids, attention_mask и т. д.) и метка категории (labels).
+        :return: словарь с ID токенов без padding (input_ids) и метка категории (labels).
         """
-        text = self.texts[idx]
-        label = self.labels[idx]
-
-        # Токенизируем текст с padding и truncation
-        encoding = self.tokenizer(
-            text,
-            padding="max_length",  # Дополняем до max_length, чтобы все примеры были одной длины
-            truncation=True,  # Обрезаем слишком длинные тексты
-            max_length=self.max_length,
-            return_tensors="pt"  # Возвращаем тензоры PyTorch
-        )
+        label = self.store.label(idx)
 
-        # Убираем лишнюю размерность (по умолчанию tokenizer возвращает тензор с размерностью [1, seq_length])
-        encoding = {key: val.squeeze(0) for key, val in encoding.items()}
+        # Без padding: батч дополняется до своей максимальной длины в PaddingCollator
+        encoding = {"input_ids": torch.from_numpy(self.store.ids(idx).astype(np.int64))}
 
         # Вставляем метку в словарь
         encoding['labels'] = torch.tensor(label, dtype=torch.long)
 
         return encoding
 
+    @property
+    def lengths(self) -> np.ndarray:
+        """Длины примеров в токенах (для LengthBucketSampler)."""
+        return self.store.lengths
+
+    def collator(self, **kwargs) -> PaddingCollator:
+        """Коллатор с динамическим padding под токенизатор датасета."""
+        return PaddingCollator.from_tokenizer(self.tokenizer, max_length=self.max_length, **kwargs)
+
     def get_label_mapping(self):
         """ Возвращает словарь {категория: индекс}. """
         return self.label_to_idx
@@ -78,27 +164,158 @@ class TextDataset(Dataset):
     @staticmethod
     def collate_fn(batch):
         """
-        Функция объединения батча для DataLoader.
+        Функция объединения батча для DataLoader: динамический padding ID 0
+        (pad-токен BERT-подобных моделей). Под конкретный токенизатор — collator().
+
+        :param batch: список словарей, каждый из которых содержит ID токенов и метку
+        :return: словарь с тензорами input_ids, attention_mask и метками (labels)
+        """
+        return PaddingCollator()(batch)
+
+
+class StreamingTextDataset(IterableDataset):
+    """
+    Потоковый режим для корпусов больше оперативной памяти.
+
+    Записи читаются из JSON/JSONL (и их шардов) по одной, перемешиваются буфером
+    ограниченного размера и токенизируются на лету небольшими пачками; сохранённые
+    при сборке input_ids с совпадающим отпечатком токенизатора берутся как есть.
+    Пиковая память зависит от shuffle_buffer, а не от размера корпуса.
 
-        :param batch: список словарей, каждый из которых содержит токенизированный текст и метку
-        :return: словарь с текстами (dict of tensors) и метками (tensor)
+    Воркеры DataLoader делят поток без повторов: при числе шардов не меньше числа
+    воркеров каждый читает свои шарды, иначе — каждую num_workers-ю запись.
+    Порядок детерминирован по seed и эпохе (set_epoch). Эпоха хранится в разделяемой
+    памяти: persistent-воркеры DataLoader держат свою копию датасета, и set_epoch
+    в главном процессе иначе до них не доходит.
+    """
+
+    def __init__(
+        self,
+        json_path: str,
+        config: dict,
+        model_name: str,
+        max_length: int = 512,
+        shuffle_buffer: int = 10000,
+        shuffle: bool = True,
+        seed: int = 42,
+        tokenize_batch: int = 64,
+    ):
         """
-        # Извлекаем токенизированные тексты
-        batch_texts = {key: torch.stack([item[key] for item in batch]) for key in batch[0] if key != "labels"}
+        :param json_path: путь к JSON/JSONL-файлу с данными (или логический путь шардов).
+        :param config: конфиг с категориями.
+        :param model_name: имя предобученной модели (для токенизатора).
+        :param max_length: максимальная длина токенизированного текста.
+        :param shuffle_buffer: размер буфера перемешивания (в записях).
+        :param shuffle: перемешивать ли поток (для валидации — False).
+        :param seed: базовое зерно перемешивания.
+        :param tokenize_batch: сколько текстов токенизировать за один вызов.
+        """
+        self.json_path = json_path
+        self.config = config
+        self.label_to_idx = {cat: idx for idx, cat in enumerate(self.config["categories"])}
+        self.idx_to_label = {idx: cat for cat, idx in self.label_to_idx.items()}
+
+        self.tokenizer = get_registry().tokenizer(model_name)
+        self.fingerprint = tokenizer_fingerprint(self.tokenizer)
+        self.max_length = max_length
+        self.shuffle_buffer = shuffle_buffer
+        self.shuffle = shuffle
+        self.seed = seed
+        self.tokenize_batch = tokenize_batch
+        self._epoch = torch.zeros(1, dtype=torch.long).share_memory_()
+        self._length = None
+
+    @property
+    def epoch(self) -> int:
+        return int(self._epoch[0])
 
-        # Извлекаем метки и преобразуем их в тензор
-        batch_labels = torch.tensor([item["labels"] for item in batch], dtype=torch.long)
+    def set_epoch(self, epoch: int) -> None:
+        self._epoch[0] = epoch
 
-        # Создаем итоговый словарь с данными для модели
-        batch_texts["labels"] = batch_labels
+    def __len__(self):
+        """Число записей: один потоковый проход при первом обращении (нужно Trainer для расписания)."""
+        if self._length is None:
+            self._length = sum(1 for _ in iter_records(self.json_path))
+        return self._length
+
+    def _worker_records(self) -> Iterator[Dict[str, Any]]:
+        """Записи, приходящиеся на текущий воркер DataLoader, в порядке текущей эпохи."""
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+
+        files = dataset_files(self.json_path)
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(files)
+        if len(files) >= num_workers:
+            for path in files[worker_id::num_workers]:
+                yield from iter_records(path)
+        else:
+            records = (record for path in files for record in iter_records(path))
+            yield from islice(records, worker_id, None, num_workers)
+
+    def _shuffled(self, records: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Перемешивание буфером из shuffle_buffer записей."""
+        if not self.shuffle or self.shuffle_buffer <= 1:
+            yield from records
+            return
+        info = get_worker_info()
+        rng = random.Random((self.seed + self.epoch) * 1000003 + (info.id if info is not None else 0))
+        buffer: List[Dict[str, Any]] = []
+        for record in records:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(record)
+                continue
+            i = rng.randrange(len(buffer))
+            yield buffer[i]
+            buffer[i] = record
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _encode(self, records: List[Dict[str, Any]]) -> Iterator[Dict[str, torch.Tensor]]:
+        """Токенизирует пачку записей (кроме тех, у которых есть подходящие input_ids)."""
+        ids: List[Any] = []
+        texts: List[str] = []
+        for item in records:
+            stored = item.get("input_ids")
+            if stored and item.get("tokenizer") == self.fingerprint and len(stored) <= self.max_length:
+                ids.append(stored)
+            else:
+                ids.append(None)
+                texts.append(item["text"])
+        if texts:
+            encoded = iter(self.tokenizer(
+                texts,
+                truncation=True,
+                max_length=self.max_length,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )["input_ids"])
+            ids = [x if x is not None else next(encoded) for x in ids]
 
-        # Выводим информацию для отладки
-        print(f"batch_texts: {batch_texts}")
+        for item, input_ids in zip(records, ids):
+            yield {
+                "input_ids": torch.tensor(input_ids, dtype=torch.long),
+                "labels": torch.tensor(self.label_to_idx[item["category"]], dtype=torch.long),
+            }
 
-        return batch_texts
+    def __iter__(self) -> Iterator[Dict[str, torch.Tensor]]:
+        records = self._shuffled(self._worker_records())
+        while True:
+            batch = list(islice(records, self.tokenize_batch))
+            if not batch:
+                return
+            yield from self._encode(batch)
+
+    def collator(self, **kwargs) -> PaddingCollator:
+        """Коллатор с динамическим padding под токенизатор датасета."""
+        return PaddingCollator.from_tokenizer(self.tokenizer, max_length=self.max_length, **kwargs)
+
+    def get_label_mapping(self):
+        """ Возвращает словарь {категория: индекс}. """
+        return self.label_to_idx
 
 
-def get_dataloader(json_path, config, model_name, batch_size=8, shuffle=True):
+def get_dataloader(json_path, config, model_name, batch_size=8, shuffle=True, streaming=False, num_workers=0):
     """
     Создает DataLoader для работы с батчами.
 
@@ -107,7 +324,14 @@ def get_dataloader(json_path, config, model_name, batch_size=8, shuffle=True):
     :param model_name: название предобученной модели для токенизации.
     :param batch_size: размер батча (по умолчанию 8).
     :param shuffle: перемешивать данные или нет (по умолчанию True).
+    :param streaming: читать данные потоково (StreamingTextDataset), не загружая их в память.
+    :param num_workers: число процессов DataLoader.
     :return: DataLoader
     """
+    if streaming:
+        dataset = StreamingTextDataset(json_path, config, model_name, shuffle=shuffle)
+        return DataLoader(dataset, batch_size=batch_size, num_workers=num_workers, collate_fn=dataset.collator())
     dataset = TextDataset(json_path, config, model_name)  # Теперь передаем model_name
-    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, collate_fn=TextDataset.collate_fn)
+    return DataLoader(
+        dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers, collate_fn=dataset.collator()
+    )
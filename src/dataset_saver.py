@@ -1,31 +1,59 @@
-import json
-import os
+from typing import Iterable, Optional
+
+from src.utils.dataset_io import DatasetWriter
 from src.utils.logger_loader import LoggerLoader
 
+
 class DatasetSaver:
     """
     Класс для сохранения обработанных данных в JSON-файл.
+    Записи пишутся потоково (DatasetWriter): по мере поступления, с атомарной фиксацией
+    и, при max_shard_bytes, с разбиением на шарды.
     """
 
-    def __init__(self, save_path: str):
+    def __init__(self, save_path: str, max_shard_bytes: Optional[int] = None):
         """
         Инициализация DatasetSaver.
 
-        :param save_path: Путь к файлу, в который будут сохраняться данные.
+        :param save_path: Путь к файлу, в который будут сохраняться данные (.json или .jsonl).
+        :param max_shard_bytes: Максимальный размер одного шарда в байтах (None — один файл).
         """
         self.save_path = save_path
+        self.max_shard_bytes = max_shard_bytes
         self.logger = LoggerLoader().get_logger()
 
-    def save(self, data: list):
+    def writer(self, append: bool = False) -> DatasetWriter:
+        """
+        Открывает потоковую запись в save_path; используется как контекстный менеджер.
+
+        :param append: Дописать записи к уже сохранённому датасету.
+        """
+        return DatasetWriter(self.save_path, max_shard_bytes=self.max_shard_bytes, append=append)
+
+    def save(self, data: Iterable[dict], append: bool = False) -> int:
         """
-        Сохраняет данные в JSON-файл.
+        Сохраняет данные, не собирая их в памяти: data может быть генератором.
+        Если записей нет, существующий файл не перезаписывается.
 
-        :param data: Список словарей, содержащих текст и его категорию.
+        :param data: Список (или итератор) словарей, содержащих текст и его категорию.
+        :param append: Дописать записи к уже сохранённому датасету.
+        :return: Число записанных записей (без учёта уже бывших в файле).
         """
+        writer = None
         try:
-            os.makedirs(os.path.dirname(self.save_path), exist_ok=True)  # Создаем папку, если ее нет
-            with open(self.save_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)  # Сохраняем в JSON с красивым форматированием
-            self.logger.info(f"✅ Датасет успешно сохранен в {self.save_path}")
+            writer = self.writer(append=append)
+            before = writer.count
+            writer.write_many(data)
+            written = writer.count - before
+            if not written:
+                writer.abort()
+                self.logger.warning(f"⚠️ Нет записей для сохранения в {self.save_path}")
+                return 0
+            paths = writer.commit()
+            self.logger.info(f"✅ Датасет успешно сохранен в {', '.join(paths)} ({writer.count} записей)")
+            return written
         except Exception as e:
+            if writer is not None:
+                writer.abort()
             self.logger.error(f"❌ Ошибка при сохранении датасета: {e}")
+            return 0
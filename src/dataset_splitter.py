@@ -0,0 +1,95 @@
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+from src.utils.dataset_io import DatasetWriter, iter_records
+from src.utils.logger_loader import LoggerLoader
+
+
+class DatasetSplitter:
+    """
+    Разбиение датасета на train/val по исходным видео.
+
+    Все чанки одного видео попадают в одну выборку, поэтому текст из валидации
+    не встречается в обучении. Выборка видео определяется стабильным хэшем
+    (seed + video_id): повторный запуск после дозагрузки новых видео не перемещает
+    старые между train и val. Хэш равномерен внутри каждой категории, так что доля
+    валидации выдерживается по категориям (стратификация без подсчётов заранее).
+
+    Датасет читается потоково за один проход и пишется сразу в оба выхода;
+    в памяти держатся только множества video_id для статистики.
+    """
+
+    def __init__(self, val_fraction: float = 0.1, seed: int = 0, max_shard_bytes: Optional[int] = None):
+        """
+        :param val_fraction: доля видео, уходящих в валидацию.
+        :param seed: соль хэша; другая соль даёт другое (но тоже стабильное) разбиение.
+        :param max_shard_bytes: максимальный размер шарда выходных файлов (None — один файл).
+        """
+        if not 0 <= val_fraction < 1:
+            raise ValueError("val_fraction должен быть в диапазоне [0, 1)")
+        self.val_fraction = val_fraction
+        self.seed = seed
+        self.max_shard_bytes = max_shard_bytes
+        self.logger = LoggerLoader().get_logger()
+
+    def group_key(self, record: Dict[str, Any]) -> str:
+        """
+        Ключ группы записи: video_id, а для записей без него (датасеты старых сборок,
+        аугментированные примеры) — хэш текста, т.е. каждая запись сама по себе.
+        """
+        video_id = record.get("video_id")
+        if video_id:
+            return str(video_id)
+        return "text:" + hashlib.sha1(record["text"].encode("utf-8")).hexdigest()
+
+    def is_val(self, group: str) -> bool:
+        """Стабильно относит группу к валидации с вероятностью val_fraction."""
+        digest = hashlib.sha1(f"{self.seed}:{group}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64 < self.val_fraction
+
+    def split(self, input_path: str, train_path: str, val_path: str) -> Dict[str, Dict[str, int]]:
+        """
+        Разбивает input_path на train_path и val_path.
+        Оба выхода фиксируются атомарно только после успешного прохода.
+
+        :return: статистика по категориям: {категория: {"train_videos", "val_videos", "train", "val"}}.
+        """
+        stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"train": 0, "val": 0})
+        videos: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: {"train": set(), "val": set()})
+        ungrouped = 0
+
+        with DatasetWriter(train_path, max_shard_bytes=self.max_shard_bytes) as train, \
+                DatasetWriter(val_path, max_shard_bytes=self.max_shard_bytes) as val:
+            for record in iter_records(input_path):
+                if not record.get("video_id"):
+                    ungrouped += 1
+                group = self.group_key(record)
+                split = "val" if self.is_val(group) else "train"
+                (val if split == "val" else train).write(record)
+                stats[record["category"]][split] += 1
+                videos[record["category"]][split].add(group)
+
+        result = {}
+        for category in sorted(stats):
+            result[category] = {
+                "train_videos": len(videos[category]["train"]),
+                "val_videos": len(videos[category]["val"]),
+                **stats[category],
+            }
+            self.logger.info(
+                f"✂️ {category}: train {result[category]['train']} записей "
+                f"({result[category]['train_videos']} видео), val {result[category]['val']} записей "
+                f"({result[category]['val_videos']} видео)"
+            )
+            if self.val_fraction and not result[category]["val_videos"]:
+                self.logger.warning(f"⚠️ Категория {category} не попала в валидацию: слишком мало видео")
+            if not result[category]["train_videos"]:
+                self.logger.warning(f"⚠️ Категория {category} не попала в обучение: слишком мало видео")
+
+        if ungrouped:
+            self.logger.warning(f"⚠️ Записей без video_id: {ungrouped} — они разбиты поштучно по хэшу текста")
+        self.logger.info(
+            f"✅ Разбиение {input_path}: train {train.count} → {train_path}, val {val.count} → {val_path}"
+        )
+        return result
@@ -1,22 +1,61 @@
 import os
+from typing import List, Optional
+
 import torch
+from torch.utils.data import Sampler
 from transformers import (
-    AutoTokenizer,
     AutoModelForSequenceClassification,
     Trainer,
+    TrainerCallback,
     TrainingArguments
 )
 from peft import LoraConfig, get_peft_model, TaskType
-from src.dataset import TextDataset
+from src.batching import LengthBucketSampler, PaddingCollator
+from src.binary_dataset import BinaryDataset, binary_path
+from src.checkpointing import (
+    AsyncCheckpointer,
+    PreemptionCallback,
+    RunConfigCallback,
+    config_hash,
+    remove_partial_checkpoints,
+    resumable_checkpoint,
+)
+from src.cpu_profile import apply_cpu_profile
+from src.dataset import StreamingTextDataset, TextDataset
+from src.lora_targets import log_parameter_report, resolve_lora_targets
+from src.training_metrics import ThroughputCallback
 from src.utils.logger_loader import LoggerLoader
+from src.utils.model_registry import get_registry
 from src.utils.config_model import AppConfig  # импорт Pydantic-модели
 
 logger = LoggerLoader().get_logger()
 
-def fine_tune_model(cfg: AppConfig, model_name: str):
+def _data_path(cfg: AppConfig, json_path: str) -> str:
+    """Путь к данным для TextDataset: бинарная версия, если она включена в конфиге и собрана."""
+    if cfg.dataset.binary:
+        path = binary_path(json_path)
+        if BinaryDataset.is_binary(path):
+            return path
+        logger.warning(f"Бинарный датасет {path} не найден (запустите --task binarize), читаем {json_path}")
+    return json_path
+
+class SamplerTrainer(Trainer):
+    """Trainer с заданным снаружи сэмплером обучающей выборки (например, LengthBucketSampler)."""
+
+    def __init__(self, *args, train_sampler: Optional[Sampler] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.train_sampler = train_sampler
+
+    def _get_train_sampler(self, *args, **kwargs) -> Optional[Sampler]:
+        if self.train_sampler is not None:
+            return self.train_sampler
+        return super()._get_train_sampler(*args, **kwargs)
+
+def fine_tune_model(cfg: AppConfig, model_name: str, callbacks: Optional[List[TrainerCallback]] = None):
     """
     cfg: AppConfig — валидированный конфиг из ConfigLoader().get_config()
     model_name: str — имя модели или путь, можно переопределить через CLI
+    callbacks: дополнительные колбэки Trainer (например, остановка испытания перебора)
     """
     logger.info("Starting fine-tuning process...")
 
@@ -29,16 +68,30 @@ def fine_tune_model(cfg: AppConfig, model_name: str):
     os.makedirs(save_dir, exist_ok=True)
 
     # ========== Устройство ==========
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    profile_args = {}
+    if cfg.training_profile == "cpu":
+        profile_args = apply_cpu_profile(cfg.cpu_profile)
+        device = torch.device("cpu")
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     logger.info(f"Using device: {device}")
 
     # ========== Датасеты ==========
-    train_ds = TextDataset(cfg.train_data_path, cfg.model_dump(), model_name)
-    val_ds   = TextDataset(cfg.val_data_path,   cfg.model_dump(), model_name)
-    num_labels = len(train_ds.get_label_mapping())
+    if cfg.dataset.streaming:
+        # корпус не загружается в память: чтение, перемешивание буфером и токенизация на лету
+        train_ds = StreamingTextDataset(
+            cfg.train_data_path, cfg.model_dump(), model_name, shuffle_buffer=cfg.dataset.shuffle_buffer
+        )
+        val_ds = StreamingTextDataset(cfg.val_data_path, cfg.model_dump(), model_name, shuffle=False)
+    else:
+        train_ds = TextDataset(_data_path(cfg, cfg.train_data_path), cfg.model_dump(), model_name)
+        val_ds   = TextDataset(_data_path(cfg, cfg.val_data_path),   cfg.model_dump(), model_name)
+    label_mapping = train_ds.get_label_mapping()
+    num_labels = len(label_mapping)
 
     # ========== Токенизатор и модель ==========
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # тот же экземпляр, что уже загрузили датасеты
+    tokenizer = get_registry().tokenizer(model_name)
     model     = AutoModelForSequenceClassification.from_pretrained(
         model_name,
         num_labels=num_labels
@@ -53,18 +106,24 @@ def fine_tune_model(cfg: AppConfig, model_name: str):
             r=lora_r,
             lora_alpha=lora_alpha,
             lora_dropout=lora_dropout,
-            target_modules=["q_proj", "v_proj"],
+            target_modules=resolve_lora_targets(model, cfg.lora_preset, cfg.lora_target_modules),
             bias="none"
         )
         model = get_peft_model(model, peft_config)
 
     model.to(device)
+    log_parameter_report(model)
 
     # ========== Аргументы тренировки ==========
+    ckpt_cfg = cfg.checkpointing
+    save_steps = {"save_strategy": "steps", "save_steps": ckpt_cfg.save_steps} if ckpt_cfg.save_steps \
+        else {"save_strategy": "epoch"}
+    eval_steps = {"eval_strategy": "steps", "eval_steps": cfg.eval_steps} if cfg.eval_steps \
+        else {"eval_strategy": "epoch"}
     training_args = TrainingArguments(
         output_dir=save_dir,
-        eval_strategy="epoch",
-        save_strategy="epoch",
+        **eval_steps,
+        **save_steps,
         per_device_train_batch_size=cfg.batch_size,
         per_device_eval_batch_size=cfg.batch_size,
         num_train_epochs=cfg.num_epochs,
@@ -74,21 +133,84 @@ def fine_tune_model(cfg: AppConfig, model_name: str):
         logging_steps=cfg.logging_steps,
         save_total_limit=cfg.save_total_limit,
         push_to_hub=False,
+        **profile_args,
     )
 
+    # ========== Батчи: динамический padding и группировка по длине ==========
+    collator = PaddingCollator.from_tokenizer(
+        tokenizer,
+        pad_to_multiple_of=cfg.batching.pad_to_multiple_of,
+        max_length=getattr(train_ds, "max_length", None),
+    )
+
+    callbacks = list(callbacks or [])
+    if cfg.metrics.enabled:
+        callbacks.append(ThroughputCallback(
+            collator,
+            report_path=cfg.metrics.report_path or os.path.join(save_dir, "run_report.json"),
+            prometheus_path=cfg.metrics.prometheus_textfile,
+            run_name=os.path.basename(os.path.normpath(save_dir)),
+        ))
+    # хэш настроек прогона: продолжать можно только чекпоинты с теми же настройками
+    run_hash = config_hash({
+        "model_name": model_name,
+        "labels": label_mapping,
+        "use_lora": use_lora,
+        "lora": [lora_r, lora_alpha, lora_dropout, cfg.lora_preset, cfg.lora_target_modules],
+        "batch_size": cfg.batch_size,
+        "num_epochs": cfg.num_epochs,
+        "learning_rate": cfg.learning_rate,
+        "weight_decay": cfg.weight_decay,
+    })
+    callbacks.append(RunConfigCallback(run_hash))
+    preemption = PreemptionCallback() if ckpt_cfg.handle_preemption else None
+    if preemption is not None:
+        callbacks.append(preemption)
+
     # ========== Trainer ==========
-    trainer = Trainer(
+    sampler = None
+    if cfg.batching.group_by_length and not cfg.dataset.streaming:
+        sampler = LengthBucketSampler.from_dataset(
+            train_ds,
+            batch_size=cfg.batch_size,
+            bucket_size_multiplier=cfg.batching.bucket_size_multiplier,
+            seed=training_args.seed,
+        )
+    trainer = SamplerTrainer(
         model=model,
         args=training_args,
         train_dataset=train_ds,
         eval_dataset=val_ds,
-        data_collator=TextDataset.collate_fn,
+        data_collator=collator,
         tokenizer=tokenizer,
+        callbacks=callbacks,
+        train_sampler=sampler,
     )
+    checkpointer = AsyncCheckpointer.attach(trainer) if ckpt_cfg.async_save else None
+
+    # ========== Продолжение с чекпоинта ==========
+    remove_partial_checkpoints(save_dir)
+    resume_from = resumable_checkpoint(save_dir, run_hash) if ckpt_cfg.resume else None
+    if resume_from:
+        logger.info(f"🔁 Продолжаем обучение с чекпоинта {resume_from}")
 
     # ========== Запуск обучения ==========
     logger.info("Training started...")
-    trainer.train()
+    try:
+        trainer.train(resume_from_checkpoint=resume_from)
+    finally:
+        # on_train_end не вызывается, если обучение упало с исключением
+        if preemption is not None:
+            preemption.restore()
+        if checkpointer is not None:
+            checkpointer.wait()
+    if collator.batches:
+        # с воркерами DataLoader коллатор работает в их процессах и статистика здесь не копится
+        logger.info(f"Padding stats: {collator.stats()}")
+
+    if preemption is not None and preemption.preempted:
+        logger.warning("⚠️ Обучение прервано сигналом, чекпоинт сохранён; перезапустите для продолжения")
+        return
 
     # ========== Сохранение ==========
     final_dir = os.path.join(save_dir, "final_model")
@@ -0,0 +1,154 @@
+import re
+from typing import Dict, List, Optional
+
+from torch import nn
+from transformers.pytorch_utils import Conv1D
+
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+# Имена проекций внимания в разных архитектурах (последний компонент имени модуля):
+# LLaMA/Mistral/BART/Marian, BERT/RoBERTa, DistilBERT, T5, GPT-2, Falcon/BLOOM, MPT, Phi
+ATTENTION_NAMES = {
+    "q_proj", "k_proj", "v_proj", "qkv_proj",
+    "query", "key", "value",
+    "q_lin", "k_lin", "v_lin",
+    "q", "k", "v",
+    "c_attn", "query_key_value", "Wqkv", "Wq", "Wk", "Wv",
+}
+# Выходная проекция внимания: отдельные имена или "dense" внутри блока внимания
+ATTENTION_OUTPUT_NAMES = {"o_proj", "out_proj", "out_lin", "o", "Wo"}
+# Слои FFN
+FFN_NAMES = {"gate_proj", "up_proj", "down_proj", "fc1", "fc2", "lin1", "lin2", "wi", "wo", "wi_0", "wi_1", "c_fc"}
+# Головы и пулер, которые не адаптируются LoRA (голова классификации обучается целиком через PEFT)
+HEAD_NAMES = {"classifier", "score", "lm_head", "pooler", "qa_outputs", "pre_classifier"}
+
+_ATTENTION_BLOCK = re.compile(r"(^|\.)(attention|attn|self_attn|SelfAttention|EncDecAttention)(\.|$)")
+
+PRESETS = ("attention", "attention_ffn", "all_linear")
+
+
+def _is_linear(module: nn.Module) -> bool:
+    return isinstance(module, (nn.Linear, Conv1D))
+
+
+def module_role(name: str) -> Optional[str]:
+    """
+    Роль линейного слоя по его полному имени: "attention", "attention_output", "ffn",
+    "head" или None (не распознан).
+    """
+    parts = name.split(".")
+    leaf = parts[-1]
+    if any(part in HEAD_NAMES for part in parts):
+        return "head"
+    if leaf in ATTENTION_NAMES:
+        return "attention"
+    if leaf in ATTENTION_OUTPUT_NAMES:
+        return "attention_output"
+    in_attention = bool(_ATTENTION_BLOCK.search(name))
+    if leaf == "c_proj":
+        # GPT-2: attn.c_proj — выход внимания, mlp.c_proj — FFN
+        return "attention_output" if in_attention else "ffn"
+    if leaf == "dense":
+        # BERT: attention.output.dense — выход внимания, intermediate.dense / output.dense — FFN
+        if in_attention:
+            return "attention_output"
+        if len(parts) > 1 and parts[-2] in ("intermediate", "output"):
+            return "ffn"
+        return None
+    if leaf in FFN_NAMES:
+        return "ffn"
+    return None
+
+
+def discover_lora_targets(model: nn.Module, preset: str = "attention") -> List[str]:
+    """
+    Находит модули для LoRA-адаптеров в загруженной модели.
+
+    Пресеты:
+      - "attention" — проекции query/key/value внимания;
+      - "attention_ffn" — всё внимание (включая выходную проекцию) и слои FFN;
+      - "all_linear" — все линейные слои, кроме голов и пулера.
+
+    Возвращаются полные имена модулей: PEFT сопоставляет их точно, поэтому,
+    например, BERT-овские output.dense внимания и FFN не путаются.
+
+    :param model: загруженная модель transformers.
+    :param preset: один из PRESETS.
+    :return: список имён модулей (пустой, если ничего не распознано).
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Неизвестный пресет LoRA: {preset} (доступны: {', '.join(PRESETS)})")
+    roles = {
+        "attention": {"attention"},
+        "attention_ffn": {"attention", "attention_output", "ffn"},
+    }.get(preset)
+
+    targets = []
+    for name, module in model.named_modules():
+        if not name or not _is_linear(module):
+            continue
+        role = module_role(name)
+        if role == "head":
+            continue
+        if roles is None or role in roles:
+            targets.append(name)
+    return targets
+
+
+def resolve_lora_targets(model: nn.Module, preset: str = "attention", override: Optional[List[str]] = None) -> List[str]:
+    """
+    Модули для LoRA: override из конфига как есть (PEFT сопоставляет их по суффиксу имени)
+    или результат discover_lora_targets. Если ни один модуль не найден — ValueError,
+    а не тихое обучение без адаптеров.
+    """
+    if override:
+        names = [name for name, _ in model.named_modules()]
+        missing = [t for t in override if not any(n == t or n.endswith(f".{t}") for n in names)]
+        if missing:
+            raise ValueError(f"Модули LoRA не найдены в модели: {', '.join(missing)}")
+        return list(override)
+
+    targets = discover_lora_targets(model, preset)
+    if not targets:
+        raise ValueError(
+            f"Пресет LoRA '{preset}' не нашёл ни одного линейного слоя в {type(model).__name__}; "
+            f"задайте lora_target_modules в конфиге"
+        )
+    leaves = sorted({t.rsplit(".", 1)[-1] for t in targets})
+    logger.info(f"🎯 LoRA ({preset}): {len(targets)} модулей, типы: {', '.join(leaves)}")
+    return targets
+
+
+def parameter_report(model: nn.Module, optimizer_states: int = 2) -> Dict[str, float]:
+    """
+    Число обучаемых и всех параметров и оценка памяти на обучаемые параметры:
+    градиенты плюс состояния оптимизатора (у AdamW — два fp32-тензора на параметр).
+
+    :param model: модель (с адаптерами или без).
+    :param optimizer_states: число fp32-состояний оптимизатора на параметр.
+    """
+    trainable = total = 0
+    for _, param in model.named_parameters():
+        total += param.numel()
+        if param.requires_grad:
+            trainable += param.numel()
+    bytes_per_value = 4
+    return {
+        "trainable_params": trainable,
+        "total_params": total,
+        "trainable_share": round(trainable / total, 6) if total else 0.0,
+        "gradient_mb": round(trainable * bytes_per_value / 2 ** 20, 2),
+        "optimizer_state_mb": round(trainable * optimizer_states * bytes_per_value / 2 ** 20, 2),
+    }
+
+
+def log_parameter_report(model: nn.Module) -> Dict[str, float]:
+    report = parameter_report(model)
+    logger.info(
+        f"🧮 Параметры: обучаемых {report['trainable_params']:,} из {report['total_params']:,} "
+        f"({report['trainable_share']:.2%}); градиенты ≈ {report['gradient_mb']} МБ, "
+        f"состояние AdamW ≈ {report['optimizer_state_mb']} МБ"
+    )
+    return report
@@ -0,0 +1,170 @@
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from transformers import PreTrainedTokenizerBase
+
+from src.utils.tokenizer_fingerprint import tokenizer_fingerprint
+
+# Символы, которыми может заканчиваться предложение
+SENTENCE_TERMINATORS = ".!?…"
+
+Offsets = Sequence[Tuple[int, int]]
+# Чанк: срез исходного текста и ID его токенов (без специальных токенов)
+Chunk = Tuple[str, List[int]]
+
+
+class TextChunker:
+    """
+    Разбивка текстов на чанки по границам токенов через offset mapping fast-токенизатора.
+
+    Текст чанка — срез исходной строки между началом первого и концом последнего токена,
+    без decode: исходный текст сохраняется как есть (это нужно для этапа анализа).
+    Поддерживает перекрытие чанков (stride), привязку к концу предложения
+    и пакетную токенизацию нескольких текстов одним вызовом токенизатора.
+    """
+
+    def __init__(
+        self,
+        tokenizer: PreTrainedTokenizerBase,
+        chunk_size: int = 500,
+        stride: int = 0,
+        snap_to_sentence: bool = False,
+        min_fill: float = 0.5,
+        stream_block_chars: Optional[int] = None,
+    ):
+        """
+        :param tokenizer: fast-токенизатор (нужен return_offsets_mapping).
+        :param chunk_size: максимальное число токенов в чанке.
+        :param stride: сколько токенов соседние чанки делят между собой.
+        :param snap_to_sentence: заканчивать чанк на конце предложения, если он есть в окне.
+        :param min_fill: минимальная доля chunk_size, которую чанк должен занять при привязке к предложению.
+        :param stream_block_chars: размер блока текста (в символах), токенизируемого за раз в chunk_stream.
+        """
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("TextChunker требует fast-токенизатор с поддержкой offset mapping")
+        if chunk_size < 1:
+            raise ValueError("chunk_size должен быть положительным")
+        if not 0 <= stride < chunk_size:
+            raise ValueError("stride должен быть в диапазоне [0, chunk_size)")
+
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.stride = stride
+        self.snap_to_sentence = snap_to_sentence
+        self.min_fill = min_fill
+        # ~16 символов на токен с запасом: в блоке заведомо несколько чанков
+        self.stream_block_chars = stream_block_chars or chunk_size * 16
+
+    @property
+    def key(self) -> str:
+        """Строка с настройками чанкинга и отпечатком токенизатора — для инвалидации кэшей."""
+        return (
+            f"{self.tokenizer.name_or_path}@{tokenizer_fingerprint(self.tokenizer)[:12]}"
+            f":ids:{self.chunk_size}:{self.stride}"
+            f":{int(self.snap_to_sentence)}:{self.min_fill}"
+        )
+
+    def _encode(self, texts: List[str]) -> List[Tuple[List[int], Offsets]]:
+        """Токенизирует пачку текстов одним вызовом и возвращает (ID токенов, offset mapping) каждого."""
+        encoding = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return list(zip(encoding["input_ids"], encoding["offset_mapping"]))
+
+    @staticmethod
+    def _is_sentence_end(text: str, offsets: Offsets, j: int) -> bool:
+        """Заканчивается ли предложение на токене j-1 (перед токеном j)."""
+        end = offsets[j - 1][1]
+        next_start = offsets[j][0] if j < len(offsets) else len(text)
+        gap = text[end:next_start]
+        if "\n" in gap:
+            return True
+        # "3.14" или "т.е" — точка без пробела после неё концом предложения не считается
+        return end > 0 and text[end - 1] in SENTENCE_TERMINATORS and (gap != "" or j == len(offsets))
+
+    def _windows(self, text: str, offsets: Offsets, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """Окна [start, end) в индексах токенов."""
+        n = len(offsets)
+        while start < n:
+            end = min(start + self.chunk_size, n)
+            if self.snap_to_sentence and end < n:
+                lowest = start + max(1, int(self.chunk_size * self.min_fill))
+                for j in range(end, lowest - 1, -1):
+                    if self._is_sentence_end(text, offsets, j):
+                        end = j
+                        break
+            yield start, end
+            if end >= n:
+                break
+            start = max(end - self.stride, start + 1)
+
+    @staticmethod
+    def _slice(text: str, ids: List[int], offsets: Offsets, start: int, end: int) -> Chunk:
+        return text[offsets[start][0]:offsets[end - 1][1]], list(ids[start:end])
+
+    def chunk(self, text: str) -> List[str]:
+        """Разбивает один текст на чанки."""
+        return self.chunk_many([text])[0]
+
+    def chunk_many(self, texts: List[str]) -> List[List[str]]:
+        """Разбивает пачку текстов на чанки, токенизируя их одним вызовом."""
+        return [[chunk_text for chunk_text, _ in chunks] for chunks in self.encode_many(texts)]
+
+    def encode_many(self, texts: List[str]) -> List[List[Chunk]]:
+        """Как chunk_many, но каждый чанк — пара (текст, ID токенов)."""
+        result: List[List[Chunk]] = []
+        for text, (ids, offsets) in zip(texts, self._encode(texts)):
+            result.append([self._slice(text, ids, offsets, s, e) for s, e in self._windows(text, offsets)])
+        return result
+
+    def chunk_stream(self, lines: Iterable[str]) -> Iterator[str]:
+        """Потоковая разбивка текста, поданного построчно (см. encode_stream)."""
+        for chunk_text, _ in self.encode_stream(lines):
+            yield chunk_text
+
+    def encode_stream(self, lines: Iterable[str]) -> Iterator[Chunk]:
+        """
+        Потоковая разбивка текста, поданного построчно, на пары (текст, ID токенов).
+
+        Строки копятся в блок из stream_block_chars символов, блок токенизируется одним
+        вызовом, готовые чанки отдаются, а хвост (с начала слова, в котором начинается
+        следующее окно) переносится в следующий блок. Память — O(stream_block_chars).
+        """
+        buffer = ""
+        resume_at = 0  # смещение в buffer, с которого начинается следующее окно
+
+        for line in lines:
+            line = line.rstrip("\n")
+            buffer = f"{buffer}\n{line}" if buffer else line
+            if len(buffer) < self.stream_block_chars:
+                continue
+
+            ids, offsets = self._encode([buffer])[0]
+            first = next((i for i, (s, _) in enumerate(offsets) if s >= resume_at), len(offsets))
+            pending: Optional[int] = None
+            for start, end in self._windows(buffer, offsets, first):
+                if end >= len(offsets):
+                    # последнее окно может продолжиться в следующем блоке
+                    pending = start
+                    break
+                yield self._slice(buffer, ids, offsets, start, end)
+            if pending is None:
+                buffer, resume_at = "", 0
+                continue
+
+            # Режем по началу слова, чтобы повторная токенизация хвоста дала те же токены
+            cut = pending
+            while cut > 0 and offsets[cut][0] == offsets[cut - 1][1]:
+                cut -= 1
+            cut_char = offsets[cut][0]
+            resume_at = offsets[pending][0] - cut_char
+            buffer = buffer[cut_char:]
+
+        if buffer:
+            ids, offsets = self._encode([buffer])[0]
+            first = next((i for i, (s, _) in enumerate(offsets) if s >= resume_at), len(offsets))
+            for start, end in self._windows(buffer, offsets, first):
+                yield self._slice(buffer, ids, offsets, start, end)
@@ -1,4 +1,7 @@
+from typing import Optional
+
 import pandas as pd
+from src.processing.near_duplicates import NearDuplicateFilter
 from src.utils.logger_loader import LoggerLoader
 
 
@@ -25,11 +28,13 @@ class DataCleaner:
             self.logger.error(f"❌ Ошибка при загрузке данных: {e}")
             return pd.DataFrame()
 
-    def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    def clean_data(self, df: pd.DataFrame, near_duplicate_threshold: Optional[float] = None) -> pd.DataFrame:
         """
         Очищает датасет: удаляет дубликаты, пропущенные значения и балансирует классы.
 
         :param df: Исходный DataFrame.
+        :param near_duplicate_threshold: Если задан — удалять и почти-дубликаты текстов
+                                         со сходством Жаккара не ниже порога (MinHash/LSH).
         :return: Очищенный DataFrame.
         """
         self.logger.info("🛠️ Начало очистки данных...")
@@ -40,9 +45,30 @@ class DataCleaner:
         # Удаляем дубликаты
         df = df.drop_duplicates()
 
+        if near_duplicate_threshold is not None:
+            df = self.drop_near_duplicates(df, threshold=near_duplicate_threshold)
+
         self.logger.info("✅ Очистка данных завершена")
         return df
 
+    def drop_near_duplicates(self, df: pd.DataFrame, threshold: float = 0.8, column: str = "text") -> pd.DataFrame:
+        """
+        Удаляет почти-дубликаты текстов, оставляя первое вхождение каждой группы.
+
+        :param df: DataFrame с колонкой текстов.
+        :param threshold: Минимальное сходство Жаккара, при котором строки считаются дубликатами.
+        :param column: Колонка с текстом.
+        :return: DataFrame без почти-дубликатов.
+        """
+        if column not in df.columns:
+            self.logger.warning(f"⚠️ Нет колонки '{column}', почти-дубликаты не ищутся")
+            return df
+        pairs = NearDuplicateFilter(threshold=threshold).duplicate_pairs(df[column].astype(str).tolist())
+        if pairs:
+            self.logger.info(f"🧹 Удалено почти-дубликатов: {len(pairs)}")
+            df = df.drop(index=df.index[[duplicate for duplicate, _ in pairs]])
+        return df
+
     def save_clean_data(self, df: pd.DataFrame, save_path: str):
         """
         Сохраняет очищенный датасет в CSV-файл.
@@ -0,0 +1,224 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Верхняя граница значения хэша шингла / MinHash (32 бита)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+# Сколько шинглов хэшировать за один векторный проход (матрица MAX_BLOCK x num_perm uint64)
+MAX_BLOCK = 1 << 15
+
+_SPACES = re.compile(r"\s+")
+
+
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Число полос LSH и строк в полосе (bands * rows == num_perm), при которых порог
+    S-кривой (1 / bands) ** (1 / rows) ближе всего к threshold.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class NearDuplicateFilter:
+    """
+    Поиск почти-дубликатов текстов: MinHash-сигнатуры по символьным шинглам и LSH с полосами.
+
+    Шинглы — все подстроки длины shingle_size нормализованного текста (регистр, пробелы);
+    хэши шинглов и MinHash считаются векторно в numpy (multiply-shift хэширование,
+    сразу для пачки текстов через np.minimum.reduceat). Сигнатура делится на bands полос;
+    тексты, совпавшие хотя бы в одной полосе, — кандидаты, и кандидат считается дубликатом,
+    если доля совпавших позиций сигнатуры (оценка сходства Жаккара) не меньше threshold.
+    Каждый текст сравнивается только с кандидатами из своих корзин, поэтому проход
+    по корпусу почти линейный, а не квадратичный.
+
+    Фильтр накапливает состояние: add() запоминает текст, если он новый,
+    так что filter() по потоку оставляет первый экземпляр каждой группы почти-дубликатов.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        bands: Optional[int] = None,
+        seed: int = 1,
+        batch_size: int = 256,
+    ):
+        """
+        :param threshold: минимальное сходство Жаккара, при котором тексты считаются дубликатами.
+        :param num_perm: длина MinHash-сигнатуры.
+        :param shingle_size: длина символьного шингла.
+        :param bands: число полос LSH (должно делить num_perm; None — подобрать по threshold).
+        :param seed: зерно хэш-функций (одинаковое зерно — сравнимые сигнатуры).
+        :param batch_size: сколько текстов хэшировать за один векторный проход в filter().
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold должен быть в диапазоне (0, 1]")
+        if bands is None:
+            bands, rows = optimal_bands(num_perm, threshold)
+        elif num_perm % bands:
+            raise ValueError("bands должен делить num_perm")
+        else:
+            rows = num_perm // bands
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self.batch_size = batch_size
+
+        rng = np.random.default_rng(seed)
+        # нечётные множители multiply-shift хэширования; старшие 32 бита произведения — значение хэша
+        self._mul = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._add = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, int]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        self.seen = 0
+        self.duplicates = 0
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """Уникальные 32-битные хэши символьных шинглов нормализованного текста."""
+        text = _SPACES.sub(" ", text.lower()).strip()
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        if len(codes) == 0:
+            return codes
+        k = min(self.shingle_size, len(codes))
+        windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+        # полиномиальный хэш окна: переполнение uint64 ожидаемо и безопасно
+        powers = np.uint64(1_000_003) ** np.arange(k, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            hashes = (windows * powers).sum(axis=1, dtype=np.uint64)
+        return np.unique((hashes ^ (hashes >> np.uint64(32))) & MAX_HASH)
+
+    def _permuted(self, hashes: np.ndarray) -> np.ndarray:
+        """Значения всех num_perm хэш-функций для каждого шингла: [len(hashes), num_perm]."""
+        with np.errstate(over="ignore"):
+            return (hashes[:, None] * self._mul + self._add) >> np.uint64(32)
+
+    def _reduce(self, group: List[Tuple[int, np.ndarray]], result: np.ndarray) -> None:
+        """MinHash пачки текстов за один векторный проход."""
+        if not group:
+            return
+        rows = [i for i, _ in group]
+        starts = np.cumsum([0] + [len(hashes) for _, hashes in group[:-1]])
+        flat = np.concatenate([hashes for _, hashes in group])
+        result[rows] = np.minimum.reduceat(self._permuted(flat), starts, axis=0)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        MinHash-сигнатуры пачки текстов, массив [len(texts), num_perm] uint32.
+        Пустой текст получает сигнатуру из MAX_HASH (ни с чем не сравнивается).
+        Промежуточная матрица ограничена MAX_BLOCK шинглами, поэтому память не зависит от пачки.
+        """
+        result = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint64)
+        group: List[Tuple[int, np.ndarray]] = []
+        group_size = 0
+        for i, text in enumerate(texts):
+            hashes = self.shingle_hashes(text)
+            if len(hashes) > MAX_BLOCK:
+                # длинный текст — отдельно, блоками
+                for start in range(0, len(hashes), MAX_BLOCK):
+                    block = self._permuted(hashes[start:start + MAX_BLOCK]).min(axis=0)
+                    result[i] = np.minimum(result[i], block)
+                continue
+            if not len(hashes):
+                continue
+            if group_size + len(hashes) > MAX_BLOCK:
+                self._reduce(group, result)
+                group, group_size = [], 0
+            group.append((i, hashes))
+            group_size += len(hashes)
+        self._reduce(group, result)
+        return result.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+    def similarity(self, a: np.ndarray, b: np.ndarray) -> float:
+        """Оценка сходства Жаккара по двум сигнатурам."""
+        return float(np.mean(a == b))
+
+    def match(self, signature: np.ndarray) -> Optional[int]:
+        """Номер ранее добавленного текста, почти-дубликатом которого является signature, или None."""
+        if np.all(signature == np.uint32(MAX_HASH)):
+            return None
+        candidates = {
+            self._buckets[b][key]
+            for b, key in enumerate(self._band_keys(signature))
+            if key in self._buckets[b]
+        }
+        for idx in sorted(candidates):
+            if self.similarity(signature, self._signatures[idx]) >= self.threshold:
+                return idx
+        return None
+
+    def add_signature(self, signature: np.ndarray) -> Optional[int]:
+        """
+        Проверяет сигнатуру и запоминает её, если это не дубликат.
+
+        :return: номер текста-оригинала для дубликата, иначе None.
+        """
+        self.seen += 1
+        duplicate_of = self.match(signature)
+        if duplicate_of is not None:
+            self.duplicates += 1
+            return duplicate_of
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        for b, key in enumerate(self._band_keys(signature)):
+            self._buckets[b].setdefault(key, idx)
+        return None
+
+    def empty_copy(self) -> "NearDuplicateFilter":
+        """Новый фильтр с теми же параметрами и пустым индексом."""
+        return NearDuplicateFilter(
+            self.threshold, self.num_perm, self.shingle_size, self.bands, self.seed, self.batch_size
+        )
+
+    def add(self, text: str) -> Optional[int]:
+        """То же, что add_signature, для одного текста."""
+        return self.add_signature(self.signatures([text])[0])
+
+    def filter(self, records: Iterable[Dict[str, Any]], key: str = "text") -> Iterator[Dict[str, Any]]:
+        """
+        Потоково отбрасывает записи, почти совпадающие с уже пропущенными.
+        Тексты хэшируются пачками по batch_size, порядок записей сохраняется.
+        """
+        batch: List[Dict[str, Any]] = []
+
+        def flush() -> Iterator[Dict[str, Any]]:
+            signatures = self.signatures([record.get(key) or "" for record in batch])
+            for record, signature in zip(batch, signatures):
+                if self.add_signature(signature) is None:
+                    yield record
+            batch.clear()
+
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield from flush()
+        yield from flush()
+
+    def duplicate_pairs(self, texts: Sequence[str]) -> List[Tuple[int, int]]:
+        """
+        Пары (дубликат, оригинал) индексов в texts; состояние фильтра не меняется.
+        Удобно для отчётов (DatasetValidator).
+        """
+        probe = NearDuplicateFilter(
+            threshold=self.threshold, num_perm=self.num_perm, shingle_size=self.shingle_size,
+            bands=self.bands, seed=self.seed, batch_size=self.batch_size,
+        )
+        pairs: List[Tuple[int, int]] = []
+        kept: List[int] = []
+        for start in range(0, len(texts), self.batch_size):
+            for i, signature in enumerate(probe.signatures(texts[start:start + self.batch_size]), start):
+                original = probe.add_signature(signature)
+                if original is None:
+                    kept.append(i)
+                else:
+                    pairs.append((i, kept[original]))
+        return pairs
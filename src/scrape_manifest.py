@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils.logger_loader import LoggerLoader
+from src.youtube_scraper import SubtitleTrack
+
+
+class ScrapeManifest:
+    """
+    Персистентный манифест сбора датасета.
+
+    Для каждого ID видео хранит хэш субтитров, язык, тип дорожки (ручная/автоматическая),
+    версию очистки и ключ чанкинга, а сами чанки (текст и ID токенов) —
+    в отдельном шарде chunks/<id>.json.
+    Повторный запуск сборки по манифесту обрабатывает только новые или изменившиеся видео.
+    """
+
+    def __init__(self, manifest_path: str, shards_dir: str):
+        """
+        :param manifest_path: Путь к JSON-файлу манифеста.
+        :param shards_dir: Папка для шардов с чанками отдельных видео.
+        """
+        self.manifest_path = manifest_path
+        self.shards_dir = shards_dir
+        self.logger = LoggerLoader().get_logger()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+        os.makedirs(self.shards_dir, exist_ok=True)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Читает манифест с диска; повреждённый или отсутствующий файл даёт пустой манифест."""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("videos", {})
+        except Exception as e:
+            self.logger.warning(f"⚠️ Манифест {self.manifest_path} не прочитан, начинаем заново: {e}")
+            return {}
+
+    def save(self) -> None:
+        """Атомарно сохраняет манифест (временный файл + rename)."""
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"videos": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(video_id)
+
+    def shard_path(self, video_id: str) -> str:
+        return os.path.join(self.shards_dir, f"{video_id}.json")
+
+    def subtitle_hash(self, video_id: str, path: str) -> str:
+        """
+        Возвращает sha256 файла субтитров.
+        Если путь, размер и mtime совпадают с записанными в манифесте, файл не перечитывается.
+        """
+        stat = os.stat(path)
+        entry = self.entries.get(video_id)
+        if (
+            entry is not None
+            and entry.get("subtitle_path") == path
+            and entry.get("subtitle_size") == stat.st_size
+            and entry.get("subtitle_mtime_ns") == stat.st_mtime_ns
+        ):
+            return entry["subtitle_sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def cached_track(self, video_id: str, cleaning_version: str, chunk_key: str) -> Optional[SubtitleTrack]:
+        """
+        Возвращает дорожку, которую можно обработать без обращения к сети, или None.
+
+        Если сырые субтитры лежат на диске, отдаётся путь к ним (изменения файла
+        будут обнаружены по хэшу). Если субтитры не сохранялись (режим в памяти),
+        видео считается известным, пока его шард построен с текущими настройками.
+        """
+        entry = self.entries.get(video_id)
+        if entry is None:
+            return None
+        meta = {"lang": entry.get("lang"), "automatic": entry.get("automatic")}
+
+        subtitle_path = entry.get("subtitle_path")
+        if subtitle_path:
+            if os.path.exists(subtitle_path):
+                return SubtitleTrack(video_id=video_id, path=subtitle_path, **meta)
+            return None
+
+        if self.is_fresh(video_id, entry.get("subtitle_sha256"), cleaning_version, chunk_key):
+            return SubtitleTrack(video_id=video_id, sha256=entry["subtitle_sha256"], **meta)
+        return None
+
+    def is_fresh(self, video_id: str, subtitle_sha256: str, cleaning_version: str, chunk_key: str) -> bool:
+        """Проверяет, что шард видео построен из тех же субтитров и с теми же настройками."""
+        entry = self.entries.get(video_id)
+        return (
+            entry is not None
+            and entry.get("subtitle_sha256") == subtitle_sha256
+            and entry.get("cleaning_version") == cleaning_version
+            and entry.get("chunk_key") == chunk_key
+            and os.path.exists(self.shard_path(video_id))
+        )
+
+    def read_chunks(self, video_id: str) -> List[Dict[str, Any]]:
+        """Читает шард видео: список чанков {"text", "input_ids"}."""
+        with open(self.shard_path(video_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_chunks(self, video_id: str, chunks: List[Dict[str, Any]]) -> str:
+        """Атомарно записывает шард с чанками видео и возвращает путь к нему."""
+        path = self.shard_path(video_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def update(
+        self,
+        video_id: str,
+        url: str,
+        subtitle_path: Optional[str],
+        subtitle_sha256: str,
+        lang: Optional[str],
+        automatic: Optional[bool],
+        cleaning_version: str,
+        chunk_key: str,
+        num_chunks: int,
+        tokens_saved: int = 0,
+    ) -> None:
+        """
+        Записывает (или обновляет) запись о видео.
+        subtitle_path равен None, если субтитры обрабатывались только в памяти.
+        """
+        stat = os.stat(subtitle_path) if subtitle_path else None
+        self.entries[video_id] = {
+            "url": url,
+            "subtitle_path": subtitle_path,
+            "subtitle_sha256": subtitle_sha256,
+            "subtitle_size": stat.st_size if stat else None,
+            "subtitle_mtime_ns": stat.st_mtime_ns if stat else None,
+            "lang": lang,
+            "automatic": automatic,
+            "cleaning_version": cleaning_version,
+            "chunk_key": chunk_key,
+            "chunk_shard": self.shard_path(video_id),
+            "num_chunks": num_chunks,
+            "tokens_saved": tokens_saved,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
@@ -1,6 +1,20 @@
 import re
 import os
-from typing import List
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Optional, Sequence
+
+from transformers import PreTrainedTokenizerBase
+
+
+# Всё, что удаляется из строки VTT, — одним предкомпилированным выражением:
+# таймкоды cue, инлайн-метки <hh:mm:ss.mmm>, теги <c>/</c>, заголовки и настройки позиции.
+_VTT_NOISE_RE = re.compile(
+    r"\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}"
+    r"|<\d{2}:\d{2}:\d{2}\.\d{3}>"
+    r"|</?c>"
+    r"|(?i:WEBVTT|Kind: captions|Language: \w+)"
+    r"|align:start position:\d+%"
+)
 
 
 class SubtitlePreprocessor:
@@ -8,44 +22,155 @@ class SubtitlePreprocessor:
     Класс для очистки субтитров от временных меток, тегов и дублирования строк.
     """
 
-    def __init__(self, input_path: str, output_path: str):
-        self.input_path: str = input_path
-        self.output_path: str = output_path
+    # Версия алгоритма очистки; увеличивается при изменении результата,
+    # чтобы инкрементальная сборка пересобрала уже обработанные видео.
+    VERSION: int = 1
+
+    def __init__(
+        self,
+        input_path: Optional[str] = None,
+        output_path: Optional[str] = None,
+        dedup_overlaps: bool = False,
+        min_overlap: int = 2,
+        overlap_window: int = 64,
+        tokenizer: Optional[PreTrainedTokenizerBase] = None,
+    ):
+        """
+        :param input_path: путь к VTT-файлу.
+        :param output_path: путь для очищенного текста.
+        :param dedup_overlaps: убирать перекрытия соседних cue (бегущие автосубтитры).
+        :param min_overlap: минимальная длина перекрытия в словах, которое считается повтором.
+        :param overlap_window: сколько последних выведенных слов сравнивается со следующей строкой.
+        :param tokenizer: fast-токенизатор модели для статистики дедупликации в токенах
+            (без него статистика не собирается).
+        """
+        self.input_path: Optional[str] = input_path
+        self.output_path: Optional[str] = output_path
+        self.dedup_overlaps: bool = dedup_overlaps
+        self.min_overlap: int = min_overlap
+        self.overlap_window: int = overlap_window
+        self.tokenizer: Optional[PreTrainedTokenizerBase] = tokenizer
+
+        # сколько токенов tokenizer (без специальных) убрала дедупликация перекрытий
+        self.tokens_saved: int = 0
+
+    def _token_count(self, words: List[str]) -> int:
+        """Число токенов в последовательности слов."""
+        encoding = self.tokenizer(words, is_split_into_words=True, add_special_tokens=False)
+        return len(encoding["input_ids"])
+
+    @staticmethod
+    def _clean_lines(lines: Iterable[str]) -> Iterator[str]:
+        """Построчно удаляет метки времени, теги и заголовки, пропуская пустые строки."""
+        for line in lines:
+            line = _VTT_NOISE_RE.sub("", line).strip()
+            if line:
+                yield line
+
+    @staticmethod
+    def _unique_lines(lines: Iterable[str]) -> Iterator[str]:
+        """Пропускает строки, повторяющие предыдущую."""
+        previous: Optional[str] = None
+        for line in lines:
+            if line != previous:
+                yield line
+            previous = line
+
+    @staticmethod
+    def _suffix_prefix_overlap(left: Sequence[str], right: Sequence[str]) -> int:
+        """
+        Длина наибольшего суффикса left, совпадающего с префиксом right.
+        Префикс-функция KMP: O(len(left) + len(right)) сравнений слов.
+        """
+        if not left or not right:
+            return 0
+
+        prefix = [0] * len(right)
+        k = 0
+        for i in range(1, len(right)):
+            while k and right[i] != right[k]:
+                k = prefix[k - 1]
+            if right[i] == right[k]:
+                k += 1
+            prefix[i] = k
+
+        k = 0
+        # суффикс длиннее right совпасть с его префиксом не может
+        for word in left[max(0, len(left) - len(right)):]:
+            if k == len(right):
+                k = prefix[k - 1]
+            while k and word != right[k]:
+                k = prefix[k - 1]
+            if word == right[k]:
+                k += 1
+        return k
+
+    def _drop_overlaps(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Убирает из каждой строки префикс, повторяющий хвост уже выведенного текста.
+        Автосубтитры YouTube повторяют фразу в двух-трёх соседних cue, поэтому без этого
+        текст (и число токенов, чанков и шагов обучения) раздувается примерно вдвое.
+        Хвост ограничен overlap_window словами, так что проход линейный.
+        """
+        tail: Deque[str] = deque(maxlen=self.overlap_window)
+        for line in lines:
+            words = line.split()
+
+            overlap = self._suffix_prefix_overlap(list(tail), words)
+            if overlap < self.min_overlap:
+                # короткие совпадения ("и", "да") в обычной речи не считаем повтором
+                overlap = 0
+
+            rest = words[overlap:]
+            if overlap and self.tokenizer is not None:
+                # токенизируется только выброшенный префикс — остальной текст токенизирует чанкер
+                self.tokens_saved += self._token_count(words[:overlap])
+            if not rest:
+                continue
+            tail.extend(rest)
+            yield " ".join(rest) if overlap else line
+
+    def iter_cleaned(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Потоковая очистка VTT за один проход: принимает строки исходного файла
+        и отдаёт очищенные строки без дублей. Память не зависит от длины субтитров.
+        """
+        cleaned = self._unique_lines(self._clean_lines(lines))
+        if self.dedup_overlaps:
+            return self._drop_overlaps(cleaned)
+        return cleaned
+
+    def stream(self) -> Iterator[str]:
+        """Читает input_path построчно и отдаёт очищенные строки."""
+        with open(self.input_path, "r", encoding="utf-8") as f:
+            yield from self.iter_cleaned(f)
 
     def clean_text(self, text: str) -> str:
         """Удаляет метки времени, теги и лишние символы."""
-        text = re.sub(r"\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}", "", text)
-        text = re.sub(r"<\d{2}:\d{2}:\d{2}\.\d{3}>", "", text)
-        text = re.sub(r"<c>|</c>", "", text)
-        text = re.sub(r"WEBVTT|Kind: captions|Language: \w+", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"align:start position:\d+%", "", text)
-        # удаляем пустые строки и лишние пробелы
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
-        return "\n".join(lines)
+        return "\n".join(self._clean_lines(text.splitlines()))
 
     def remove_duplicates(self, text: str) -> str:
         """Убирает повторяющиеся подряд строки."""
-        unique_lines: List[str] = []
-        for line in text.split("\n"):
-            if not unique_lines or line != unique_lines[-1]:
-                unique_lines.append(line)
+        unique_lines: List[str] = list(self._unique_lines(text.split("\n")))
         return "\n".join(unique_lines)
 
+    def process_text(self, raw_text: str) -> str:
+        """Очищает VTT, уже загруженный в память, без чтения и записи файлов."""
+        return "\n".join(self.iter_cleaned(raw_text.splitlines()))
+
     def process(self) -> None:
         """
         Запускает очистку, удаление дублей и сохраняет результат в output_path.
+        Файл обрабатывается построчно, без загрузки целиком в память.
         """
         if not os.path.exists(self.input_path):
             print(f"Файл не найден: {self.input_path}")
             return
 
-        with open(self.input_path, "r", encoding="utf-8") as f:
-            raw_text: str = f.read()
-
-        cleaned = self.clean_text(raw_text)
-        final = self.remove_duplicates(cleaned)
-
         with open(self.output_path, "w", encoding="utf-8") as f:
-            f.write(final)
+            for i, line in enumerate(self.stream()):
+                if i:
+                    f.write("\n")
+                f.write(line)
 
         print(f"Очистка завершена. Результат сохранен в {self.output_path}")
@@ -0,0 +1,234 @@
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from transformers import TrainerCallback
+
+from src.cpu_profile import core_slices, physical_cores, pin_to_cores
+from src.utils.config_model import AppConfig, SweepConfig
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+# Ядра, закреплённые за процессом-воркером пула (задаются в _init_worker)
+_WORKER_CORES: List[int] = []
+
+
+def expand_grid(sweep: SweepConfig) -> List[Dict[str, Any]]:
+    """
+    Все сочетания значений из sweep.grid; если их больше max_trials —
+    случайная (воспроизводимая по sweep.seed) выборка из max_trials сочетаний.
+    """
+    unknown = [name for name in sweep.grid if name not in AppConfig.model_fields]
+    if unknown:
+        raise ValueError(f"Неизвестные параметры перебора: {', '.join(unknown)}")
+    names = list(sweep.grid)
+    trials = [dict(zip(names, values)) for values in itertools.product(*(sweep.grid[n] for n in names))]
+    if sweep.max_trials and len(trials) > sweep.max_trials:
+        trials = random.Random(sweep.seed).sample(trials, sweep.max_trials)
+    return trials
+
+
+def plan_workers(sweep: SweepConfig, num_trials: int) -> tuple:
+    """Число воркеров пула и потоков на испытание (по умолчанию — поровну физических ядер)."""
+    cores = physical_cores()
+    workers = sweep.workers or max(1, cores // (sweep.threads_per_trial or 2))
+    workers = max(1, min(workers, num_trials))
+    threads = sweep.threads_per_trial or max(1, cores // workers)
+    return workers, threads
+
+
+class MedianStoppingRule:
+    """
+    Правило медианной остановки: испытание останавливается после k-й оценки, если
+    его лучшая метрика за первые k оценок хуже медианы лучших метрик других испытаний
+    за те же k оценок. Первые grace_evals оценок испытание не останавливается;
+    решение принимается, только если для сравнения есть хотя бы min_trials испытаний.
+    """
+
+    def __init__(self, mode: str = "min", grace_evals: int = 1, min_trials: int = 3):
+        self.mode = mode
+        self.grace_evals = grace_evals
+        self.min_trials = min_trials
+
+    def _best(self, values: List[float]) -> float:
+        return min(values) if self.mode == "min" else max(values)
+
+    def should_stop(self, trial: int, history: Dict[int, List[float]]) -> bool:
+        """
+        :param trial: номер испытания.
+        :param history: метрики всех испытаний по оценкам {номер: [значение, ...]}.
+        """
+        values = history[trial]
+        k = len(values)
+        if k <= self.grace_evals:
+            return False
+        others = [self._best(v[:k]) for t, v in history.items() if t != trial and len(v) >= k]
+        if len(others) < self.min_trials:
+            return False
+        median = statistics.median(others)
+        best = self._best(values)
+        return best > median if self.mode == "min" else best < median
+
+
+class MedianStoppingCallback(TrainerCallback):
+    """
+    Передаёт метрику каждой оценки в общую историю испытаний (Manager.dict пула)
+    и останавливает обучение по MedianStoppingRule.
+    """
+
+    def __init__(self, trial: int, history: Any, rule: Optional[MedianStoppingRule], metric: str = "eval_loss"):
+        self.trial = trial
+        self.history = history
+        self.rule = rule
+        self.metric = metric
+        self.values: List[float] = []
+        self.stopped = False
+
+    def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+        if not metrics or self.metric not in metrics:
+            return
+        self.values.append(float(metrics[self.metric]))
+        # прокси Manager.dict не видит изменений вложенного списка — значение присваивается целиком
+        self.history[self.trial] = list(self.values)
+        if self.rule is not None and not self.stopped and self.rule.should_stop(self.trial, dict(self.history)):
+            logger.info(
+                f"✂️ Испытание {self.trial} остановлено после {len(self.values)} оценок: "
+                f"{self.metric} хуже медианы остальных"
+            )
+            self.stopped = True
+            control.should_training_stop = True
+
+
+def _init_worker(cores_queue) -> None:
+    """Закрепляет процесс-воркер за своим набором ядер."""
+    global _WORKER_CORES
+    _WORKER_CORES = cores_queue.get()
+    pin_to_cores(_WORKER_CORES)
+
+
+def run_trial(cfg_dict: Dict[str, Any], trial: int, params: Dict[str, Any], history: Any) -> Dict[str, Any]:
+    """
+    Одно испытание в процессе-воркере: fine_tune_model с параметрами испытания
+    в CPU-профиле на ядрах воркера, в каталоге <sweep>/trial-<номер>.
+    """
+    from src.fine_tune import fine_tune_model
+
+    cfg = AppConfig(**{**cfg_dict, **params})
+    sweep = cfg.sweep
+    cfg.save_dir = os.path.join(sweep_dir(cfg), f"trial-{trial:03d}")
+    cfg.training_profile = "cpu"
+    cfg.cpu_profile.num_threads = len(_WORKER_CORES) or None
+    cfg.cpu_profile.dataloader_workers = 0
+    cfg.checkpointing.resume = False
+    cfg.checkpointing.handle_preemption = False
+    cfg.metrics.report_path = None
+
+    rule = MedianStoppingRule(sweep.mode, sweep.grace_evals, sweep.min_trials) if sweep.median_stopping else None
+    callback = MedianStoppingCallback(trial, history, rule, metric=sweep.metric)
+    started = time.perf_counter()
+    fine_tune_model(cfg, cfg.model_name, callbacks=[callback])
+
+    best = None
+    if callback.values:
+        best = min(callback.values) if sweep.mode == "min" else max(callback.values)
+    result = {"trial": trial, **params}
+    result.update({
+        "status": "stopped" if callback.stopped else "completed",
+        sweep.metric: best,
+        "evals": len(callback.values),
+        "seconds": round(time.perf_counter() - started, 1),
+        "cores": ",".join(map(str, _WORKER_CORES)),
+    })
+    report_path = os.path.join(cfg.save_dir, "run_report.json")
+    if os.path.isfile(report_path):
+        with open(report_path, encoding="utf-8") as f:
+            result["samples_per_sec"] = json.load(f).get("samples_per_sec")
+    return result
+
+
+def sweep_dir(cfg: AppConfig) -> str:
+    return cfg.sweep.output_dir or os.path.join(cfg.save_dir, "sweep")
+
+
+def prepare_shared_dataset(cfg: AppConfig) -> None:
+    """
+    Токенизирует train/val один раз до запуска испытаний. Датасеты открываются так же,
+    как в fine_tune_model, поэтому запись TokenCache (ключ — содержимое JSON, отпечаток
+    токенизатора, категории и max_length) строится здесь, а испытания получают попадание
+    в кэш и открывают одни и те же memory-mapped файлы — страницы общие для всех воркеров.
+    Изменившиеся данные, токенизатор или категории дают новый ключ и новую запись.
+    """
+    from src.dataset import TextDataset
+    from src.fine_tune import _data_path
+
+    if cfg.dataset.streaming:
+        logger.warning("Потоковый датасет: каждое испытание токенизирует данные само")
+        return
+    if not cfg.dataset.cache and not cfg.dataset.binary:
+        logger.warning("Кэш токенов выключен (dataset.cache): каждое испытание токенизирует данные само")
+        return
+    for json_path in (cfg.train_data_path, cfg.val_data_path):
+        TextDataset(_data_path(cfg, json_path), cfg.model_dump(), cfg.model_name)
+
+
+def run_sweep(cfg: AppConfig, trial_fn: Callable = run_trial) -> pd.DataFrame:
+    """
+    Перебор гиперпараметров из секции sweep: испытания выполняются в пуле процессов,
+    каждый воркер закреплён за своим набором ядер; слабые испытания останавливаются
+    правилом медианной остановки. Результаты всех испытаний сохраняются в одну таблицу
+    <sweep>/results.csv (по возрастанию/убыванию метрики).
+
+    :param cfg: конфиг приложения.
+    :param trial_fn: функция испытания (trial_fn(cfg_dict, trial, params, history) -> dict).
+    :return: таблица результатов.
+    """
+    sweep = cfg.sweep
+    trials = expand_grid(sweep)
+    if not trials:
+        raise ValueError("Пустая сетка перебора: задайте sweep.grid в конфиге")
+    prepare_shared_dataset(cfg)
+    out_dir = sweep_dir(cfg)
+    os.makedirs(out_dir, exist_ok=True)
+
+    workers, threads = plan_workers(sweep, len(trials))
+    logger.info(f"🔬 Перебор: {len(trials)} испытаний, {workers} воркеров по {threads} ядер")
+
+    # spawn: форк процесса с уже запущенными потоками torch может зависнуть
+    ctx = mp.get_context("spawn")
+    manager = ctx.Manager()
+    cores_queue = manager.Queue()
+    for cores in core_slices(workers, threads):
+        cores_queue.put(cores)
+    history = manager.dict()
+
+    cfg_dict = cfg.model_dump()
+    results = []
+    with manager, ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(cores_queue,)
+    ) as pool:
+        futures = {pool.submit(trial_fn, cfg_dict, i, params, history): (i, params) for i, params in enumerate(trials)}
+        for future in as_completed(futures):
+            trial, params = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # noqa: BLE001 — упавшее испытание не останавливает перебор
+                logger.error(f"❌ Испытание {trial} ({params}) завершилось ошибкой: {e}")
+                result = {"trial": trial, **params, "status": "failed", "error": str(e)}
+            logger.info(f"Испытание {trial}: {result}")
+            results.append(result)
+
+    table = pd.DataFrame(results)
+    if sweep.metric in table:
+        table = table.sort_values(sweep.metric, ascending=sweep.mode == "min", na_position="last")
+    results_path = os.path.join(out_dir, "results.csv")
+    table.to_csv(results_path, index=False)
+    logger.info(f"📊 Результаты перебора ({results_path}):\n{table.to_string(index=False)}")
+    return table
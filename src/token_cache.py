@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from transformers import PreTrainedTokenizerBase
+
+from src.binary_dataset import FORMAT_VERSION, BinaryDataset, convert_json_to_binary
+from src.utils.dataset_io import dataset_files
+from src.utils.logger_loader import LoggerLoader
+from src.utils.tokenizer_fingerprint import tokenizer_fingerprint
+
+INDEX_FILE = "index.json"
+
+
+class TokenCache:
+    """
+    Дисковый кэш токенизированных датасетов.
+
+    Запись кэша — бинарный датасет (src/binary_dataset.py), ключ — sha256 содержимого
+    входного JSON (всех его шардов), отпечаток и имя токенизатора, max_length и список
+    категорий. Изменение любого из них даёт новый ключ, поэтому неизменённый датасет
+    токенизируется один раз на все запуски обучения. Размер кэша ограничен:
+    при превышении max_bytes удаляются давно не использовавшиеся записи (LRU).
+
+    index.json хранит размеры и время последнего использования записей,
+    хэши входных файлов (пересчитываются только при смене размера или mtime)
+    и накопленную статистику попаданий.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None):
+        """
+        :param cache_dir: каталог кэша.
+        :param max_bytes: максимальный суммарный размер записей (None — без ограничения).
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = LoggerLoader().get_logger()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index: Dict[str, Any] = self._load_index()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _load_index(self) -> Dict[str, Any]:
+        index = {"entries": {}, "files": {}, "hits": 0, "misses": 0}
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                index.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"⚠️ Индекс кэша {self._index_path()} не прочитан, начинаем заново: {e}")
+        return index
+
+    def _save_index(self) -> None:
+        """Атомарно сохраняет индекс (временный файл + rename)."""
+        tmp_path = f"{self._index_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._index_path())
+
+    def file_hash(self, path: str) -> str:
+        """sha256 файла; при тех же размере и mtime берётся из индекса без чтения файла."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.index["files"].get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.index["files"][path] = {
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()
+        }
+        return digest.hexdigest()
+
+    def key(
+        self,
+        data_path: str,
+        tokenizer: PreTrainedTokenizerBase,
+        categories: Iterable[str],
+        max_length: int,
+    ) -> str:
+        """Ключ записи кэша: содержимое данных + токенизатор + max_length + категории."""
+        parts = {
+            "data": [self.file_hash(path) for path in dataset_files(data_path)],
+            "tokenizer": tokenizer_fingerprint(tokenizer),
+            "tokenizer_name": tokenizer.name_or_path,
+            "max_length": max_length,
+            "categories": list(categories),
+            "format_version": FORMAT_VERSION,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get_or_build(
+        self,
+        data_path: str,
+        tokenizer: PreTrainedTokenizerBase,
+        categories: Iterable[str],
+        max_length: int,
+    ) -> str:
+        """
+        Возвращает каталог бинарного датасета для data_path, токенизируя данные
+        только при промахе кэша.
+        """
+        started = time.perf_counter()
+        categories = list(categories)
+        key = self.key(data_path, tokenizer, categories, max_length)
+        path = self.entry_path(key)
+
+        hit = BinaryDataset.is_binary(path)
+        if not hit:
+            convert_json_to_binary(data_path, path, tokenizer, categories, max_length=max_length)
+        self.index["hits" if hit else "misses"] += 1
+
+        self.index["entries"][key] = {
+            "source": os.path.abspath(data_path),
+            "tokenizer_name": tokenizer.name_or_path,
+            "max_length": max_length,
+            "bytes": self.index["entries"].get(key, {}).get("bytes") or self._dir_size(path),
+            "last_used": time.time(),
+        }
+        evicted = self._evict(keep=key)
+        self._save_index()
+
+        elapsed = time.perf_counter() - started
+        total = self.index["hits"] + self.index["misses"]
+        self.logger.info(
+            f"🗃️ Кэш токенов {'попадание' if hit else 'промах'}: {data_path} за {elapsed:.2f} с "
+            f"(hit rate {self.index['hits']}/{total} = {self.index['hits'] / total:.0%}"
+            + (f", вытеснено записей: {evicted}" if evicted else "")
+            + ")"
+        )
+        return path
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+
+    def _evict(self, keep: str) -> int:
+        """Удаляет давно не использовавшиеся записи, пока кэш больше max_bytes."""
+        entries = self.index["entries"]
+        # записи, каталог которых удалили вручную, забываем
+        for key in [k for k in entries if not os.path.isdir(self.entry_path(k))]:
+            del entries[key]
+        if not self.max_bytes:
+            return 0
+
+        total = sum(entry["bytes"] for entry in entries.values())
+        evicted = 0
+        by_age: List[str] = sorted(entries, key=lambda k: entries[k]["last_used"])
+        for key in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            total -= entries.pop(key)["bytes"]
+            evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        """Удаляет все записи кэша (статистика попаданий сохраняется)."""
+        for key in list(self.index["entries"]):
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+        self.index["entries"] = {}
+        self._save_index()
@@ -0,0 +1,198 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import psutil
+import torch
+from prometheus_client import CollectorRegistry, Gauge, write_to_textfile
+from transformers import TrainerCallback
+
+from src.batching import PaddingCollator
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Инструментирование шага обучения.
+
+    По событиям Trainer каждый шаг оптимизатора делится на фазы:
+      - data_wait — от конца прошлого шага до начала текущего (выборка и сборка батчей);
+      - forward_backward — прямой и обратный проходы всех микробатчей шага;
+      - optimizer — шаг оптимизатора, планировщик и zero_grad.
+    Шаги, между которыми были оценка или сохранение чекпоинта, в data_wait не учитываются,
+    а батчи оценки — в счётчиках примеров и токенов.
+    Примеры и токены (реальные и с padding) берутся из счётчиков PaddingCollator;
+    если коллатор работает в воркерах DataLoader, примеры оцениваются по размеру батча.
+
+    В конце обучения пишет JSON-отчёт (samples/sec, tokens/sec, доли фаз, перцентили
+    длительности шага, пиковый RSS) и, по желанию, textfile для node_exporter Prometheus.
+    """
+
+    PHASES = ("data_wait", "forward_backward", "optimizer")
+
+    def __init__(
+        self,
+        collator: Optional[PaddingCollator] = None,
+        report_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        run_name: str = "train",
+    ):
+        """
+        :param collator: коллатор обучения (источник счётчиков примеров и токенов).
+        :param report_path: путь JSON-отчёта (None — не писать).
+        :param prometheus_path: путь textfile Prometheus (*.prom, None — не писать).
+        :param run_name: значение метки run в метриках Prometheus.
+        """
+        self.collator = collator
+        self.report_path = report_path
+        self.prometheus_path = prometheus_path
+        self.run_name = run_name
+        self.report: Dict[str, Any] = {}
+        self._process = psutil.Process()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.step_times: List[float] = []
+        self.phase_times: Dict[str, List[float]] = {phase: [] for phase in self.PHASES}
+        self.examples = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.peak_rss = self._process.memory_info().rss
+        self._train_start = None
+        self._last_end = None
+        self._step_begin = None
+        self._pre_optimizer = None
+        self._interrupted = False
+        self._counters = self._collator_counters()
+
+    @staticmethod
+    def _now() -> float:
+        # на GPU операции асинхронны: без синхронизации время уйдёт не в ту фазу
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _collator_counters(self) -> tuple:
+        c = self.collator
+        return (c.examples, c.real_tokens, c.padded_tokens) if c is not None else (0, 0, 0)
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._reset()
+        self._train_start = self._last_end = self._now()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._step_begin = self._now()
+        if self._last_end is not None and not self._interrupted:
+            self.phase_times["data_wait"].append(self._step_begin - self._last_end)
+        self._interrupted = False
+
+    def on_pre_optimizer_step(self, args, state, control, **kwargs):
+        self._pre_optimizer = self._now()
+        if self._step_begin is not None:
+            self.phase_times["forward_backward"].append(self._pre_optimizer - self._step_begin)
+
+    def on_step_end(self, args, state, control, **kwargs):
+        now = self._now()
+        if self._pre_optimizer is not None:
+            self.phase_times["optimizer"].append(now - self._pre_optimizer)
+        if self._step_begin is not None:
+            self.step_times.append(now - self._step_begin)
+        self._last_end = now
+        self._step_begin = self._pre_optimizer = None
+
+        counters = self._collator_counters()
+        examples, real, padded = (after - before for after, before in zip(counters, self._counters))
+        self._counters = counters
+        if not examples:
+            # коллатор в воркерах DataLoader: счётчики основного процесса не меняются
+            examples = args.per_device_train_batch_size * args.gradient_accumulation_steps * args.world_size
+        self.examples += examples
+        self.real_tokens += real
+        self.padded_tokens += padded
+        self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._interrupted = True
+        # батчи оценки собирает тот же коллатор — в пропускную способность обучения они не входят
+        self._counters = self._collator_counters()
+
+    def on_save(self, args, state, control, **kwargs):
+        self._interrupted = True
+
+    def summary(self) -> Dict[str, Any]:
+        """Сводка по шагам с начала обучения."""
+        busy = sum(self.step_times) + sum(self.phase_times["data_wait"])
+        total = time.perf_counter() - self._train_start if self._train_start else 0.0
+        steps = np.asarray(self.step_times) * 1000
+        summary: Dict[str, Any] = {
+            "steps": len(self.step_times),
+            "examples": self.examples,
+            "train_seconds": round(total, 3),
+            "samples_per_sec": round(self.examples / busy, 3) if busy else 0.0,
+            "real_tokens": self.real_tokens,
+            "padded_tokens": self.padded_tokens,
+            "real_tokens_per_sec": round(self.real_tokens / busy, 1) if busy else 0.0,
+            "padded_tokens_per_sec": round(self.padded_tokens / busy, 1) if busy else 0.0,
+            "padding_waste": round(1 - self.real_tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0,
+            "peak_rss_mb": round(self.peak_rss / 2 ** 20, 1),
+            "phase_seconds": {phase: round(sum(times), 3) for phase, times in self.phase_times.items()},
+            "phase_share": {
+                phase: round(sum(times) / busy, 4) if busy else 0.0 for phase, times in self.phase_times.items()
+            },
+            "step_ms": {
+                f"p{q}": round(float(np.percentile(steps, q)), 2) if len(steps) else 0.0 for q in (50, 90, 95, 99)
+            },
+        }
+        if len(steps):
+            summary["step_ms"]["max"] = round(float(steps.max()), 2)
+        return summary
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self.report = self.summary()
+        logger.info(
+            f"⏱️ Пропускная способность: {self.report['samples_per_sec']} примеров/с, "
+            f"{self.report['real_tokens_per_sec']} токенов/с (с padding {self.report['padded_tokens_per_sec']}); "
+            f"фазы {self.report['phase_share']}; шаг p50/p99 {self.report['step_ms']['p50']}/"
+            f"{self.report['step_ms']['p99']} мс; пиковый RSS {self.report['peak_rss_mb']} МБ"
+        )
+        if self.report_path:
+            os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+            with open(self.report_path, "w", encoding="utf-8") as f:
+                json.dump(self.report, f, ensure_ascii=False, indent=2)
+            logger.info(f"📝 Отчёт о прогоне сохранён в {self.report_path}")
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def write_prometheus(self, path: str) -> None:
+        """Пишет сводку в textfile Prometheus (атомарно, через write_to_textfile)."""
+        registry = CollectorRegistry()
+        labels = ["run"]
+        scalars = {
+            "samples_per_second": self.report["samples_per_sec"],
+            "real_tokens_per_second": self.report["real_tokens_per_sec"],
+            "padded_tokens_per_second": self.report["padded_tokens_per_sec"],
+            "padding_waste_ratio": self.report["padding_waste"],
+            "peak_rss_bytes": self.peak_rss,
+            "steps": self.report["steps"],
+        }
+        for name, value in scalars.items():
+            Gauge(f"training_{name}", f"Training {name.replace('_', ' ')}", labels, registry=registry) \
+                .labels(self.run_name).set(value)
+
+        phases = Gauge("training_phase_seconds", "Time spent per step phase", labels + ["phase"], registry=registry)
+        for phase, seconds in self.report["phase_seconds"].items():
+            phases.labels(self.run_name, phase).set(seconds)
+        latency = Gauge(
+            "training_step_latency_seconds", "Step latency percentiles", labels + ["quantile"], registry=registry
+        )
+        for key, ms in self.report["step_ms"].items():
+            if key.startswith("p"):
+                latency.labels(self.run_name, str(int(key[1:]) / 100)).set(ms / 1000)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_to_textfile(path, registry)
+        logger.info(f"📈 Метрики Prometheus сохранены в {path}")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 
 class AugmentationConfig(BaseModel):
@@ -12,11 +12,177 @@ class AugmentationConfig(BaseModel):
     min_examples: int
     bt_rounds: int
     bt_beam_size: int
+    bt_batch_samples: int = Field(64, ge=1)       # записей на один вызов augment_many
+    bt_max_batch_tokens: int = Field(4096, ge=1)  # токенов входа (с padding) в батче перевода
+    bt_max_segment_tokens: Optional[int] = Field(128, ge=0)  # токенов в сегменте перевода (0 — целиком)
+    plan: bool = True                             # переводить только под дефицит min_examples
+    bt_oversample: float = Field(1.2, ge=1)       # запас плана на неудачные переводы и дубликаты
+    cache_path: Optional[str] = None              # SQLite-кэш переводов (None — без кэша)
+    resume: bool = True                           # продолжать прерванный прогон с курсора
+    workers: int = Field(1, ge=1)                 # процессов перевода (веса моделей общие)
+    threads_per_worker: Optional[int] = None      # ядер на процесс (None — поровну физических)
 
     class Config:
         extra = "ignore"  # игнорировать лишние ключи
 
 
+class ScrapingConfig(BaseModel):
+    """
+    Настройки сбора субтитров (секция 'scraping' в config.yaml).
+    Все поля имеют значения по умолчанию, секцию можно не указывать.
+    """
+    workers: int = Field(1, ge=1)              # число параллельных загрузок
+    max_retries: int = Field(3, ge=0)          # повторы при троттлинге/сетевых сбоях
+    backoff_base: float = Field(1.0, ge=0)     # базовая пауза между повторами (сек)
+    backoff_max: float = Field(60.0, ge=0)     # максимальная пауза между повторами (сек)
+    min_interval: float = Field(0.0, ge=0)     # минимальный интервал между запросами (сек)
+    incremental: bool = True                   # пропускать видео, уже учтённые в манифесте
+    refresh: bool = False                      # перескачать субтитры даже для известных видео
+    in_memory: bool = False                    # один запрос к экстрактору, VTT сразу в память
+    keep_raw: bool = True                      # сохранять VTT на диск в режиме in_memory
+    write_cleaned: bool = True                 # писать промежуточный _cleaned.txt рядом с VTT
+    dedup_overlap: bool = True                 # убирать перекрытия соседних cue (только у автосубтитров)
+    min_overlap: int = Field(2, ge=1)          # минимальное перекрытие (в словах), считающееся повтором
+
+    class Config:
+        extra = "ignore"
+
+
+class ChunkingConfig(BaseModel):
+    """
+    Настройки разбивки транскриптов на чанки (секция 'chunking' в config.yaml).
+    """
+    chunk_size: int = Field(500, ge=1)         # число токенов в одном чанке
+    stride: int = Field(0, ge=0)               # перекрытие соседних чанков в токенах
+    snap_to_sentence: bool = False             # заканчивать чанк на конце предложения
+    min_fill: float = Field(0.5, gt=0, le=1)   # минимальная заполненность чанка при привязке
+
+    class Config:
+        extra = "ignore"
+
+
+class DatasetConfig(BaseModel):
+    """
+    Настройки хранения датасета (секция 'dataset' в config.yaml).
+    """
+    shard_size_mb: float = Field(0, ge=0)      # размер шарда JSON/JSONL в МБ (0 — один файл)
+    binary: bool = False                       # обучаться на бинарной (memmap) версии train/val
+    cache: bool = True                         # кэшировать токенизированные train/val на диске
+    cache_dir: str = "data/cache/tokens"       # каталог кэша токенов
+    cache_max_gb: float = Field(5.0, ge=0)     # предел размера кэша (0 — без ограничения)
+    streaming: bool = False                    # потоковый StreamingTextDataset вместо TextDataset
+    shuffle_buffer: int = Field(10000, ge=1)   # буфер перемешивания потокового режима (записей)
+    val_fraction: float = Field(0.1, ge=0, lt=1)  # доля видео в валидации (--task split)
+    split_seed: int = 0                        # соль хэша разбиения train/val
+
+    @property
+    def max_shard_bytes(self) -> Optional[int]:
+        """Размер шарда в байтах для DatasetWriter (None — без шардирования)."""
+        return int(self.shard_size_mb * 1024 * 1024) or None
+
+    class Config:
+        extra = "ignore"
+
+
+class DedupConfig(BaseModel):
+    """
+    Удаление почти-дубликатов MinHash/LSH (секция 'dedup' в config.yaml).
+    """
+    enabled: bool = True                       # фильтровать почти-дубликаты при аугментации и --task dedup
+    threshold: float = Field(0.8, gt=0, le=1)  # минимальное сходство Жаккара для дубликата
+    num_perm: int = Field(128, ge=1)           # длина MinHash-сигнатуры
+    shingle_size: int = Field(5, ge=1)         # длина символьного шингла
+
+    class Config:
+        extra = "ignore"
+
+
+class CpuProfileConfig(BaseModel):
+    """
+    Профиль обучения на CPU (секция 'cpu_profile' в config.yaml, включается training_profile: cpu).
+    """
+    num_threads: Optional[int] = Field(None, ge=1)  # intra-op потоки torch (None — физические ядра)
+    interop_threads: int = Field(1, ge=1)      # inter-op потоки torch
+    bf16: bool = True                          # bf16 autocast, если CPU поддерживает его аппаратно
+    compile: bool = False                      # torch.compile модели
+    gradient_accumulation_steps: int = Field(1, ge=1)  # шагов накопления градиентов
+    dataloader_workers: int = Field(0, ge=0)   # процессы DataLoader (0 — в основном процессе)
+
+    class Config:
+        extra = "ignore"
+
+
+class MetricsConfig(BaseModel):
+    """
+    Инструментирование обучения (секция 'metrics' в config.yaml).
+    """
+    enabled: bool = True                       # ThroughputCallback в fine_tune_model
+    report_path: Optional[str] = None          # JSON-отчёт (None — <save_dir>/run_report.json)
+    prometheus_textfile: Optional[str] = None  # textfile для node_exporter (None — не писать)
+
+    class Config:
+        extra = "ignore"
+
+
+class CheckpointingConfig(BaseModel):
+    """
+    Чекпоинты и продолжение обучения (секция 'checkpointing' в config.yaml).
+    """
+    resume: bool = True                      # продолжить незавершённый прогон с теми же настройками
+    async_save: bool = True                  # запись чекпоинтов в фоновом потоке
+    save_steps: Optional[int] = Field(None, ge=1)  # интервал в шагах (None — раз в эпоху)
+    handle_preemption: bool = True           # по SIGTERM сохранить чекпоинт и остановиться
+
+    class Config:
+        extra = "ignore"
+
+
+class SweepConfig(BaseModel):
+    """
+    Перебор гиперпараметров (секция 'sweep' в config.yaml, --task sweep).
+    """
+    grid: Dict[str, List[Any]] = Field(default_factory=dict)  # параметр конфига → значения
+    max_trials: Optional[int] = Field(None, ge=1)  # случайная выборка из сетки (None — вся сетка)
+    seed: int = 0                              # seed выборки испытаний
+    workers: Optional[int] = Field(None, ge=1)     # процессов в пуле (None — по числу ядер)
+    threads_per_trial: Optional[int] = Field(None, ge=1)  # ядер на испытание (None — поровну)
+    metric: str = "eval_loss"                  # метрика сравнения испытаний
+    mode: Literal["min", "max"] = "min"        # лучше меньшее или большее значение
+    median_stopping: bool = True               # останавливать испытания хуже медианы
+    grace_evals: int = Field(1, ge=0)          # оценок до первого решения об остановке
+    min_trials: int = Field(3, ge=1)           # испытаний для сравнения с медианой
+    output_dir: Optional[str] = None           # каталог испытаний (None — <save_dir>/sweep)
+
+    class Config:
+        extra = "ignore"
+
+
+class RegistryConfig(BaseModel):
+    """
+    Общий реестр токенизаторов и моделей (секция 'registry' в config.yaml).
+    """
+    max_gb: float = Field(0, ge=0)             # бюджет памяти на модели в ГБ (0 — без вытеснения)
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        return int(self.max_gb * 1024 ** 3) or None
+
+    class Config:
+        extra = "ignore"
+
+
+class BatchingConfig(BaseModel):
+    """
+    Сборка батчей при обучении (секция 'batching' в config.yaml).
+    """
+    group_by_length: bool = True               # LengthBucketSampler: батчи из примеров близкой длины
+    bucket_size_multiplier: int = Field(50, ge=1)  # размер корзины сортировки в батчах
+    pad_to_multiple_of: Optional[int] = Field(None, ge=1)  # округление длины батча
+
+    class Config:
+        extra = "ignore"
+
+
 class AppConfig(BaseModel):
     """
     Основная модель конфигурации приложения.
@@ -31,11 +197,15 @@ class AppConfig(BaseModel):
     lora_r: int = Field(..., ge=1)
     lora_alpha: int
     lora_dropout: float
+    # модули для адаптеров: пресет автопоиска или явный список имён (приоритетнее пресета)
+    lora_preset: Literal["attention", "attention_ffn", "all_linear"] = "attention"
+    lora_target_modules: Optional[List[str]] = None
     batch_size: int
     num_epochs: int
     learning_rate: float
     weight_decay: float
     logging_steps: int
+    eval_steps: Optional[int] = Field(None, ge=1)  # оценка каждые N шагов (None — раз в эпоху)
     save_total_limit: int
 
     log_level: str
@@ -46,5 +216,19 @@ class AppConfig(BaseModel):
     # позволяем тестам не иметь этой секции
     augmentation: Optional[AugmentationConfig] = None
 
+    scraping: ScrapingConfig = Field(default_factory=ScrapingConfig)
+    chunking: ChunkingConfig = Field(default_factory=ChunkingConfig)
+    dataset: DatasetConfig = Field(default_factory=DatasetConfig)
+    batching: BatchingConfig = Field(default_factory=BatchingConfig)
+    dedup: DedupConfig = Field(default_factory=DedupConfig)
+    registry: RegistryConfig = Field(default_factory=RegistryConfig)
+
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    checkpointing: CheckpointingConfig = Field(default_factory=CheckpointingConfig)
+    sweep: SweepConfig = Field(default_factory=SweepConfig)
+
+    training_profile: Literal["default", "cpu"] = "default"
+    cpu_profile: CpuProfileConfig = Field(default_factory=CpuProfileConfig)
+
     class Config:
         extra = "ignore"
@@ -0,0 +1,218 @@
+import glob
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Записи датасета — словари {"category", "text", ...}
+Record = Dict[str, Any]
+
+
+def shard_path(path: str, index: int) -> str:
+    """Путь к шарду номер index: data/train.json → data/train-00000.json."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}-{index:05d}{ext}"
+
+
+def dataset_files(path: str) -> List[str]:
+    """
+    Файлы датасета по его логическому пути: сам файл, если он есть,
+    иначе шарды <stem>-NNNNN<ext> по порядку.
+    """
+    if os.path.exists(path):
+        return [path]
+    stem, ext = os.path.splitext(path)
+    shards = sorted(glob.glob(f"{glob.escape(stem)}-[0-9][0-9][0-9][0-9][0-9]{ext}"))
+    if not shards:
+        raise FileNotFoundError(f"Датасет не найден: {path}")
+    return shards
+
+
+def _iter_file(path: str) -> Iterator[Record]:
+    """
+    Построчно читает один файл: JSONL или JSON-массив по записи в строке (как пишет
+    DatasetWriter). Произвольно отформатированный JSON (например, старый indent=4)
+    распознаётся по второй строке и читается целиком через json.load.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline().strip()
+        if first.startswith("{"):
+            yield json.loads(first)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        if first == "[":
+            second = f.readline().strip().rstrip(",")
+            head = None
+            line_based = True
+            if second not in ("", "]"):
+                try:
+                    head = json.loads(second)
+                except json.JSONDecodeError:
+                    line_based = False
+            if line_based:
+                if head is not None:
+                    yield head
+                for line in f:
+                    line = line.strip().rstrip(",")
+                    if line == "]":
+                        break
+                    if line:
+                        yield json.loads(line)
+                return
+
+        if first and first != "[]":
+            f.seek(0)
+            yield from json.load(f)
+
+
+def iter_records(path: str) -> Iterator[Record]:
+    """
+    Потоковое чтение датасета (одного файла или шардов) по одной записи,
+    без загрузки всего файла в память.
+
+    :param path: логический путь к датасету (.json или .jsonl).
+    """
+    for file_path in dataset_files(path):
+        yield from _iter_file(file_path)
+
+
+class DatasetWriter:
+    """
+    Потоковая запись датасета с атомарной фиксацией.
+
+    Записи пишутся по мере поступления в компактном виде по одной в строке:
+    для .jsonl — JSON Lines, для остальных расширений — JSON-массив, который
+    по-прежнему читается обычным json.load. При max_shard_bytes файл разбивается
+    на шарды <stem>-NNNNN<ext> примерно заданного размера (запись целиком в одном шарде).
+
+    Всё пишется во временные файлы *.tmp, которые переименовываются в итоговые
+    только в commit(); при ошибке (выход из with по исключению) они удаляются,
+    и упавший на середине процесс не оставляет обрезанного датасета.
+    """
+
+    def __init__(self, path: str, max_shard_bytes: Optional[int] = None, append: bool = False):
+        """
+        :param path: логический путь к датасету.
+        :param max_shard_bytes: максимальный размер шарда в байтах (None — один файл).
+        :param append: дописать записи к уже существующему датасету.
+        """
+        self.path = path
+        self.max_shard_bytes = max_shard_bytes
+        self.jsonl = path.endswith(".jsonl")
+        self.count = 0
+        self.paths: List[str] = []
+
+        self._tmp_paths: List[str] = []
+        self._file = None
+        self._shard_bytes = 0
+        self._shard_records = 0
+        self._closed = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        existing = self._existing_files()
+        sharded = existing != [path]
+        self._next_shard = 0
+        # файлы старой версии датасета, которые после commit() не нужны
+        self._stale: List[str] = existing
+
+        if append and existing:
+            if self.max_shard_bytes and sharded:
+                # старые шарды не трогаем, новые нумеруются после них
+                self._next_shard = len(existing)
+                self._stale = []
+            else:
+                # переписываем старые записи потоково в новые временные файлы
+                self.write_many(iter_records(path))
+
+    def _existing_files(self) -> List[str]:
+        try:
+            return dataset_files(self.path)
+        except FileNotFoundError:
+            return []
+
+    def _open_next(self) -> None:
+        target = shard_path(self.path, self._next_shard) if self.max_shard_bytes else self.path
+        self._next_shard += 1
+        tmp_path = f"{target}.tmp"
+        self._file = open(tmp_path, "w", encoding="utf-8")
+        self._tmp_paths.append(tmp_path)
+        self._shard_bytes = 0
+        self._shard_records = 0
+        if not self.jsonl:
+            self._file.write("[")
+
+    def _close_current(self) -> None:
+        if self._file is None:
+            return
+        if not self.jsonl:
+            self._file.write("\n]\n" if self._shard_records else "]\n")
+        self._file.close()
+        self._file = None
+
+    def write(self, record: Record) -> None:
+        """Дописывает одну запись (при необходимости открывает новый шард)."""
+        line = json.dumps(record, ensure_ascii=False)
+        size = len(line.encode("utf-8")) + 2
+        if self._file is None or (
+            self.max_shard_bytes and self._shard_records and self._shard_bytes + size > self.max_shard_bytes
+        ):
+            self._close_current()
+            self._open_next()
+
+        if self.jsonl:
+            self._file.write(line + "\n")
+        else:
+            self._file.write(("," if self._shard_records else "") + "\n" + line)
+        self._shard_bytes += size
+        self._shard_records += 1
+        self.count += 1
+
+    def write_many(self, records: Iterable[Record]) -> int:
+        """Дописывает записи из итератора и возвращает их число."""
+        written = 0
+        for record in records:
+            self.write(record)
+            written += 1
+        return written
+
+    def commit(self) -> List[str]:
+        """Закрывает файлы и атомарно переименовывает временные файлы в итоговые."""
+        if self._file is None and not self._tmp_paths:
+            # пустой датасет — всё равно валидный файл
+            self._open_next()
+        self._close_current()
+        for tmp_path in self._tmp_paths:
+            final_path = tmp_path[: -len(".tmp")]
+            os.replace(tmp_path, final_path)
+            self.paths.append(final_path)
+        # лишние файлы прежней версии (например, шарды после перехода на один файл)
+        for stale in self._stale:
+            if stale not in self.paths and os.path.exists(stale):
+                os.remove(stale)
+        self._closed = True
+        return self.paths
+
+    def abort(self) -> None:
+        """Удаляет временные файлы; существующий датасет остаётся нетронутым."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for tmp_path in self._tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._tmp_paths = []
+        self._closed = True
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self._closed:
+            return False
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
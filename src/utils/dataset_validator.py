@@ -1,4 +1,5 @@
 import pandas as pd
+from src.processing.near_duplicates import NearDuplicateFilter
 from src.utils.logger_loader import LoggerLoader
 
 
@@ -36,6 +37,19 @@ class DatasetValidator:
         else:
             self.logger.info("Дубликатов нет")
 
+    def check_near_duplicates(self, df: pd.DataFrame, threshold: float = 0.8) -> int:
+        """Проверяет почти-дубликаты текстов (MinHash/LSH) и возвращает их число."""
+        if 'text' not in df.columns:
+            return 0
+        pairs = NearDuplicateFilter(threshold=threshold).duplicate_pairs(df['text'].astype(str).tolist())
+        if pairs:
+            self.logger.warning(f"Обнаружено {len(pairs)} почти-дубликатов (сходство ≥ {threshold})")
+            for duplicate, original in pairs[:5]:
+                self.logger.warning(f"  строка {df.index[duplicate]} ≈ строка {df.index[original]}")
+        else:
+            self.logger.info("Почти-дубликатов нет")
+        return len(pairs)
+
     def check_label_consistency(self, df: pd.DataFrame):
         """Проверяет соответствие меток и текстов."""
         if 'text' not in df.columns or 'label' not in df.columns:
@@ -50,6 +64,7 @@ class DatasetValidator:
         df = self.load_dataset()
         self.check_missing_values(df)
         self.check_duplicates(df)
+        self.check_near_duplicates(df)
         self.check_label_consistency(df)
         self.logger.info("Проверка датасета завершена")
         return df
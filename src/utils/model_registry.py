@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from transformers import AutoTokenizer
+
+from src.utils.logger_loader import LoggerLoader
+
+
+def model_bytes(model: Any) -> int:
+    """Размер весов и буферов torch-модели в байтах (0 для объектов без параметров)."""
+    total = 0
+    for attr in ("parameters", "buffers"):
+        tensors = getattr(model, attr, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+
+class ModelRegistry:
+    """
+    Общий на процесс реестр токенизаторов и моделей.
+
+    Объект загружается при первом запросе (лениво) и дальше отдаётся тот же экземпляр,
+    поэтому сборщик датасета, оба TextDataset и fine_tune_model используют один токенизатор,
+    а модели перевода не перезагружаются при каждом создании пайплайна.
+    Время загрузки и число обращений записываются (stats()). При max_bytes реестр
+    перестаёт держать давно не использовавшиеся модели, когда их суммарный размер
+    превышает бюджет (LRU); объект, на который есть другие ссылки, при этом остаётся жив.
+
+    Реестр для моделей только на чтение (инференс): обучаемую модель через него грузить нельзя,
+    иначе изменения весов увидят все остальные пользователи.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        :param max_bytes: бюджет памяти на модели в байтах (None — без вытеснения).
+        """
+        self.max_bytes = max_bytes
+        self.logger = LoggerLoader().get_logger()
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any], size: Callable[[Any], int] = model_bytes) -> Any:
+        """
+        Возвращает объект по ключу, загружая его через loader() при первом обращении.
+
+        :param key: ключ объекта (например, ("tokenizer", имя модели)).
+        :param loader: функция загрузки.
+        :param size: оценка размера объекта в байтах для бюджета памяти.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["hits"] += 1
+                self._entries.move_to_end(key)
+                return entry["value"]
+
+            started = time.perf_counter()
+            value = loader()
+            elapsed = time.perf_counter() - started
+            self._entries[key] = {"value": value, "load_time": elapsed, "hits": 0, "bytes": size(value)}
+            self.logger.info(f"📦 Загружено {key} за {elapsed:.2f} с")
+            self._evict(keep=key)
+            return value
+
+    def tokenizer(self, name: str, tokenizer_cls: Any = None, **kwargs: Any) -> Any:
+        """Общий экземпляр tokenizer_cls.from_pretrained(name, **kwargs) (по умолчанию AutoTokenizer)."""
+        tokenizer_cls = tokenizer_cls or AutoTokenizer
+        key = ("tokenizer", tokenizer_cls.__name__, name, tuple(sorted(kwargs.items())))
+        return self.get(key, lambda: tokenizer_cls.from_pretrained(name, **kwargs), size=lambda _: 0)
+
+    def model(self, model_cls: Any, name: str, device: Optional[str] = None, **kwargs: Any) -> Any:
+        """
+        Общий экземпляр model_cls.from_pretrained(name, **kwargs) на устройстве device
+        в режиме eval.
+        """
+        def load() -> Any:
+            model = model_cls.from_pretrained(name, **kwargs)
+            if device is not None:
+                model = model.to(device)
+            model.eval()
+            return model
+
+        key = ("model", model_cls.__name__, name, device, tuple(sorted(kwargs.items())))
+        return self.get(key, load)
+
+    def _evict(self, keep: Hashable) -> None:
+        """Отпускает давно не использовавшиеся объекты, пока их размер больше max_bytes."""
+        if not self.max_bytes:
+            return
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep or not self._entries[key]["bytes"]:
+                continue
+            total -= self._entries.pop(key)["bytes"]
+            self.logger.info(f"♻️ Реестр моделей: вытеснено {key}")
+
+    def stats(self) -> Dict[Hashable, Dict[str, Any]]:
+        """Время загрузки, число повторных обращений и размер каждого загруженного объекта."""
+        with self._lock:
+            return {
+                key: {k: entry[k] for k in ("load_time", "hits", "bytes")}
+                for key, entry in self._entries.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    """Реестр текущего процесса."""
+    return _registry
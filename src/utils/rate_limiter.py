@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from src.utils.logger_loader import LoggerLoader
+
+logger = LoggerLoader().get_logger()
+
+# Маркеры в тексте ошибки, по которым распознаём троттлинг со стороны сервера
+THROTTLE_MARKERS = ("429", "too many requests", "rate limit", "rate-limit")
+# Маркеры временных сетевых сбоев, которые имеет смысл повторить
+TRANSIENT_MARKERS = (
+    "timed out",
+    "timeout",
+    "connection reset",
+    "temporarily unavailable",
+    "http error 5",
+)
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """Проверяет, что ошибка вызвана ограничением частоты запросов (HTTP 429 и т. п.)."""
+    message = str(exc).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """Проверяет, что ошибку стоит повторить: троттлинг или временный сетевой сбой."""
+    message = str(exc).lower()
+    return is_throttling_error(exc) or any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+class AdaptiveRateLimiter:
+    """
+    Потокобезопасный ограничитель частоты запросов с адаптивным интервалом.
+
+    Интервал между запросами растёт мультипликативно при троттлинге
+    и плавно возвращается к min_interval после успешных запросов.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.0,
+        max_interval: float = 60.0,
+        throttle_interval: float = 1.0,
+        increase_factor: float = 2.0,
+        decay_factor: float = 0.9,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        :param min_interval: базовый интервал между запросами (секунды).
+        :param max_interval: верхняя граница интервала.
+        :param throttle_interval: минимальный интервал после первого троттлинга.
+        :param increase_factor: множитель интервала при троттлинге.
+        :param decay_factor: множитель интервала после успешного запроса.
+        :param clock: источник времени (подменяется в тестах).
+        :param sleep: функция ожидания (подменяется в тестах).
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.throttle_interval = throttle_interval
+        self.increase_factor = increase_factor
+        self.decay_factor = decay_factor
+        self._clock = clock
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._interval = min_interval
+        self._next_slot = 0.0
+        self.throttle_events = 0
+
+    @property
+    def interval(self) -> float:
+        """Текущий интервал между запросами."""
+        return self._interval
+
+    def acquire(self) -> None:
+        """Блокирует поток до момента, когда можно отправить следующий запрос."""
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            wait = slot - now
+        if wait > 0:
+            self._sleep(wait)
+
+    def on_success(self) -> None:
+        """Плавно уменьшает интервал после успешного запроса."""
+        with self._lock:
+            self._interval = max(self.min_interval, self._interval * self.decay_factor)
+
+    def on_throttle(self) -> None:
+        """Увеличивает интервал после ответа сервера о превышении лимита."""
+        with self._lock:
+            self.throttle_events += 1
+            increased = max(self._interval * self.increase_factor, self.throttle_interval)
+            self._interval = min(self.max_interval, increased)
+            # Все потоки ждут хотя бы один новый интервал, а не только следующий
+            self._next_slot = max(self._next_slot, self._clock() + self._interval)
+        logger.warning(f"⏳ Троттлинг: интервал между запросами увеличен до {self._interval:.2f} с")
+
+
+def call_with_retries(
+    func: Callable[..., Any],
+    *args: Any,
+    max_retries: int = 3,
+    backoff_base: float = 1.0,
+    backoff_max: float = 60.0,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    is_retryable: Callable[[BaseException], bool] = is_retryable_error,
+    rng: Optional[random.Random] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    **kwargs: Any,
+) -> Any:
+    """
+    Вызывает func с повторами при временных ошибках.
+
+    Пауза между попытками — экспоненциальная с полным джиттером:
+    uniform(0, min(backoff_max, backoff_base * 2 ** attempt)).
+
+    :param func: вызываемая функция.
+    :param max_retries: число повторов после первой неудачной попытки.
+    :param backoff_base: базовая пауза (секунды).
+    :param backoff_max: максимальная пауза (секунды).
+    :param limiter: общий ограничитель частоты; получает сигналы об успехе и троттлинге.
+    :param is_retryable: предикат, решающий, стоит ли повторять ошибку.
+    :param rng: генератор случайных чисел для джиттера.
+    :param sleep: функция ожидания (подменяется в тестах).
+    :return: результат func.
+    """
+    rng = rng or random.Random()
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if limiter is not None and is_throttling_error(e):
+                limiter.on_throttle()
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = rng.uniform(0, min(backoff_max, backoff_base * 2 ** attempt))
+            attempt += 1
+            logger.warning(f"🔁 Повтор {attempt}/{max_retries} через {delay:.2f} с: {e}")
+            sleep(delay)
+            continue
+
+        if limiter is not None:
+            limiter.on_success()
+        return result
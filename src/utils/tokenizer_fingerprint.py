@@ -0,0 +1,38 @@
+import hashlib
+import json
+
+from transformers import PreTrainedTokenizerBase
+
+# Атрибут, в котором отпечаток кэшируется на самом токенизаторе
+_CACHE_ATTR = "_dataset_fingerprint"
+
+
+def tokenizer_fingerprint(tokenizer: PreTrainedTokenizerBase) -> str:
+    """
+    Отпечаток токенизатора: sha1 от всего, что влияет на ID токенов.
+
+    Для fast-токенизатора это сериализованный backend (нормализация, пре-токенизация,
+    модель со словарём, постобработка), для обычного — словарь и специальные токены.
+    ID, сохранённые в датасете с одним отпечатком, годятся для любой модели
+    с тем же отпечатком; при несовпадении текст нужно токенизировать заново.
+
+    :param tokenizer: токенизатор Hugging Face.
+    :return: hex-строка sha1.
+    """
+    cached = getattr(tokenizer, _CACHE_ATTR, None)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.sha1(type(tokenizer).__name__.encode("utf-8"))
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        digest.update(backend.to_str().encode("utf-8"))
+    else:
+        vocab = sorted(tokenizer.get_vocab().items(), key=lambda item: item[1])
+        digest.update(json.dumps(vocab, ensure_ascii=False).encode("utf-8"))
+    digest.update(json.dumps(tokenizer.all_special_tokens, ensure_ascii=False).encode("utf-8"))
+    digest.update(json.dumps(tokenizer.all_special_ids).encode("utf-8"))
+
+    fingerprint = digest.hexdigest()
+    setattr(tokenizer, _CACHE_ATTR, fingerprint)
+    return fingerprint
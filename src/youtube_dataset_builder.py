@@ -1,22 +1,29 @@
+import hashlib
+import io
 import os
-import re
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Tuple
 
-from transformers import AutoTokenizer
-
-from src.youtube_scraper import YouTubeScraper
+from src.youtube_scraper import SubtitleTrack, YouTubeScraper
+from src.scrape_manifest import ScrapeManifest
 from src.subtitle_preprocessor import SubtitlePreprocessor
+from src.processing.chunker import Chunk, TextChunker
 from src.dataset_saver import DatasetSaver
 from src.utils.logger_loader import LoggerLoader
+from src.utils.model_registry import get_registry
 from src.utils.config_model import AppConfig
+from src.utils.rate_limiter import AdaptiveRateLimiter, call_with_retries
+from src.utils.tokenizer_fingerprint import tokenizer_fingerprint
 
 
 class YouTubeDatasetBuilder:
     """
     Сбор датасета: скачивание, очистка, разбивка на чанки и сохранение в JSON.
-    """
 
-    CHUNK_SIZE: int = 500  # число токенов в одном чанке
+    Записи датасета уже токенизированы: кроме category и text в них лежат input_ids
+    (со специальными токенами), length и отпечаток токенизатора cfg.model_name,
+    так что TextDataset при обучении не токенизирует текст повторно.
+    """
 
     def __init__(self, cfg: AppConfig):
         self.cfg: AppConfig = cfg
@@ -30,92 +37,277 @@ class YouTubeDatasetBuilder:
         os.makedirs(self.subtitle_dir, exist_ok=True)
         self.scraper = YouTubeScraper(self.subtitle_dir)
 
+        # параллельная загрузка: общий ограничитель частоты для всех потоков
+        self.scraping = cfg.scraping
+        self.rate_limiter = AdaptiveRateLimiter(
+            min_interval=self.scraping.min_interval,
+            max_interval=self.scraping.backoff_max,
+        )
+
         self.output_dir: str = cfg.output_dir
         os.makedirs(self.output_dir, exist_ok=True)
-        self.saver = DatasetSaver(os.path.join(self.output_dir, "dataset.json"))
+        self.saver = DatasetSaver(
+            os.path.join(self.output_dir, "dataset.json"),
+            max_shard_bytes=cfg.dataset.max_shard_bytes,
+        )
+
+        # манифест инкрементальной сборки: повторный запуск трогает только новые видео
+        self.manifest: Optional[ScrapeManifest] = None
+        if self.scraping.incremental:
+            self.manifest = ScrapeManifest(
+                os.path.join(self.output_dir, "scrape_manifest.json"),
+                os.path.join(self.output_dir, "chunks"),
+            )
 
-        # для токенизации при чанкинге
-        self.tokenizer = AutoTokenizer.from_pretrained(cfg.model_name)
+        # для токенизации при чанкинге: срезы исходного текста по offset mapping
+        self.tokenizer = get_registry().tokenizer(cfg.model_name)
+        self.fingerprint: str = tokenizer_fingerprint(self.tokenizer)
+        self.chunker = TextChunker(
+            self.tokenizer,
+            chunk_size=cfg.chunking.chunk_size,
+            stride=cfg.chunking.stride,
+            snap_to_sentence=cfg.chunking.snap_to_sentence,
+            min_fill=cfg.chunking.min_fill,
+        )
 
         # статистика
         self.total_videos: int = 0
         self.downloaded_subtitles: int = 0
+        self.cached_videos: int = 0
+        self.tokens_saved: int = 0
         self.skipped_videos: List[Dict[str, str]] = []
 
+    def _chunk_lines(self, lines: Iterable[str]) -> Iterator[Chunk]:
+        """Потоково разбивает текст, поданный построчно, на чанки (текст, ID токенов)."""
+        return self.chunker.encode_stream(lines)
+
     def _chunk_text(self, text: str) -> List[str]:
+        """Разбивает один длинный текст на список чанков."""
+        return self.chunker.chunk(text)
+
+    def _shard_chunk(self, chunk: Chunk) -> Dict[str, Any]:
+        """Чанк для шарда манифеста: текст и ID токенов со специальными токенами."""
+        text, ids = chunk
+        return {"text": text, "input_ids": self.tokenizer.build_inputs_with_special_tokens(ids)}
+
+    def _record(self, category: str, video_id: str, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Запись датасета из чанка шарда (video_id нужен для разбиения train/val по видео)."""
+        return {
+            "category": category,
+            "video_id": video_id,
+            "text": chunk["text"],
+            "input_ids": chunk["input_ids"],
+            "length": len(chunk["input_ids"]),
+            "tokenizer": self.fingerprint,
+        }
+
+    def _dedup_overlaps(self, automatic: Optional[bool]) -> bool:
         """
-        Разбивает один длинный текст на список чанков по CHUNK_SIZE токенов,
-        декодирует их и нормализует двойные дефисы.
+        Убирать ли перекрытия cue: бегущий текст бывает только у автосубтитров,
+        в ручных повтор хвоста строки — это настоящий повтор в речи.
         """
-        all_ids: List[int] = self.tokenizer.encode(text, add_special_tokens=False)
-        chunks: List[str] = []
-        for i in range(0, len(all_ids), self.CHUNK_SIZE):
-            chunk_ids = all_ids[i : i + self.CHUNK_SIZE]
-            # декодируем обратно в текст
-            chunk_text = self.tokenizer.decode(chunk_ids, clean_up_tokenization_spaces=True)
-            # Нормализуем двойные дефисы: " - - " → "--"
-            chunk_text = re.sub(r"\s*-\s*-\s*", "--", chunk_text.strip())
-            chunks.append(chunk_text)
-        return chunks
+        return bool(self.scraping.dedup_overlap and automatic)
 
-    def build_dataset(self) -> None:
-        dataset: List[Dict[str, str]] = []
+    def _preprocessor(self, track: SubtitleTrack) -> SubtitlePreprocessor:
+        """Препроцессор для дорожки с настройками дедупликации из конфига."""
+        return SubtitlePreprocessor(
+            dedup_overlaps=self._dedup_overlaps(track.automatic),
+            min_overlap=self.scraping.min_overlap,
+            tokenizer=self.tokenizer,
+        )
 
-        for category, urls in self.cfg.categories.items():
-            for url in urls:
-                self.total_videos += 1
-                self.logger.info(f"🔍 Обрабатываю {url} (категория: {category})")
-                try:
-                    # 1) Скачать субтитры
-                    path_vtt = self.scraper.download_subtitles(url)
-                    if not path_vtt:
-                        self.logger.warning(f"⚠️ Нет сабов: {url}")
-                        self.skipped_videos.append({"url": url, "reason": "Нет сабов"})
-                        continue
-                    self.downloaded_subtitles += 1
-
-                    # 2) Очистка
-                    cleaned_txt = path_vtt.replace(".vtt", "_cleaned.txt")
-                    SubtitlePreprocessor(path_vtt, cleaned_txt).process()
-
-                    # 3) Чтение текста
-                    try:
-                        with open(cleaned_txt, "r", encoding="utf-8") as f:
-                            text: str = f.read()
-                    except Exception as e:
-                        self.logger.error(f"Ошибка чтения {cleaned_txt}: {e}")
-                        self.skipped_videos.append({"url": url, "reason": "Чтение файла"})
-                        continue
+    def _cleaning_version(self, automatic: Optional[bool]) -> str:
+        """Версия очистки дорожки с учётом дедупликации: при её смене шард пересобирается."""
+        version = str(SubtitlePreprocessor.VERSION)
+        if self._dedup_overlaps(automatic):
+            version += f"+overlap{self.scraping.min_overlap}"
+        return version
+
+    def _cleaned_lines(self, track: SubtitleTrack, preprocessor: SubtitlePreprocessor) -> Iterator[str]:
+        """
+        Очищенные строки субтитров для чанкинга.
+        Из памяти и при scraping.write_cleaned=False — потоково, без промежуточных файлов;
+        иначе через _cleaned.txt рядом с VTT.
+        """
+        if track.data is not None:
+            return preprocessor.iter_cleaned(io.StringIO(track.text))
+        preprocessor.input_path = track.path
+        if not self.scraping.write_cleaned:
+            return preprocessor.stream()
 
-                    if not text.strip():
-                        self.logger.warning(f"⚠️ Пустой текст: {url}")
-                        self.skipped_videos.append({"url": url, "reason": "Пустой текст"})
+        preprocessor.output_path = track.path.replace(".vtt", "_cleaned.txt")
+        preprocessor.process()
+        return self._read_lines(preprocessor.output_path)
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[str]:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from f
+
+    def _chunk_key(self) -> str:
+        """Ключ настроек чанкинга: при его смене шарды в манифесте пересобираются."""
+        return self.chunker.key
+
+    def _acquire(self, url: str) -> Tuple[Optional[SubtitleTrack], Optional[Exception]]:
+        """
+        Получает субтитры одного видео с повторами и адаптивным ограничением частоты.
+        Исключения не пробрасываются, а возвращаются вторым элементом кортежа,
+        чтобы ошибка одного потока не прерывала остальные.
+        Если видео уже есть в манифесте, сеть не используется.
+        """
+        video_id = YouTubeScraper.video_id(url)
+        if self.manifest is not None and not self.scraping.refresh:
+            entry = self.manifest.get(video_id) or {}
+            cached = self.manifest.cached_track(
+                video_id, self._cleaning_version(entry.get("automatic")), self._chunk_key()
+            )
+            if cached is not None:
+                return cached, None
+        try:
+            if self.scraping.in_memory:
+                # один запрос к экстрактору, VTT сразу в память
+                track = call_with_retries(
+                    self.scraper.fetch_subtitles,
+                    url,
+                    persist=self.scraping.keep_raw,
+                    max_retries=self.scraping.max_retries,
+                    backoff_base=self.scraping.backoff_base,
+                    backoff_max=self.scraping.backoff_max,
+                    limiter=self.rate_limiter,
+                )
+                return track, None
+
+            path_vtt = call_with_retries(
+                self.scraper.download_subtitles,
+                url,
+                max_retries=self.scraping.max_retries,
+                backoff_base=self.scraping.backoff_base,
+                backoff_max=self.scraping.backoff_max,
+                limiter=self.rate_limiter,
+            )
+            if not path_vtt:
+                return None, None
+            meta = self.scraper.tracks.get(video_id, {})
+            return SubtitleTrack(video_id=video_id, path=path_vtt, **meta), None
+        except Exception as e:
+            return None, e
+
+    def _acquire_all(
+        self, jobs: List[Tuple[str, str]]
+    ) -> Iterator[Tuple[str, str, Optional[SubtitleTrack], Optional[Exception]]]:
+        """
+        Загружает субтитры для списка (категория, url) пулом из scraping.workers потоков.
+        Результаты отдаются строго в порядке jobs по мере готовности,
+        поэтому обработка и статистика не зависят от числа потоков.
+        """
+        urls = [url for _, url in jobs]
+        with ThreadPoolExecutor(max_workers=self.scraping.workers) as pool:
+            for (category, url), (track, error) in zip(jobs, pool.map(self._acquire, urls)):
+                yield category, url, track, error
+
+    def _iter_records(self, jobs: List[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Обрабатывает видео по порядку jobs и отдаёт записи датасета по мере готовности,
+        чтобы DatasetSaver писал их на диск потоково, не собирая датасет в памяти.
+        """
+        for category, url, track, error in self._acquire_all(jobs):
+            self.total_videos += 1
+            self.logger.info(f"🔍 Обрабатываю {url} (категория: {category})")
+            try:
+                # 1) Скачать субтитры
+                if error is not None:
+                    raise error
+                if track is None:
+                    self.logger.warning(f"⚠️ Нет сабов: {url}")
+                    self.skipped_videos.append({"url": url, "reason": "Нет сабов"})
+                    continue
+                self.downloaded_subtitles += 1
+
+                video_id = track.video_id
+                if self.manifest is not None:
+                    if track.sha256 is None:
+                        track.sha256 = (
+                            hashlib.sha256(track.data).hexdigest()
+                            if track.data is not None
+                            else self.manifest.subtitle_hash(video_id, track.path)
+                        )
+                    if self.manifest.is_fresh(
+                        video_id, track.sha256, self._cleaning_version(track.automatic), self._chunk_key()
+                    ):
+                        # Субтитры и настройки не менялись — берём готовые чанки из шарда
+                        self.cached_videos += 1
+                        chunks = self.manifest.read_chunks(video_id)
+                        yield from (self._record(category, video_id, chunk) for chunk in chunks)
                         continue
 
-                    # 4) Разбивка на чанки и добавление в датасет
-                    for chunk in self._chunk_text(text):
-                        dataset.append({
-                            "category": category,
-                            "text": chunk
-                        })
+                # 2-4) Потоковая очистка и разбивка на чанки
+                preprocessor = self._preprocessor(track)
+                try:
+                    chunks = [
+                        self._shard_chunk(chunk)
+                        for chunk in self._chunk_lines(self._cleaned_lines(track, preprocessor))
+                    ]
+                except OSError as e:
+                    self.logger.error(f"Ошибка чтения субтитров {url}: {e}")
+                    self.skipped_videos.append({"url": url, "reason": "Чтение файла"})
+                    continue
 
-                except Exception as e:
-                    self.logger.exception(f"Ошибка обработки {url}: {e}")
-                    self.skipped_videos.append({"url": url, "reason": "Общая ошибка"})
+                if not chunks:
+                    self.logger.warning(f"⚠️ Пустой текст: {url}")
+                    self.skipped_videos.append({"url": url, "reason": "Пустой текст"})
                     continue
 
-        # 5) Сохранение
-        if dataset:
-            try:
-                self.saver.save(dataset)
-                self.logger.info(f"✅ Датасет сохранён в {self.output_dir}")
+                if preprocessor.tokens_saved:
+                    self.logger.info(f"✂️ Перекрытия субтитров {video_id}: -{preprocessor.tokens_saved} токенов")
+                    self.tokens_saved += preprocessor.tokens_saved
+
+                # 5) Запись шарда и обновление манифеста
+                if self.manifest is not None:
+                    self.manifest.write_chunks(video_id, chunks)
+                    self.manifest.update(
+                        video_id,
+                        url=url,
+                        subtitle_path=track.path,
+                        subtitle_sha256=track.sha256,
+                        lang=track.lang,
+                        automatic=track.automatic,
+                        cleaning_version=self._cleaning_version(track.automatic),
+                        chunk_key=self._chunk_key(),
+                        num_chunks=len(chunks),
+                        tokens_saved=preprocessor.tokens_saved,
+                    )
+
+                yield from (self._record(category, video_id, chunk) for chunk in chunks)
+
             except Exception as e:
-                self.logger.error(f"Ошибка сохранения: {e}")
+                self.logger.exception(f"Ошибка обработки {url}: {e}")
+                self.skipped_videos.append({"url": url, "reason": "Общая ошибка"})
+                continue
+
+    def build_dataset(self) -> None:
+        jobs: List[Tuple[str, str]] = [
+            (category, url)
+            for category, urls in self.cfg.categories.items()
+            for url in urls
+        ]
+        self.logger.info(f"🚀 Загрузка субтитров: {len(jobs)} видео, потоков: {self.scraping.workers}")
+
+        # 6) Сохранение: записи пишутся по мере обработки видео и фиксируются атомарно в конце
+        written = self.saver.save(self._iter_records(jobs))
+        if written:
+            self.logger.info(f"✅ Датасет сохранён в {self.output_dir}: {written} записей")
         else:
             self.logger.warning("⚠️ Датасет пуст")
 
+        if self.manifest is not None:
+            self.manifest.save()
+
         # финальная статистика
         self.logger.info(f"📊 Загружено {self.downloaded_subtitles}/{self.total_videos} видео")
+        if self.manifest is not None:
+            self.logger.info(f"♻️ Из манифеста без изменений: {self.cached_videos} видео")
+        if self.tokens_saved:
+            self.logger.info(f"✂️ Дедупликация перекрытий убрала {self.tokens_saved} токенов")
         if self.skipped_videos:
             self.logger.warning("⚠️ Пропущенные видео:")
             for it in self.skipped_videos:
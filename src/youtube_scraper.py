@@ -1,19 +1,101 @@
 import os
 import yt_dlp
-from typing import Optional
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class SubtitleTrack:
+    """
+    Дорожка субтитров одного видео.
+
+    data — содержимое VTT в памяти (режим fetch_subtitles),
+    path — файл на диске (режим download_subtitles или persist=True),
+    sha256 — хэш содержимого, если он уже известен (например, из манифеста).
+    """
+    video_id: str
+    lang: Optional[str] = None
+    automatic: Optional[bool] = None
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    sha256: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Текст VTT из памяти или с диска."""
+        if self.data is not None:
+            return self.data.decode("utf-8")
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
 
 class YouTubeScraper:
     """
     Класс для скачивания субтитров с YouTube.
     """
 
-    def __init__(self, save_path: str = "data/raw"):
+    def __init__(
+        self,
+        save_path: str = "data/raw",
+        ydl_factory: Callable[[Dict[str, Any]], Any] = yt_dlp.YoutubeDL,
+    ):
         """
         :param save_path: Папка для сохранения субтитров.
+        :param ydl_factory: Фабрика экстрактора (по умолчанию yt_dlp.YoutubeDL);
+                            в тестах подменяется локальной заглушкой.
         """
         self.save_path = save_path
+        self.ydl_factory = ydl_factory
+        # Метаданные скачанных дорожек: video_id -> {"lang": ..., "automatic": ...}
+        self.tracks: Dict[str, Dict[str, Any]] = {}
         os.makedirs(self.save_path, exist_ok=True)
 
+    @staticmethod
+    def video_id(video_url: str) -> str:
+        """Извлекает ID видео из ссылки вида ...watch?v=<id>."""
+        return video_url.split("v=")[-1]
+
+    def fetch_subtitles(
+        self, video_url: str, lang: str = "ru", persist: bool = False
+    ) -> Optional[SubtitleTrack]:
+        """
+        Загружает субтитры в память за один запрос к экстрактору.
+
+        URL дорожки берётся из уже извлечённого info-словаря, VTT скачивается
+        напрямую через сессию yt-dlp, без ydl.download и без сканирования save_path.
+
+        :param video_url: Ссылка на видео.
+        :param lang: Язык субтитров (по умолчанию "ru").
+        :param persist: Сохранить ли VTT в save_path/<id>.vtt.
+        :return: SubtitleTrack с содержимым или None, если субтитры не найдены.
+        """
+        video_id = self.video_id(video_url)
+        ydl_opts = {'skip_download': True, 'quiet': True}
+
+        with self.ydl_factory(ydl_opts) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+            manual = info.get("subtitles") or {}
+            automatic = info.get("automatic_captions") or {}
+            formats = manual.get(lang) or automatic.get(lang) or []
+            vtt = next((fmt for fmt in formats if fmt.get("ext") == "vtt" and fmt.get("url")), None)
+            if vtt is None:
+                print(f"❌ Субтитры на языке '{lang}' не найдены.")
+                return None
+
+            with ydl.urlopen(vtt["url"]) as response:
+                data: bytes = response.read()
+
+        track = SubtitleTrack(video_id=video_id, lang=lang, automatic=lang not in manual, data=data)
+        self.tracks[video_id] = {"lang": track.lang, "automatic": track.automatic}
+
+        if persist:
+            track.path = os.path.join(self.save_path, f"{video_id}.vtt")
+            tmp_path = f"{track.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, track.path)
+        return track
+
     def download_subtitles(self, video_url: str, lang: str = "ru") -> Optional[str]:
         """
         Скачивает субтитры и приводит имя файла к стандартному формату.
@@ -22,7 +104,7 @@ class YouTubeScraper:
         :param lang: Язык субтитров (по умолчанию "ru").
         :return: Путь к обработанному файлу с субтитрами или None, если субтитры не найдены.
         """
-        video_id = video_url.split("v=")[-1]  # Извлекаем ID видео
+        video_id = self.video_id(video_url)  # Извлекаем ID видео
         expected_file = os.path.join(self.save_path, f"{video_id}.vtt")
 
         ydl_opts = {
@@ -34,12 +116,16 @@ class YouTubeScraper:
             'writeautomaticsub': True
         }
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with self.ydl_factory(ydl_opts) as ydl:
             info = ydl.extract_info(video_url, download=False)
             subtitles = info.get("subtitles") or info.get("automatic_captions")
 
             if subtitles and lang in subtitles:
                 ydl.download([video_url])
+                self.tracks[video_id] = {
+                    "lang": lang,
+                    "automatic": lang not in (info.get("subtitles") or {}),
+                }
 
                 # Ищем скачанный файл (так как yt-dlp добавляет .ru.vtt)
                 for file in os.listdir(self.save_path):
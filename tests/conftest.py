@@ -0,0 +1,40 @@
+import pytest
+from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+from transformers import BertTokenizerFast
+
+from src.utils.model_registry import get_registry
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+@pytest.fixture(autouse=True)
+def clean_model_registry():
+    """Реестр моделей общий на процесс: тесты не должны видеть токенизаторы друг друга."""
+    get_registry().clear()
+    yield
+    get_registry().clear()
+
+
+@pytest.fixture
+def fast_tokenizer():
+    """
+    Локальный BERT-подобный fast-токенизатор без обращения к Hugging Face Hub:
+    словарь из слов, нормализация и разбиение как у BERT (по пробелам и пунктуации),
+    неизвестные слова — [UNK]. Поддерживает offset mapping и [CLS]/[SEP].
+    """
+    def build(words=(), name="local-test-tokenizer"):
+        vocab = {tok: i for i, tok in enumerate(SPECIAL_TOKENS)}
+        for word in words:
+            vocab.setdefault(word.lower(), len(vocab))
+
+        backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token="[UNK]"))
+        backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+        backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+        backend.post_processor = processors.TemplateProcessing(
+            single="[CLS] $A [SEP]",
+            pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+            special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+        )
+        return BertTokenizerFast(tokenizer_object=backend, name_or_path=name)
+
+    return build
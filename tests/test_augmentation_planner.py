@@ -0,0 +1,177 @@
+import json
+import os
+import random
+
+import pytest
+
+import src.data_augmentation.augmenter_pipeline as pipeline_module
+from src.data_augmentation.augmentation_planner import AugmentationPlanner
+from src.processing.near_duplicates import NearDuplicateFilter
+
+
+class StubAugmenter:
+    """Back-translation без моделей: вариант k — новый псевдослучайный текст с меткой v<k>; считает переводы."""
+
+    fail_after = None  # прервать прогон после стольких вызовов augment_many
+    failure = KeyboardInterrupt  # чем прерывать: Ctrl-C или сбой пачки (OOM, упавший воркер)
+
+    def __init__(self, rounds=2, beam_size=5, max_segment_tokens=128, **kwargs):
+        self.rounds = rounds
+        self.beam_size = beam_size
+        self.max_length = 512
+        self.max_segment_tokens = max_segment_tokens
+        self.cache = None
+        self.translated = 0
+        self.calls = 0
+
+    def augment_many(self, texts, rounds=None):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise self.failure
+        rounds = rounds or [self.rounds] * len(texts)
+        self.translated += 2 * sum(rounds)
+        return [[variant(text, k) for k in range(1, r + 1)] for text, r in zip(texts, rounds)]
+
+
+def variant(text, k):
+    rnd = random.Random(f"{text}/{k}")
+    return " ".join("".join(rnd.choices("абвгдежзиклмнопрст", k=6)) for _ in range(12)) + f" v{k}"
+
+
+def skewed(big=50, small=8):
+    rnd = random.Random(0)
+    words = ["".join(rnd.choices("абвгдежзиклмнопрст", k=6)) for _ in range(500)]
+    return [
+        {"category": cat, "text": " ".join(rnd.choices(words, k=12))}
+        for cat, n in (("big", big), ("small", small)) for _ in range(n)
+    ]
+
+
+@pytest.mark.unit
+def test_planner_targets_only_deficit_categories():
+    """План покрывает дефицит с запасом, распределяя варианты по разным записям."""
+    records = skewed()
+    plan = AugmentationPlanner(min_examples=20, max_rounds=2, oversample=1.2).plan(records)
+
+    assert plan.counts == {"big": 50, "small": 8}
+    assert plan.deficits == {"small": 12}
+    assert all(records[i]["category"] == "small" for i in plan.rounds)
+    assert set(plan.rounds.values()) == {2}  # 8 записей по одному варианту не хватит
+    assert 12 <= plan.planned_variants <= 12 * 1.2 + 2
+    assert plan.full_variants == 116
+
+    short = AugmentationPlanner(min_examples=40, max_rounds=2).plan(records)
+    assert short.planned_variants == 16  # больше, чем все записи по max_rounds, не бывает
+
+
+@pytest.mark.unit
+def test_planned_pipeline_reaches_target_with_less_compute(tmp_path, monkeypatch):
+    """
+    Аугментация по плану добирает каждой категории min_examples (с фильтром дубликатов)
+    и тратит на перевод меньше, чем аугментация всех записей.
+    """
+    monkeypatch.setattr(pipeline_module, "BackTranslationAugmenter", StubAugmenter)
+    records = skewed()
+
+    def run(plan):
+        pipeline = pipeline_module.DataAugmentationPipeline(
+            "in.json", str(tmp_path / "out.json"), min_examples=20, bt_rounds=2, bt_batch_samples=4, plan=plan,
+            dedup=NearDuplicateFilter(threshold=0.95, shingle_size=3),
+        )
+        if plan:
+            out = list(pipeline.iter_planned(records, AugmentationPlanner(20, 2).plan(records)))
+        else:
+            out = list(pipeline.iter_augmented(records))
+        return out, pipeline.bt_augmenter.translated
+
+    planned, planned_cost = run(True)
+    full, full_cost = run(False)
+
+    counts = {cat: sum(r["category"] == cat for r in planned) for cat in ("big", "small")}
+    assert counts == {"big": 50, "small": 20}  # ровно до цели: лишние варианты не пишутся
+    assert [r for r in planned if "v" not in r["text"].split()[-1]] == records  # оригиналы все и по порядку
+    assert planned_cost <= 0.25 * full_cost
+    assert len(full) > len(planned)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("failure", [KeyboardInterrupt, RuntimeError])
+@pytest.mark.parametrize("plan", [True, False])
+def test_interrupted_run_resumes_from_cursor(tmp_path, monkeypatch, plan, failure):
+    """
+    Прерванный прогон (Ctrl-C или сбой перевода пачки) оставляет промежуточный вывод и курсор;
+    повторный запуск продолжает с курсора, не переводя заново уже сделанное,
+    и даёт тот же результат — непереведённая пачка не пропускается.
+    """
+    monkeypatch.setattr(StubAugmenter, "failure", failure)
+    monkeypatch.setattr(pipeline_module, "BackTranslationAugmenter", StubAugmenter)
+    records = skewed(small=12)
+    input_path = tmp_path / "in.jsonl"
+    input_path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+
+    def run(output, fail_after=None):
+        monkeypatch.setattr(StubAugmenter, "fail_after", fail_after)
+        pipeline = pipeline_module.DataAugmentationPipeline(
+            str(input_path), str(tmp_path / output), min_examples=30, bt_rounds=2, bt_batch_samples=4, plan=plan,
+            dedup=NearDuplicateFilter(threshold=0.95, shingle_size=3),
+        )
+        try:
+            pipeline.run()
+        except KeyboardInterrupt:
+            pass
+        return pipeline.bt_augmenter
+
+    reference = run("reference.json")
+    with open(tmp_path / "reference.json", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    interrupted = run("out.json", fail_after=1)
+    assert not os.path.exists(tmp_path / "out.json")
+    assert os.path.exists(tmp_path / "out.progress.json") and os.path.exists(tmp_path / "out.partial.jsonl")
+
+    resumed = run("out.json")
+    with open(tmp_path / "out.json", encoding="utf-8") as f:
+        assert json.load(f) == expected
+    assert not os.path.exists(tmp_path / "out.progress.json") and not os.path.exists(tmp_path / "out.partial.jsonl")
+    # продолжение переводит только то, что не успел прерванный прогон
+    assert resumed.translated < reference.translated
+    assert interrupted.translated + resumed.translated == reference.translated
+
+
+@pytest.mark.unit
+def test_plan_counts_categories_after_dedup(tmp_path, monkeypatch):
+    """
+    Почти-дубликаты оригиналов не учитываются в плане: короткая категория,
+    часть записей которой отбросил фильтр, всё равно добирает min_examples.
+    """
+    monkeypatch.setattr(pipeline_module, "BackTranslationAugmenter", StubAugmenter)
+    records = skewed(small=12)
+    # копии записей короткой категории — фильтр оставит только первые экземпляры
+    records += [dict(r) for r in records if r["category"] == "small"][:5]
+    input_path = tmp_path / "in.jsonl"
+    input_path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+
+    pipeline = pipeline_module.DataAugmentationPipeline(
+        str(input_path), str(tmp_path / "out.json"), min_examples=20, bt_rounds=2, bt_batch_samples=4,
+        dedup=NearDuplicateFilter(threshold=0.95, shingle_size=3), resume=False,
+    )
+    plan = AugmentationPlanner(20, 2).plan(pipeline.iter_plan_records())
+    assert plan.counts == {"big": 50, "small": 12} and plan.deficits == {"small": 8}
+    assert plan.skipped == set(range(62, 67)) and not plan.skipped & set(plan.rounds)
+
+    pipeline.run()
+    with open(tmp_path / "out.json", encoding="utf-8") as f:
+        out = json.load(f)
+    assert sum(r["category"] == "small" for r in out) == 20
+    assert len(out) == 70
+
+    # план без фильтра учёл копии; отброшенные при аугментации копии увеличивают цель категории
+    raw = AugmentationPlanner(20, 2).plan(records)
+    assert raw.deficits == {"small": 3}
+    rerun = pipeline_module.DataAugmentationPipeline(
+        "in.json", "out.json", min_examples=20, bt_rounds=2, bt_batch_samples=4,
+        dedup=NearDuplicateFilter(threshold=0.95, shingle_size=3),
+    )
+    states = []
+    list(rerun.iter_planned(records, raw, checkpoint=lambda consumed, state: states.append(state)))
+    assert states[-1]["deficits"] == {"small": 3 + 5}
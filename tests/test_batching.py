@@ -0,0 +1,58 @@
+import pytest
+import torch
+
+from src.batching import LengthBucketSampler, PaddingCollator
+
+
+def make_batch(lengths):
+    return [{"input_ids": torch.arange(1, n + 1), "labels": i % 2} for i, n in enumerate(lengths)]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("side", ["right", "left"])
+def test_collator_pads_to_batch_max(side):
+    """Батч дополняется до самого длинного примера с нужной стороны, маска совпадает с ID."""
+    collator = PaddingCollator(pad_token_id=0, padding_side=side, return_token_type_ids=True, max_length=16)
+    batch = collator(make_batch([3, 1, 5]))
+
+    assert batch["input_ids"].shape == (3, 5)
+    row = [1, 2, 3, 0, 0] if side == "right" else [0, 0, 1, 2, 3]
+    assert batch["input_ids"][0].tolist() == row
+    assert batch["attention_mask"].sum(dim=1).tolist() == [3, 1, 5]
+    assert (batch["input_ids"] != 0).long().tolist() == batch["attention_mask"].tolist()
+    assert batch["token_type_ids"].abs().sum() == 0
+    assert batch["labels"].tolist() == [0, 1, 0]
+
+    stats = collator.stats()
+    assert stats["padding_waste"] == pytest.approx(1 - 9 / 15, abs=1e-4)
+    assert stats["fixed_padding_waste"] == pytest.approx(1 - 9 / 48, abs=1e-4)
+
+    rounded = PaddingCollator(pad_to_multiple_of=8)(make_batch([3, 5]))
+    assert rounded["input_ids"].shape == (2, 8)
+
+
+@pytest.mark.unit
+def test_bucket_sampler_groups_similar_lengths():
+    """
+    Сэмплер выдаёт каждый индекс ровно один раз, батчи состоят из близких длин,
+    а порядок детерминирован по seed и меняется между эпохами.
+    """
+    lengths = [(i * 37) % 500 + 1 for i in range(1000)]
+    sampler = LengthBucketSampler(lengths, batch_size=16, bucket_size_multiplier=8, seed=1)
+
+    order = list(sampler)
+    assert sorted(order) == list(range(1000))
+
+    batches = [order[i:i + 16] for i in range(0, len(order), 16)]
+    collator = PaddingCollator()
+    for batch in batches:
+        collator(make_batch([lengths[i] for i in batch]))
+    random_collator = PaddingCollator()
+    for i in range(0, 1000, 16):
+        random_collator(make_batch(lengths[i:i + 16]))
+    assert collator.padding_waste < random_collator.padding_waste / 3
+
+    sampler.set_epoch(0)
+    assert list(sampler) == order
+    sampler.set_epoch(1)
+    assert list(sampler) != order
@@ -0,0 +1,199 @@
+import pytest
+import torch
+from transformers import BatchEncoding
+
+import src.data_augmentation.bt_augmenter as bt
+from src.data_augmentation.augmenter_pipeline import DataAugmentationPipeline
+from src.data_augmentation.parallel_augmenter import batch_bounds
+from src.data_augmentation.translation_cache import TranslationCache
+
+
+class FakeTokenizer:
+    """Пословный токенизатор с общим словарём; ID 0 — padding."""
+
+    vocab = {"<pad>": 0}
+
+    def _encode(self, text, max_length):
+        ids = [self.vocab.setdefault(word, len(self.vocab)) for word in text.split()]
+        return ids[:max_length]
+
+    def __call__(self, texts, return_tensors=None, padding=False, truncation=False, max_length=512):
+        ids = [self._encode(t, max_length) for t in texts]
+        if return_tensors != "pt":
+            return {"input_ids": ids}
+        width = max(len(i) for i in ids)
+        input_ids = torch.tensor([i + [0] * (width - len(i)) for i in ids])
+        return BatchEncoding({"input_ids": input_ids, "attention_mask": (input_ids != 0).long()})
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        words = {i: w for w, i in self.vocab.items()}
+        return [" ".join(words[int(i)] for i in seq if int(i)) for seq in sequences]
+
+
+class FakeModel:
+    """«Перевод» — дописать к тексту слово-метку языка; текст со словом boom не переводится."""
+
+    def __init__(self, suffix):
+        self.suffix = suffix
+        self.shapes = []
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+    def generate(self, input_ids, attention_mask, **kwargs):
+        self.shapes.append(tuple(input_ids.shape))
+        if (input_ids == FakeTokenizer.vocab.get("boom", -1)).any():
+            raise RuntimeError("generation failed")
+        suffix = FakeTokenizer.vocab.setdefault(self.suffix, len(FakeTokenizer.vocab))
+        rows = []
+        for ids in input_ids.tolist():
+            ids = [i for i in ids if i] + [suffix]
+            rows.append(ids + [0] * (input_ids.shape[1] + 1 - len(ids)))
+        return torch.tensor(rows)
+
+
+@pytest.fixture
+def augmenter(monkeypatch):
+    models = {}
+    monkeypatch.setattr(bt.MarianTokenizer, "from_pretrained", lambda name: FakeTokenizer())
+    monkeypatch.setattr(
+        bt.MarianMTModel, "from_pretrained", lambda name: models.setdefault(name, FakeModel(name.rsplit("-", 1)[-1]))
+    )
+
+    def build(**kwargs):
+        aug = bt.BackTranslationAugmenter(device="cpu", **kwargs)
+        return aug, models
+    return build
+
+
+@pytest.mark.unit
+def test_augment_many_batches_by_length_and_chains_rounds(augmenter):
+    """
+    Тексты переводятся батчами под бюджет токенов, результаты возвращаются
+    в исходном порядке, раунды идут цепочкой.
+    """
+    aug, models = augmenter(rounds=2, max_batch_tokens=12)
+    texts = ["w " * n + f"t{n}" for n in (1, 9, 2, 5, 3, 8, 0)]
+
+    result = aug.augment_many(texts)
+
+    for text, variants in zip(texts, result):
+        assert variants == [f"{text} en ru", f"{text} en ru en ru"]
+    src2mid = models["Helsinki-NLP/opus-mt-ru-en"]
+    # 7 текстов за раунд — несколько батчей вместо семи вызовов generate
+    assert 1 < len(src2mid.shapes) < 2 * len(texts)
+    assert all(rows == 1 or rows * width <= 12 for rows, width in src2mid.shapes)
+    assert aug.augment("один текст") == ["один текст en ru", "один текст en ru en ru"]
+
+
+@pytest.mark.unit
+def test_augment_many_isolates_failures(augmenter):
+    """Ошибка в батче не теряет остальные тексты: батч переводится по одному."""
+    aug, _ = augmenter(rounds=1, max_batch_tokens=100)
+
+    result = aug.augment_many(["первый текст", "boom текст", "", "третий"])
+
+    assert result == [["первый текст en ru"], [], [], ["третий en ru"]]
+
+
+@pytest.mark.unit
+def test_pipeline_keeps_record_order(augmenter, monkeypatch):
+    """Пайплайн переводит записи пачками, но отдаёт запись сразу перед её вариантами."""
+    augmenter()  # модели в реестре
+    pipeline = DataAugmentationPipeline("in.json", "out.json", bt_rounds=1, bt_batch_samples=2)
+    samples = [{"category": c, "text": t} for c, t in (("a", "раз"), ("b", "два"), ("a", "три"))]
+
+    out = list(pipeline.iter_augmented(samples))
+
+    assert [(s["category"], s["text"]) for s in out] == [
+        ("a", "раз"), ("a", "раз en ru"), ("b", "два"), ("b", "два en ru"), ("a", "три"), ("a", "три en ru"),
+    ]
+
+
+@pytest.mark.unit
+def test_translation_cache_skips_known_texts(augmenter, tmp_path):
+    """
+    Одинаковые тексты переводятся один раз; повторный прогон с тем же кэшем
+    не переводит ничего, а с другим beam size — переводит заново.
+    """
+    path = str(tmp_path / "translations.sqlite")
+    texts = ["один текст", "другой текст", "один текст"]
+    aug, _ = augmenter(rounds=2, cache=TranslationCache(path))
+
+    first = aug.augment_many(texts)
+
+    assert first[0] == first[2] == ["один текст en ru", "один текст en ru en ru"]
+    assert aug.translated == 2 * 2 * 2  # 2 уникальных текста × 2 направления × 2 раунда
+    assert len(TranslationCache(path)) == 8
+
+    again, _ = augmenter(rounds=2, cache=TranslationCache(path))
+    assert again.augment_many(texts) == first
+    assert again.translated == 0 and again.cache.hits == 2 * 2 * 2
+
+    other_beam, _ = augmenter(rounds=1, beam_size=3, cache=TranslationCache(path))
+    other_beam.augment_many(texts)
+    assert other_beam.translated == 2 * 2
+
+
+@pytest.mark.unit
+def test_batch_bounds_cover_list_in_order():
+    """Пачки идут подряд, покрывают весь список, неполной может быть только последняя."""
+    assert batch_bounds(11, 4) == [(0, 4), (4, 8), (8, 11)]
+    assert batch_bounds(2, 4) == [(0, 2)]
+    assert batch_bounds(0, 2) == []
+
+
+@pytest.mark.integration
+def test_parallel_pipeline_output_matches_single_process(augmenter, tmp_path):
+    """Пул процессов отдаёт те же записи в том же порядке, что и один процесс; счётчики сводятся."""
+    augmenter()  # модели в реестре до форка
+    samples = [{"category": "a" if i % 3 else "b", "text": f"текст номер {i}"} for i in range(11)]
+    cache_path = str(tmp_path / "translations.sqlite")
+
+    outputs, translated = [], []
+    for workers in (1, 3):
+        pipeline = DataAugmentationPipeline(
+            "in.json", "out.json", bt_rounds=2, bt_batch_samples=4,
+            cache_path=cache_path if workers > 1 else None, workers=workers, threads_per_worker=1,
+        )
+        try:
+            outputs.append(list(pipeline.iter_augmented(samples)))
+        finally:
+            if pipeline.parallel is not None:
+                pipeline.parallel.close()
+        translated.append(pipeline.bt_augmenter.translated)
+        # в пуле за раз переводится по целой пачке bt_batch_samples на воркер
+        assert pipeline.call_samples == 4 * workers
+
+    assert outputs[0] == outputs[1]
+    assert outputs[1][:3] == [samples[0], {"category": "b", "text": "текст номер 0 en ru"},
+                              {"category": "b", "text": "текст номер 0 en ru en ru"}]
+    assert translated[1] == translated[0] == 11 * 2 * 2
+    assert pipeline.bt_augmenter.cache.misses == 11 * 2 * 2 and len(pipeline.bt_augmenter.cache) == 11 * 2 * 2
+
+
+@pytest.mark.unit
+def test_long_text_is_translated_by_sentence_segments(augmenter):
+    """
+    Текст длиннее бюджета переводится группами предложений (предложение без пунктуации —
+    частями по словам), хвост не обрезается, а длина входа модели не превышает бюджета.
+    """
+    sentences = [" ".join(f"с{i}w{j}" for j in range(3)) + "." for i in range(5)]
+    text = " ".join(sentences) + " " + " ".join(f"хвост{j}" for j in range(9))
+    aug, models = augmenter(rounds=1, max_length=12, max_segment_tokens=7)
+
+    segments = aug.segment([text, "короткий текст."], aug._tokenizer_src2mid)
+    assert segments[1] == ["короткий текст."]
+    assert segments[0][:2] == [" ".join(sentences[:2]), " ".join(sentences[2:4])]
+    assert " ".join(segments[0]) == text
+
+    [variants] = aug.augment_many([text])
+    words = variants[0].split()
+    assert [w for w in words if w not in ("en", "ru")] == text.split()
+    assert all(width <= 7 for _, width in models["Helsinki-NLP/opus-mt-ru-en"].shapes)
+
+    whole, _ = augmenter(rounds=1, max_length=12, max_segment_tokens=0)
+    assert len(whole.augment_many([text])[0][0].split()) < len(words)  # без деления хвост обрезан
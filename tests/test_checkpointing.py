@@ -0,0 +1,133 @@
+import os
+
+import pytest
+import torch
+from peft import LoraConfig, TaskType, get_peft_model
+from transformers import BertConfig, BertForSequenceClassification, Trainer, TrainerCallback, TrainingArguments
+
+from src.batching import PaddingCollator
+from src.checkpointing import (
+    AsyncCheckpointer,
+    PreemptionCallback,
+    RunConfigCallback,
+    latest_checkpoint,
+    remove_partial_checkpoints,
+    resumable_checkpoint,
+)
+
+
+class RandomDataset(torch.utils.data.Dataset):
+    def __init__(self, size=16):
+        generator = torch.Generator().manual_seed(0)
+        self.items = [
+            {"input_ids": torch.randint(5, 50, (int(n),), generator=generator), "labels": torch.tensor(i % 2)}
+            for i, n in enumerate(torch.randint(4, 12, (size,), generator=generator))
+        ]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, idx):
+        return self.items[idx]
+
+
+class StopAt(TrainerCallback):
+    """Останавливает обучение после заданного шага, как вытеснение задачи."""
+
+    def __init__(self, step):
+        self.step = step
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if state.global_step == self.step:
+            control.should_training_stop = True
+
+
+def lora_trainer(output_dir, max_steps, callbacks=None):
+    torch.manual_seed(0)
+    model = BertForSequenceClassification(BertConfig(
+        vocab_size=50, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32
+    ))
+    model = get_peft_model(model, LoraConfig(
+        task_type=TaskType.SEQ_CLS, r=2, lora_alpha=4, target_modules=["query", "value"]
+    ))
+    args = TrainingArguments(
+        output_dir=str(output_dir),
+        per_device_train_batch_size=4,
+        max_steps=max_steps,
+        save_strategy="steps",
+        save_steps=2,
+        save_total_limit=2,
+        report_to=[],
+        use_cpu=True,
+        disable_tqdm=True,
+    )
+    trainer = Trainer(
+        model=model, args=args, train_dataset=RandomDataset(), data_collator=PaddingCollator(), callbacks=callbacks,
+    )
+    return trainer, AsyncCheckpointer.attach(trainer)
+
+
+@pytest.mark.integration
+def test_async_adapter_checkpoints_and_resume(tmp_path):
+    """
+    Фоновые чекпоинты с LoRA: только веса адаптеров, атомарные каталоги, ротация;
+    обучение продолжается с последнего чекпоинта с того же шага.
+    """
+    trainer, checkpointer = lora_trainer(tmp_path, max_steps=6)
+    trainer.train()
+    checkpointer.wait()
+
+    names = sorted(os.listdir(tmp_path))
+    assert names == ["checkpoint-4", "checkpoint-6"]  # save_total_limit, временных каталогов нет
+    ckpt = latest_checkpoint(str(tmp_path))
+    assert ckpt == str(tmp_path / "checkpoint-6")
+    files = set(os.listdir(ckpt))
+    assert {"adapter_model.safetensors", "adapter_config.json", "optimizer.pt", "scheduler.pt",
+            "trainer_state.json", "rng_state.pth"} <= files
+    assert not files & {"model.safetensors", "pytorch_model.bin"}
+
+    # прерванный прогон: шаги 1–4, затем продолжение с checkpoint-4 до шага 6
+    (tmp_path / "resumed").mkdir()
+    first, checkpointer = lora_trainer(tmp_path / "resumed", max_steps=6, callbacks=[StopAt(4)])
+    first.train()
+    checkpointer.wait()
+    os.makedirs(tmp_path / "resumed" / ".tmp-checkpoint-6")
+    remove_partial_checkpoints(str(tmp_path / "resumed"))
+    assert sorted(os.listdir(tmp_path / "resumed")) == ["checkpoint-2", "checkpoint-4"]
+
+    second, checkpointer = lora_trainer(tmp_path / "resumed", max_steps=6)
+    second.train(resume_from_checkpoint=latest_checkpoint(str(tmp_path / "resumed")))
+    checkpointer.wait()
+    assert second.state.global_step == 6
+    # те же веса, что и без прерывания
+    for name, param in trainer.model.named_parameters():
+        if param.requires_grad:
+            assert torch.allclose(param, second.model.get_parameter(name), atol=1e-5), name
+
+
+@pytest.mark.unit
+def test_latest_checkpoint_skips_incomplete(tmp_path):
+    """Неполный чекпоинт (нет состояния оптимизатора) пропускается."""
+    for step, files in ((2, ["trainer_state.json", "optimizer.pt", "adapter_model.safetensors"]),
+                        (10, ["trainer_state.json", "adapter_model.safetensors"])):
+        path = tmp_path / f"checkpoint-{step}"
+        path.mkdir()
+        for name in files:
+            (path / name).write_text("x")
+    assert latest_checkpoint(str(tmp_path)) == str(tmp_path / "checkpoint-2")
+    assert latest_checkpoint(str(tmp_path / "missing")) is None
+
+
+@pytest.mark.integration
+def test_preemption_saves_and_stops(tmp_path):
+    """Флаг вытеснения: Trainer сохраняет чекпоинт в конце шага и останавливается."""
+    preemption = PreemptionCallback()
+    trainer, checkpointer = lora_trainer(tmp_path, max_steps=6, callbacks=[preemption, RunConfigCallback("abc")])
+    preemption.preempted = True  # как после SIGTERM
+    trainer.train()
+    checkpointer.wait()
+    assert trainer.state.global_step == 1
+    assert latest_checkpoint(str(tmp_path)) == str(tmp_path / "checkpoint-1")
+    # хэш настроек попадает в trainer_state.json чекпоинта
+    assert resumable_checkpoint(str(tmp_path), "abc") == str(tmp_path / "checkpoint-1")
+    assert resumable_checkpoint(str(tmp_path), "other") is None
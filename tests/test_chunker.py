@@ -0,0 +1,64 @@
+import pytest
+
+from src.processing.chunker import TextChunker
+
+WORDS = "мама мыла раму . папа читал книгу ! дети спали ? кот ушёл гулять".split()
+
+
+@pytest.fixture
+def tokenizer(fast_tokenizer):
+    return fast_tokenizer(WORDS)
+
+
+@pytest.mark.unit
+def test_chunks_are_slices_of_original_text(tokenizer):
+    """Чанки — точные срезы исходной строки, без decode и нормализации."""
+    text = "Мама  мыла раму. Папа -- читал книгу!\nДети спали?"
+    chunker = TextChunker(tokenizer, chunk_size=4)
+    chunks = chunker.chunk(text)
+
+    assert chunks[0] == "Мама  мыла раму."
+    assert all(chunk in text for chunk in chunks)
+    assert "--" in "".join(chunks)
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    assert len(chunks) == -(-len(ids) // 4)
+
+
+@pytest.mark.unit
+def test_stride_and_sentence_snapping(tokenizer):
+    """stride даёт перекрытие чанков, snap_to_sentence обрезает чанк по концу предложения."""
+    text = "мама мыла раму . папа читал книгу ! дети спали ? кот ушёл гулять"
+
+    overlapping = TextChunker(tokenizer, chunk_size=6, stride=2).chunk(text)
+    assert overlapping[0] == "мама мыла раму . папа читал"
+    assert overlapping[1].startswith("папа читал")
+
+    snapped = TextChunker(tokenizer, chunk_size=6, snap_to_sentence=True).chunk(text)
+    assert snapped[0] == "мама мыла раму ."
+    assert snapped[1] == "папа читал книгу !"
+
+
+@pytest.mark.unit
+def test_chunk_many_and_stream_match_chunk(tokenizer):
+    """Пакетная и потоковая разбивка дают те же чанки, что и разбивка целого текста."""
+    lines = [" ".join(WORDS[i % len(WORDS):] + WORDS[:i % len(WORDS)]) for i in range(40)]
+    text = "\n".join(lines)
+    chunker = TextChunker(tokenizer, chunk_size=7, stride=3, stream_block_chars=50)
+
+    expected = chunker.chunk(text)
+    assert chunker.chunk_many([text, "кот ушёл"]) == [expected, ["кот ушёл"]]
+    assert list(chunker.chunk_stream(lines)) == expected
+
+    # ID токенов потоковой разбивки совпадают с токенизацией самих чанков
+    for chunk_text, ids in chunker.encode_stream(lines):
+        assert ids == tokenizer(chunk_text, add_special_tokens=False)["input_ids"]
+
+
+@pytest.mark.unit
+def test_requires_fast_tokenizer():
+    """Без offset mapping (slow-токенизатор) чанкер не создаётся."""
+    class SlowTokenizer:
+        is_fast = False
+
+    with pytest.raises(ValueError):
+        TextChunker(SlowTokenizer())
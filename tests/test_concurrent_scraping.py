@@ -0,0 +1,211 @@
+import io
+import os
+import random
+import threading
+import time
+
+import pytest
+from yt_dlp.utils import DownloadError
+
+import src.utils.model_registry as registry
+from src.utils.config_loader import ConfigLoader
+from src.utils.rate_limiter import AdaptiveRateLimiter, call_with_retries
+from src.youtube_dataset_builder import YouTubeDatasetBuilder
+from src.youtube_scraper import SubtitleTrack, YouTubeScraper
+
+CONFIG_PATH = "tests/configs/test_config.yaml"
+
+
+class FakeYDL:
+    """
+    Локальная заглушка yt_dlp.YoutubeDL:
+      - первые THROTTLED_CALLS вызовов extract_info для каждого видео отвечают HTTP 429,
+      - видео с ID, начинающимся на NOSUBS, не имеют субтитров,
+      - download пишет <id>.ru.vtt в каталог из outtmpl, как это делает yt-dlp.
+    """
+    THROTTLED_CALLS = 1
+    calls = {}
+    lock = threading.Lock()
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        vid = url.split("v=")[-1]
+        with FakeYDL.lock:
+            FakeYDL.calls[vid] = FakeYDL.calls.get(vid, 0) + 1
+            attempt = FakeYDL.calls[vid]
+        # случайная задержка, чтобы потоки завершались не по порядку
+        time.sleep(random.uniform(0, 0.02))
+        if attempt <= FakeYDL.THROTTLED_CALLS:
+            raise DownloadError("ERROR: HTTP Error 429: Too Many Requests")
+        if vid.startswith("NOSUBS"):
+            return {"id": vid}
+        return {"id": vid, "subtitles": {"ru": [{"ext": "vtt", "url": f"http://subs/{vid}"}]}}
+
+    def urlopen(self, url):
+        vid = url.rsplit("/", 1)[-1]
+        return io.BytesIO(f"WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nтекст {vid}".encode("utf-8"))
+
+    def download(self, urls):
+        for url in urls:
+            vid = url.split("v=")[-1]
+            out_dir = os.path.dirname(self.opts["outtmpl"])
+            with open(os.path.join(out_dir, f"{vid}.ru.vtt"), "w", encoding="utf-8") as f:
+                f.write(f"WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nтекст {vid}")
+
+
+@pytest.fixture
+def cfg(tmp_path):
+    cfg = ConfigLoader(config_path=CONFIG_PATH).get_config()
+    cfg.output_dir = str(tmp_path / "processed")
+    cfg.subtitles_dir = str(tmp_path / "raw")
+    cfg.categories = {
+        "a": [f"https://www.youtube.com/watch?v=A{i}" for i in range(6)],
+        "b": ["https://www.youtube.com/watch?v=NOSUBS1", "https://www.youtube.com/watch?v=B1"],
+    }
+    cfg.scraping.workers = 4
+    cfg.scraping.backoff_base = 0.001
+    cfg.scraping.backoff_max = 0.01
+    return cfg
+
+
+@pytest.fixture
+def builder(cfg, monkeypatch, fast_tokenizer):
+    FakeYDL.calls = {}
+    tokenizer = fast_tokenizer()
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    builder = YouTubeDatasetBuilder(cfg)
+    builder.scraper = YouTubeScraper(cfg.subtitles_dir, ydl_factory=FakeYDL)
+    return builder
+
+
+@pytest.mark.unit
+def test_call_with_retries_backs_off_on_throttling():
+    """Повторяет вызов при HTTP 429, увеличивает интервал лимитера и не повторяет прочие ошибки."""
+    sleeps = []
+    limiter = AdaptiveRateLimiter(sleep=sleeps.append)
+    attempts = {"n": 0}
+
+    def flaky():
+        attempts["n"] += 1
+        if attempts["n"] < 3:
+            raise DownloadError("HTTP Error 429: Too Many Requests")
+        return "ok"
+
+    result = call_with_retries(
+        flaky, max_retries=3, backoff_base=0.5, limiter=limiter,
+        rng=random.Random(0), sleep=sleeps.append,
+    )
+    assert result == "ok"
+    assert attempts["n"] == 3
+    assert limiter.throttle_events == 2
+    assert limiter.interval > 0
+
+    def broken():
+        raise ValueError("Private video")
+
+    with pytest.raises(ValueError):
+        call_with_retries(broken, max_retries=3, sleep=sleeps.append)
+
+
+@pytest.mark.integration
+def test_concurrent_build_keeps_order_and_stats(builder, cfg):
+    """
+    Параллельная загрузка через заглушку экстрактора:
+      1) порядок записей совпадает с порядком категорий и ссылок в конфиге,
+      2) статистика пропусков детерминирована,
+      3) троттлинг обработан повторами.
+    """
+    captured = []
+    builder.saver.save = lambda data: captured.extend(data)
+
+    builder.build_dataset()
+
+    expected_ids = [f"A{i}" for i in range(6)] + ["B1"]
+    assert [rec["text"].split()[-1] for rec in captured] == expected_ids
+    assert [rec["category"] for rec in captured] == ["a"] * 6 + ["b"]
+    # записи уже токенизированы тем же токенизатором, что и при обучении
+    for rec in captured:
+        assert rec["input_ids"] == builder.tokenizer(rec["text"])["input_ids"]
+        assert rec["length"] == len(rec["input_ids"])
+        assert rec["tokenizer"] == builder.fingerprint
+        assert rec["video_id"] == rec["text"].split()[-1]
+
+    assert builder.total_videos == 8
+    assert builder.downloaded_subtitles == 7
+    assert builder.skipped_videos == [
+        {"url": "https://www.youtube.com/watch?v=NOSUBS1", "reason": "Нет сабов"}
+    ]
+    assert all(n == FakeYDL.THROTTLED_CALLS + 1 for n in FakeYDL.calls.values())
+
+
+@pytest.mark.integration
+def test_rerun_uses_manifest_without_network(builder, cfg):
+    """Повторная сборка берёт субтитры и чанки из манифеста и не обращается к экстрактору."""
+    first = []
+    builder.saver.save = lambda data: first.extend(data)
+    builder.build_dataset()
+    calls_after_first = dict(FakeYDL.calls)
+
+    manifest = builder.manifest.get("A0")
+    assert manifest["lang"] == "ru" and manifest["automatic"] is False
+    assert manifest["num_chunks"] == 1
+
+    rebuilt = YouTubeDatasetBuilder(cfg)
+    rebuilt.scraper = YouTubeScraper(cfg.subtitles_dir, ydl_factory=FakeYDL)
+    second = []
+    rebuilt.saver.save = lambda data: second.extend(data)
+    rebuilt.build_dataset()
+
+    assert second == first
+    assert rebuilt.cached_videos == 7
+    # Новые запросы были только для видео без субтитров
+    new_calls = {vid: n - calls_after_first.get(vid, 0) for vid, n in FakeYDL.calls.items()}
+    assert {vid for vid, n in new_calls.items() if n} == {"NOSUBS1"}
+
+
+@pytest.mark.integration
+def test_in_memory_mode_without_raw_files(builder, cfg):
+    """
+    Режим in_memory без сохранения VTT: субтитры не попадают на диск,
+    а повторная сборка всё равно обходится без экстрактора.
+    """
+    cfg.scraping.in_memory = True
+    cfg.scraping.keep_raw = False
+    first = []
+    builder.saver.save = lambda data: first.extend(data)
+    builder.build_dataset()
+
+    assert [rec["text"].split()[-1] for rec in first] == [f"A{i}" for i in range(6)] + ["B1"]
+    assert not [f for f in os.listdir(cfg.subtitles_dir) if f.endswith(".vtt")]
+
+    calls_after_first = dict(FakeYDL.calls)
+    rebuilt = YouTubeDatasetBuilder(cfg)
+    rebuilt.scraper = YouTubeScraper(cfg.subtitles_dir, ydl_factory=FakeYDL)
+    second = []
+    rebuilt.saver.save = lambda data: second.extend(data)
+    rebuilt.build_dataset()
+
+    assert second == first
+    new_calls = {vid for vid, n in FakeYDL.calls.items() if n != calls_after_first.get(vid, 0)}
+    assert new_calls == {"NOSUBS1"}
+
+
+@pytest.mark.unit
+def test_overlap_dedup_only_for_automatic_tracks(builder, cfg):
+    """Перекрытия убираются только у автосубтитров, и версия очистки различает дорожки."""
+    vtt = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nмама мыла раму\nмыла раму утром\n"
+    cfg.scraping.dedup_overlap = True
+    auto = SubtitleTrack(video_id="X", automatic=True, data=vtt.encode("utf-8"))
+    manual = SubtitleTrack(video_id="X", automatic=False, data=vtt.encode("utf-8"))
+
+    assert list(builder._cleaned_lines(auto, builder._preprocessor(auto))) == ["мама мыла раму", "утром"]
+    assert list(builder._cleaned_lines(manual, builder._preprocessor(manual))) == ["мама мыла раму", "мыла раму утром"]
+    assert builder._cleaning_version(True) != builder._cleaning_version(False)
@@ -0,0 +1,39 @@
+import pytest
+import torch
+
+import src.cpu_profile as cp
+from src.utils.config_model import CpuProfileConfig
+
+
+@pytest.fixture
+def restore_threads():
+    threads = torch.get_num_threads()
+    yield
+    torch.set_num_threads(threads)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("bf16_supported", [True, False])
+def test_cpu_profile_training_args(monkeypatch, restore_threads, bf16_supported):
+    """
+    CPU-профиль: потоки torch по настройке, bf16 только при аппаратной поддержке,
+    аргументы TrainingArguments для компиляции, накопления градиентов и воркеров.
+    """
+    monkeypatch.setattr(cp, "cpu_supports_bf16", lambda: bf16_supported)
+    monkeypatch.delenv("TOKENIZERS_PARALLELISM", raising=False)
+    profile = CpuProfileConfig(num_threads=2, compile=True, gradient_accumulation_steps=4, dataloader_workers=2)
+
+    args = cp.apply_cpu_profile(profile)
+
+    assert torch.get_num_threads() == 2
+    assert args == {
+        "use_cpu": True,
+        "bf16": bf16_supported,
+        "torch_compile": True,
+        "gradient_accumulation_steps": 4,
+        "dataloader_num_workers": 2,
+        "dataloader_pin_memory": False,
+        "dataloader_persistent_workers": True,
+    }
+    assert cp.os.environ["TOKENIZERS_PARALLELISM"] == "false"
+    assert cp.physical_cores() >= 1
@@ -0,0 +1,166 @@
+import json
+
+import numpy as np
+import pytest
+
+from torch.utils.data import DataLoader
+
+import src.utils.model_registry as registry
+from src.binary_dataset import binary_path, convert_json_to_binary
+from src.dataset import StreamingTextDataset, TextDataset
+from src.utils.dataset_io import DatasetWriter
+from src.utils.tokenizer_fingerprint import tokenizer_fingerprint
+
+WORDS = "мама мыла раму папа читал книгу".split()
+CONFIG = {"categories": {"a": [], "b": []}}
+
+
+def write_dataset(tmp_path, records):
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+class CountingTokenizer:
+    """Обёртка, считающая вызовы токенизатора (остальные атрибуты — от исходного)."""
+
+    def __init__(self, tokenizer):
+        self._tokenizer = tokenizer
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self._tokenizer(*args, **kwargs)
+
+    def __len__(self):
+        return len(self._tokenizer)
+
+    def __getattr__(self, name):
+        return getattr(self._tokenizer, name)
+
+
+@pytest.mark.unit
+def test_uses_stored_ids_and_falls_back_on_fingerprint_mismatch(tmp_path, monkeypatch, fast_tokenizer):
+    """
+    Записи с отпечатком текущего токенизатора берутся без токенизации,
+    записи с чужим отпечатком или без ID токенизируются один раз при загрузке.
+    """
+    base = fast_tokenizer(WORDS)
+    tokenizer = CountingTokenizer(base)
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+
+    fingerprint = tokenizer_fingerprint(base)
+    other = tokenizer_fingerprint(fast_tokenizer(WORDS + ["кот"]))
+    stored = base("мама мыла раму")["input_ids"]
+    path = write_dataset(tmp_path, [
+        {"category": "a", "text": "мама мыла раму", "input_ids": stored, "tokenizer": fingerprint},
+        {"category": "b", "text": "папа читал книгу", "input_ids": [7, 7, 7], "tokenizer": other},
+        {"category": "b", "text": "читал книгу"},
+    ])
+
+    dataset = TextDataset(path, CONFIG, "local", max_length=8)
+    assert tokenizer.calls == 1
+
+    first = dataset[0]
+    assert first["input_ids"].tolist() == stored
+    assert first["labels"].item() == 0
+    assert dataset[1]["input_ids"].tolist() == base("папа читал книгу")["input_ids"]
+    assert tokenizer.calls == 1
+
+    # Батч коллатора совпадает с прямой токенизацией с padding до самого длинного примера
+    batch = dataset.collator()([dataset[i] for i in range(3)])
+    reference = base(["мама мыла раму", "папа читал книгу", "читал книгу"], padding="longest")
+    for key, values in reference.items():
+        assert batch[key].tolist() == values
+    assert batch["labels"].tolist() == [0, 1, 1]
+
+
+@pytest.mark.unit
+def test_binary_backend_matches_json(tmp_path, monkeypatch, fast_tokenizer):
+    """
+    Бинарная версия датасета даёт те же примеры, что и JSON, читает их из memmap
+    и отказывается работать с токенизатором, которым она не собиралась.
+    """
+    tokenizer = fast_tokenizer(WORDS)
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    records = [
+        {"category": "ab"[i % 2], "text": " ".join(WORDS[: 1 + i % len(WORDS)])} for i in range(25)
+    ]
+    path = write_dataset(tmp_path, records)
+    out = convert_json_to_binary(path, binary_path(path), tokenizer, CONFIG["categories"], batch_size=4)
+
+    from_json = TextDataset(path, CONFIG, "local", max_length=12)
+    from_binary = TextDataset(out, CONFIG, "local", max_length=12)
+    assert isinstance(from_binary.store.tokens, np.memmap)
+    assert len(from_binary) == len(from_json) == 25
+    for i in range(25):
+        a, b = from_json[i], from_binary[i]
+        assert a.keys() == b.keys()
+        assert all(a[key].tolist() == b[key].tolist() for key in a)
+
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: fast_tokenizer(WORDS + ["кот"]))
+    registry.get_registry().clear()
+    with pytest.raises(ValueError):
+        TextDataset(out, CONFIG, "local", max_length=12)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("shards", [1, 4])
+def test_streaming_dataset_splits_workers_without_duplicates(tmp_path, monkeypatch, fast_tokenizer, shards):
+    """
+    Потоковый режим: каждая запись выдаётся ровно один раз при любом числе воркеров,
+    порядок детерминирован по seed и меняется с эпохой, ID совпадают с TextDataset.
+    """
+    tokenizer = fast_tokenizer(WORDS + [str(i) for i in range(40)])
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    records = [{"category": "ab"[i % 2], "text": " ".join(WORDS[: 1 + i % len(WORDS)] + [str(i)])}
+               for i in range(40)]
+    path = str(tmp_path / "train.jsonl")
+    with DatasetWriter(path, max_shard_bytes=None if shards == 1 else 600) as writer:
+        writer.write_many(records)
+
+    def run(num_workers, epoch=0, seed=3):
+        dataset = StreamingTextDataset(path, CONFIG, "local", shuffle_buffer=8, seed=seed, tokenize_batch=5)
+        dataset.set_epoch(epoch)
+        loader = DataLoader(dataset, batch_size=None, num_workers=num_workers)
+        return [tuple(item["input_ids"].tolist()) for item in loader]
+
+    single = run(0)
+    assert len(single) == 40 and len(set(single)) == 40
+    assert sorted(run(2)) == sorted(single)
+    assert run(0) == single
+    assert run(0, epoch=1) != single
+
+    plain = TextDataset(path, CONFIG, "local")
+    assert sorted(single) == sorted(tuple(plain[i]["input_ids"].tolist()) for i in range(len(plain)))
+    assert len(StreamingTextDataset(path, CONFIG, "local")) == 40
+
+
+@pytest.mark.unit
+def test_streaming_epoch_reaches_persistent_workers(tmp_path, monkeypatch, fast_tokenizer):
+    """set_epoch в главном процессе меняет порядок и в persistent-воркерах DataLoader."""
+    tokenizer = fast_tokenizer(WORDS + [str(i) for i in range(30)])
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    records = [{"category": "ab"[i % 2], "text": f"{WORDS[i % len(WORDS)]} {i}"} for i in range(30)]
+    path = str(tmp_path / "train.jsonl")
+    with DatasetWriter(path) as writer:
+        writer.write_many(records)
+
+    def order(loader):
+        return [tuple(item["input_ids"].tolist()) for item in loader]
+
+    reference = StreamingTextDataset(path, CONFIG, "local", shuffle_buffer=8, seed=3, tokenize_batch=5)
+    expected = []
+    for epoch in range(3):
+        reference.set_epoch(epoch)
+        expected.append(order(DataLoader(reference, batch_size=None, num_workers=0)))
+
+    dataset = StreamingTextDataset(path, CONFIG, "local", shuffle_buffer=8, seed=3, tokenize_batch=5)
+    loader = DataLoader(dataset, batch_size=None, num_workers=1, persistent_workers=True)
+    epochs = []
+    for epoch in range(3):
+        dataset.set_epoch(epoch)
+        epochs.append(order(loader))
+
+    assert epochs == expected
+    assert len(set(map(tuple, epochs))) == 3
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+from src.dataset_saver import DatasetSaver
+from src.utils.dataset_io import DatasetWriter, dataset_files, iter_records
+
+RECORDS = [{"category": "a", "text": f"пример {i}\nвторая строка", "input_ids": [2, i, 3]} for i in range(20)]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", ["dataset.json", "dataset.jsonl"])
+def test_roundtrip_and_sharding(tmp_path, name):
+    """Записи читаются обратно в том же порядке — и из одного файла, и из шардов."""
+    path = str(tmp_path / name)
+    with DatasetWriter(path) as writer:
+        writer.write_many(iter(RECORDS))
+    assert list(iter_records(path)) == RECORDS
+    if name.endswith(".json"):
+        # JSON-массив по записи в строке по-прежнему читается json.load
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == RECORDS
+
+    with DatasetWriter(path, max_shard_bytes=300) as writer:
+        writer.write_many(RECORDS)
+    files = dataset_files(path)
+    assert len(files) > 1 and not os.path.exists(path)
+    assert all(os.path.getsize(f) < 600 for f in files)
+    assert list(iter_records(path)) == RECORDS
+
+
+@pytest.mark.unit
+def test_append_and_atomic_abort(tmp_path):
+    """append дописывает к существующему датасету; ошибка посреди записи не портит файл."""
+    path = str(tmp_path / "dataset.json")
+    saver = DatasetSaver(path)
+    assert saver.save(RECORDS[:5]) == 5
+    assert saver.save(iter(RECORDS[5:]), append=True) == 15
+    assert list(iter_records(path)) == RECORDS
+
+    def broken():
+        yield RECORDS[0]
+        raise RuntimeError("сбой посреди записи")
+
+    with pytest.raises(RuntimeError):
+        with DatasetWriter(path) as writer:
+            writer.write_many(broken())
+    assert list(iter_records(path)) == RECORDS
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+    # пустой поток не затирает уже сохранённый датасет
+    assert saver.save([]) == 0
+    assert list(iter_records(path)) == RECORDS
+
+
+@pytest.mark.unit
+def test_reads_legacy_pretty_printed_json(tmp_path):
+    """Старые файлы с indent=4 читаются тем же читателем."""
+    path = tmp_path / "legacy.json"
+    path.write_text(json.dumps(RECORDS[:3], ensure_ascii=False, indent=4), encoding="utf-8")
+    assert list(iter_records(str(path))) == RECORDS[:3]
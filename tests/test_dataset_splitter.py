@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from src.dataset_splitter import DatasetSplitter
+from src.utils.dataset_io import DatasetWriter, iter_records
+
+
+def write_dataset(path, videos_per_category=40, chunks_per_video=3):
+    records = [
+        {"category": category, "video_id": f"{category}{v}", "text": f"{category}{v} chunk {c}"}
+        for category in ("a", "b")
+        for v in range(videos_per_category)
+        for c in range(chunks_per_video)
+    ]
+    with DatasetWriter(str(path)) as writer:
+        writer.write_many(records)
+    return records
+
+
+@pytest.mark.unit
+def test_split_keeps_videos_together_and_is_stable(tmp_path):
+    """
+    Разбиение по видео:
+      1) каждая запись попадает ровно в одну выборку, видео не делится между ними,
+      2) доля валидации выдерживается по каждой категории,
+      3) повторный запуск даёт то же разбиение, а новые видео не двигают старые.
+    """
+    source = tmp_path / "dataset.json"
+    records = write_dataset(source)
+    train_path, val_path = str(tmp_path / "train.json"), str(tmp_path / "val.json")
+
+    stats = DatasetSplitter(val_fraction=0.25, seed=1).split(str(source), train_path, val_path)
+    train, val = list(iter_records(train_path)), list(iter_records(val_path))
+    json.load(open(train_path, encoding="utf-8"))  # выход остаётся обычным JSON
+
+    assert sorted(r["text"] for r in train + val) == sorted(r["text"] for r in records)
+    assert not {r["video_id"] for r in train} & {r["video_id"] for r in val}
+    for category in ("a", "b"):
+        assert stats[category]["train_videos"] + stats[category]["val_videos"] == 40
+        assert 4 <= stats[category]["val_videos"] <= 18
+        assert stats[category]["val"] == 3 * stats[category]["val_videos"]
+
+    write_dataset(source, videos_per_category=60)
+    DatasetSplitter(val_fraction=0.25, seed=1).split(str(source), train_path, val_path)
+    val_again = {r["video_id"] for r in iter_records(val_path)}
+    assert {r["video_id"] for r in val} <= val_again
+
+
+@pytest.mark.unit
+def test_split_warns_on_category_without_val(tmp_path, caplog):
+    """Категория, все видео которой ушли в train, даёт предупреждение."""
+    source = tmp_path / "dataset.jsonl"
+    with DatasetWriter(str(source)) as writer:
+        writer.write({"category": "a", "video_id": "only", "text": "x"})
+        writer.write({"category": "b", "text": "без video_id"})
+    splitter = DatasetSplitter(val_fraction=0.01, seed=0)
+
+    stats = splitter.split(str(source), str(tmp_path / "train.jsonl"), str(tmp_path / "val.jsonl"))
+
+    assert stats["a"] == {"train_videos": 1, "val_videos": 0, "train": 1, "val": 0}
+    assert stats["b"]["train"] == 1
+    assert "не попала в валидацию" in caplog.text
+    assert "без video_id" in caplog.text
@@ -1,5 +1,7 @@
+import json
 import os
 import shutil
+import signal
 import tempfile
 import pytest
 import torch
@@ -7,6 +9,9 @@ from types import SimpleNamespace
 
 # Импортируем модуль, в котором лежит fine_tune_model
 import src.fine_tune as ft
+from src.fine_tune import SamplerTrainer  # настоящий класс: фикстура ниже подменяет ft.SamplerTrainer
+import src.utils.model_registry as registry
+from src.checkpointing import RunConfigCallback
 from src.utils.config_model import AppConfig
 
 # --- 1. ПОДГОТОВКА DUMMY-КОМПОНЕНТОВ ---
@@ -44,18 +49,22 @@ class DummyTrainer:
     Заглушка вместо transformers.Trainer:
     просто помечает, что train() был вызван.
     """
-    def __init__(self, model, args, train_dataset, eval_dataset, data_collator, tokenizer=None):
+    def __init__(self, model, args, train_dataset, eval_dataset, data_collator, tokenizer=None, callbacks=None,
+                 train_sampler=None):
         self.model = model
         self.args = args
         self.train_dataset = train_dataset
         self.eval_dataset = eval_dataset
         self.data_collator = data_collator
         self.tokenizer = tokenizer
+        self.callbacks = callbacks or []
+        self.train_sampler = train_sampler
         self.trained = False
 
-    def train(self):
+    def train(self, resume_from_checkpoint=None):
         # Симулируем один шаг обучения
         self.trained = True
+        self.resumed_from = resume_from_checkpoint
         return SimpleNamespace()
 
 @pytest.fixture(autouse=True)
@@ -63,7 +72,7 @@ def patch_everything(monkeypatch, tmp_path):
     """
     Подменяем внутри src.fine_tune:
       - TextDataset → DummyDataset
-      - Trainer      → DummyTrainer
+      - SamplerTrainer → DummyTrainer
       - AutoTokenizer.from_pretrained → dummy возвращающий SimpleNamespace
       - AutoModelForSequenceClassification.from_pretrained → DummyModel
     """
@@ -71,17 +80,18 @@ def patch_everything(monkeypatch, tmp_path):
     monkeypatch.setattr(ft, "TextDataset", DummyDataset)
 
     # 2. Подмена Trainer
-    monkeypatch.setattr(ft, "Trainer", DummyTrainer)
+    monkeypatch.setattr(ft, "SamplerTrainer", DummyTrainer)
 
     # 3. Подмена токенизатора — нам он не нужен, просто placeholder
     class DummyTokenizer:
         pass
-    monkeypatch.setattr(ft.AutoTokenizer, "from_pretrained",
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained",
                         lambda name: DummyTokenizer())
 
     # 4. Подмена модели
     class DummyModel:
         def to(self, device): pass
+        def named_parameters(self): return iter(())
         def save_pretrained(self, path):
             os.makedirs(path, exist_ok=True)
             # Создадим фейковый файл, чтобы можно было проверить
@@ -138,3 +148,102 @@ def test_fine_tune_smoke(cfg):
     assert os.path.isdir(final_dir), "Папка final_model должна быть создана"
     file_path = os.path.join(final_dir, "pytorch_model.bin")
     assert os.path.isfile(file_path), "Файл pytorch_model.bin должен быть сохранён"
+
+@pytest.mark.unit
+def test_fine_tune_cpu_profile(cfg, monkeypatch):
+    """training_profile: cpu передаёт аргументы CPU-профиля в TrainingArguments."""
+    monkeypatch.setattr(ft, "apply_cpu_profile", lambda profile: {
+        "use_cpu": True,
+        "gradient_accumulation_steps": profile.gradient_accumulation_steps,
+    })
+    trainers = []
+    monkeypatch.setattr(ft, "SamplerTrainer", lambda **kwargs: trainers.append(DummyTrainer(**kwargs)) or trainers[-1])
+    cfg.training_profile = "cpu"
+    cfg.cpu_profile.gradient_accumulation_steps = 3
+
+    ft.fine_tune_model(cfg, cfg.model_name)
+
+    (trainer,) = trainers
+    assert trainer.args.use_cpu
+    assert trainer.args.gradient_accumulation_steps == 3
+    assert trainer.trained
+
+@pytest.mark.unit
+def test_fine_tune_resumes_only_unfinished_run_with_same_config(cfg, monkeypatch):
+    """
+    Обучение продолжается с последнего полного чекпоинта в save_dir, только если прогон
+    не завершён и чекпоинт сохранён с теми же настройками (хэш в trainer_state.json).
+    """
+    trainers = []
+    monkeypatch.setattr(ft, "SamplerTrainer", lambda **kwargs: trainers.append(DummyTrainer(**kwargs)) or trainers[-1])
+
+    def run():
+        ft.fine_tune_model(cfg, cfg.model_name)
+        return trainers[-1]
+
+    first = run()
+    assert first.resumed_from is None
+    (callback,) = [cb for cb in first.callbacks if isinstance(cb, RunConfigCallback)]
+
+    ckpt = os.path.join(cfg.save_dir, "checkpoint-3")
+    os.makedirs(ckpt)
+    for name in ("optimizer.pt", "adapter_model.safetensors"):
+        open(os.path.join(ckpt, name), "w").close()
+
+    def write_state(global_step):
+        state = {"global_step": global_step, "max_steps": 10,
+                 "stateful_callbacks": {"RunConfigCallback": callback.state()}}
+        with open(os.path.join(ckpt, "trainer_state.json"), "w") as f:
+            json.dump(state, f)
+
+    write_state(3)
+    assert run().resumed_from == ckpt
+
+    # прогон уже завершён — начинаем заново
+    write_state(10)
+    assert run().resumed_from is None
+
+    # изменились настройки LoRA — веса чекпоинта не подойдут по форме
+    write_state(3)
+    cfg.lora_r = 8
+    assert run().resumed_from is None
+
+
+@pytest.mark.unit
+def test_fine_tune_restores_signal_handler_on_error(cfg, monkeypatch):
+    """Если обучение упало, обработчик SIGTERM всё равно возвращается прежний."""
+    class FailingTrainer(DummyTrainer):
+        def train(self, resume_from_checkpoint=None):
+            for cb in self.callbacks:
+                cb.on_train_begin(self.args, None, None)
+            raise RuntimeError("OOM")
+
+    monkeypatch.setattr(ft, "SamplerTrainer", FailingTrainer)
+    previous = signal.getsignal(signal.SIGTERM)
+
+    with pytest.raises(RuntimeError):
+        ft.fine_tune_model(cfg, cfg.model_name)
+
+    assert signal.getsignal(signal.SIGTERM) is previous
+
+
+@pytest.mark.unit
+def test_sampler_trainer_uses_given_sampler(tmp_path):
+    """SamplerTrainer отдаёт DataLoader свой сэмплер; без него — сэмплер Trainer по умолчанию."""
+    from transformers import BertConfig, BertForSequenceClassification, TrainingArguments
+
+    from src.batching import LengthBucketSampler
+
+    model = BertForSequenceClassification(BertConfig(
+        vocab_size=50, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32
+    ))
+    args = TrainingArguments(output_dir=str(tmp_path), per_device_train_batch_size=2, report_to=[], use_cpu=True)
+    sampler = LengthBucketSampler([3, 1, 2, 5], batch_size=2)
+
+    trainer = SamplerTrainer(model=model, args=args, train_dataset=DummyDataset(None, None, None),
+                             train_sampler=sampler)
+    assert trainer._get_train_sampler() is sampler
+    assert "_get_train_sampler" not in vars(trainer)
+
+    plain = SamplerTrainer(model=model, args=args, train_dataset=DummyDataset(None, None, None))
+    assert isinstance(plain._get_train_sampler(), torch.utils.data.RandomSampler)
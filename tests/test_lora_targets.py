@@ -0,0 +1,60 @@
+import pytest
+from peft import LoraConfig, TaskType, get_peft_model
+from transformers import BertConfig, BertForSequenceClassification
+
+from src.lora_targets import discover_lora_targets, module_role, parameter_report, resolve_lora_targets
+
+
+@pytest.fixture
+def bert():
+    """Маленький BERT со случайными весами (без обращения к Hub)."""
+    config = BertConfig(
+        vocab_size=100, hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64, num_labels=3
+    )
+    return BertForSequenceClassification(config)
+
+
+@pytest.mark.unit
+def test_module_roles_across_architectures():
+    """Роли слоёв распознаются по именам разных архитектур."""
+    assert module_role("bert.encoder.layer.0.attention.self.query") == "attention"
+    assert module_role("bert.encoder.layer.0.attention.output.dense") == "attention_output"
+    assert module_role("bert.encoder.layer.0.output.dense") == "ffn"
+    assert module_role("model.layers.0.self_attn.q_proj") == "attention"
+    assert module_role("model.layers.0.mlp.down_proj") == "ffn"
+    assert module_role("transformer.h.0.attn.c_proj") == "attention_output"
+    assert module_role("transformer.h.0.mlp.c_proj") == "ffn"
+    assert module_role("classifier") == "head"
+
+
+@pytest.mark.unit
+def test_presets_attach_adapters_to_bert(bert):
+    """
+    Пресеты находят query/key/value BERT (а не отсутствующие q_proj/v_proj), адаптеры реально
+    встают в модель, и число обучаемых параметров растёт от attention к all_linear.
+    """
+    attention = discover_lora_targets(bert, "attention")
+    assert len(attention) == 6
+    assert {name.rsplit(".", 1)[-1] for name in attention} == {"query", "key", "value"}
+    assert len(discover_lora_targets(bert, "attention_ffn")) == 12
+    assert not any("classifier" in name or "pooler" in name for name in discover_lora_targets(bert, "all_linear"))
+
+    trainable = []
+    for preset in ("attention", "attention_ffn"):
+        model = get_peft_model(
+            BertForSequenceClassification(bert.config),
+            LoraConfig(task_type=TaskType.SEQ_CLS, r=2, target_modules=resolve_lora_targets(bert, preset)),
+        )
+        report = parameter_report(model)
+        assert 0 < report["trainable_params"] < report["total_params"]
+        assert report["optimizer_state_mb"] == pytest.approx(report["gradient_mb"] * 2, abs=0.01)
+        trainable.append(report["trainable_params"])
+    assert trainable[0] < trainable[1]
+
+
+@pytest.mark.unit
+def test_override_is_validated(bert):
+    """Явный список модулей из конфига проверяется по модели."""
+    assert resolve_lora_targets(bert, override=["query", "value"]) == ["query", "value"]
+    with pytest.raises(ValueError):
+        resolve_lora_targets(bert, override=["q_proj", "v_proj"])
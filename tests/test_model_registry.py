@@ -0,0 +1,52 @@
+import pytest
+import torch
+
+from src.utils.model_registry import ModelRegistry, get_registry
+import src.utils.model_registry as registry
+
+
+class CountingModel(torch.nn.Module):
+    """Модель-заглушка с from_pretrained, считающая загрузки."""
+    loads = []
+
+    def __init__(self, size):
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.zeros(size))
+
+    @classmethod
+    def from_pretrained(cls, name, size=256):
+        cls.loads.append(name)
+        return cls(size)
+
+
+@pytest.mark.unit
+def test_registry_shares_tokenizer_across_components(monkeypatch, fast_tokenizer):
+    """Токенизатор загружается один раз на процесс; время загрузки и обращения записываются."""
+    loads = []
+    monkeypatch.setattr(
+        registry.AutoTokenizer, "from_pretrained", lambda name: loads.append(name) or fast_tokenizer(["a"])
+    )
+
+    first = get_registry().tokenizer("local")
+    assert get_registry().tokenizer("local") is first
+    assert loads == ["local"]
+
+    (stats,) = get_registry().stats().values()
+    assert stats["hits"] == 1 and stats["load_time"] >= 0 and stats["bytes"] == 0
+
+
+@pytest.mark.unit
+def test_registry_evicts_least_recently_used_models():
+    """Модели сверх бюджета памяти вытесняются по давности использования; eval-режим включён."""
+    CountingModel.loads = []
+    reg = ModelRegistry(max_bytes=2 * 256 * 4)
+
+    a = reg.model(CountingModel, "a")
+    reg.model(CountingModel, "b")
+    assert not a.training
+    assert reg.model(CountingModel, "a") is a      # "a" теперь использовалась последней
+    reg.model(CountingModel, "c")                  # вытесняет "b"
+
+    assert [key[2] for key in reg.stats()] == ["a", "c"]
+    reg.model(CountingModel, "b")
+    assert CountingModel.loads == ["a", "b", "c", "b"]
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from src.processing.data_cleaner import DataCleaner
+from src.processing.near_duplicates import NearDuplicateFilter, optimal_bands
+from src.utils.dataset_validator import DatasetValidator
+
+BASE = (
+    "сегодня мы поговорим о том, как устроена память человека и почему "
+    "одни события запоминаются на всю жизнь, а другие забываются через минуту"
+)
+PARAPHRASE = BASE.replace("сегодня мы поговорим", "сегодня поговорим")
+OTHER = "рецепт борща: свёкла, капуста, картофель, морковь и немного уксуса для цвета"
+
+
+@pytest.mark.unit
+def test_minhash_similarity_and_bands():
+    """Оценка сходства по сигнатурам близка к Жаккару, полосы покрывают всю сигнатуру."""
+    dedup = NearDuplicateFilter(threshold=0.8, num_perm=128)
+    assert dedup.bands * dedup.rows == 128
+    assert optimal_bands(128, 0.5)[0] > optimal_bands(128, 0.9)[0]
+
+    sig = dedup.signatures([BASE, PARAPHRASE, OTHER, BASE.upper(), ""])
+    assert sig.shape == (5, 128)
+    assert dedup.similarity(sig[0], sig[3]) == 1.0       # регистр нормализуется
+    assert dedup.similarity(sig[0], sig[1]) > 0.8
+    assert dedup.similarity(sig[0], sig[2]) < 0.2
+
+
+@pytest.mark.unit
+def test_filter_keeps_first_of_each_group():
+    """Поток записей: остаётся первый экземпляр каждой группы почти-дубликатов, порядок сохранён."""
+    records = [{"text": t, "i": i} for i, t in enumerate([BASE, OTHER, PARAPHRASE, "", "", OTHER + "!"])]
+    dedup = NearDuplicateFilter(batch_size=2)
+
+    kept = [r["i"] for r in dedup.filter(records)]
+
+    assert kept == [0, 1, 3, 4]
+    assert (dedup.seen, dedup.duplicates) == (6, 2)
+    assert dedup.duplicate_pairs([BASE, OTHER, PARAPHRASE]) == [(2, 0)]
+    assert dedup.seen == 6  # duplicate_pairs не меняет состояние фильтра
+
+
+@pytest.mark.unit
+def test_cleaner_and_validator_use_near_duplicates(tmp_path):
+    """DataCleaner удаляет почти-дубликаты по порогу, DatasetValidator их считает."""
+    df = pd.DataFrame({"text": [BASE, OTHER, PARAPHRASE], "label": ["a", "b", "a"]})
+
+    cleaned = DataCleaner().clean_data(df, near_duplicate_threshold=0.8)
+    assert cleaned["text"].tolist() == [BASE, OTHER]
+    assert len(DataCleaner().clean_data(df)) == 3
+
+    path = tmp_path / "dataset.csv"
+    df.to_csv(path, index=False)
+    assert DatasetValidator(str(path)).check_near_duplicates(df) == 1
@@ -0,0 +1,94 @@
+import pytest
+
+from src.subtitle_preprocessor import SubtitlePreprocessor
+
+AUTO_VTT = """WEBVTT
+Kind: captions
+Language: ru
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+
+привет<00:00:00.500><c> мир</c>
+
+00:00:02.000 --> 00:00:02.010 align:start position:0%
+привет мир
+
+
+00:00:02.010 --> 00:00:04.000 align:start position:0%
+привет мир
+как<00:00:02.500><c> дела</c>
+"""
+
+
+@pytest.mark.unit
+def test_iter_cleaned_is_lazy_single_pass():
+    """iter_cleaned — генератор: очищает строки по одной и убирает повторы подряд."""
+    consumed = []
+
+    def source():
+        for line in AUTO_VTT.splitlines():
+            consumed.append(line)
+            yield line
+
+    lines = SubtitlePreprocessor().iter_cleaned(source())
+    assert consumed == [], "Строки не должны читаться до запроса первой очищенной строки"
+    assert next(lines) == "привет мир"
+    assert len(consumed) < len(AUTO_VTT.splitlines())
+    assert list(lines) == ["как дела"]
+
+
+@pytest.mark.unit
+def test_process_streams_file(tmp_path):
+    """process() пишет тот же результат, что и process_text(), а stream() — те же строки."""
+    vtt = tmp_path / "x.vtt"
+    vtt.write_text(AUTO_VTT, encoding="utf-8")
+    out = tmp_path / "x_cleaned.txt"
+
+    pre = SubtitlePreprocessor(str(vtt), str(out))
+    pre.process()
+
+    expected = pre.process_text(AUTO_VTT)
+    assert out.read_text(encoding="utf-8") == expected == "привет мир\nкак дела"
+    assert list(pre.stream()) == expected.split("\n")
+
+
+@pytest.mark.unit
+def test_suffix_prefix_overlap():
+    """KMP-поиск наибольшего суффикса, совпадающего с префиксом следующей строки."""
+    overlap = SubtitlePreprocessor._suffix_prefix_overlap
+    assert overlap("a b c".split(), "b c d".split()) == 2
+    assert overlap("a b a b".split(), "a b a c".split()) == 2
+    assert overlap("x a a".split(), "a a a".split()) == 2
+    assert overlap("a b".split(), "c d".split()) == 0
+    assert overlap([], "a".split()) == 0
+
+
+@pytest.mark.unit
+def test_rolling_caption_overlaps_removed(fast_tokenizer):
+    """Бегущие автосубтитры: повторы соседних cue убираются, экономия считается в токенах."""
+    rolling = [
+        "сегодня, мы поговорим",
+        "сегодня, мы поговорим о том, как",
+        "о том, как устроена память",
+        "устроена память",
+        "и да",
+        "да конечно",
+    ]
+    tokenizer = fast_tokenizer(" ".join(rolling).replace(",", " ").split())
+    pre = SubtitlePreprocessor(dedup_overlaps=True, tokenizer=tokenizer)
+    cleaned = list(pre.iter_cleaned(rolling))
+
+    assert " ".join(cleaned) == "сегодня, мы поговорим о том, как устроена память и да да конечно"
+    # совпадение в одно слово ("да") повтором не считается
+    assert cleaned[-1] == "да конечно"
+    # запятая — отдельный токен: из 20 слов убраны 8, а из 24 токенов — 10
+    def count(lines):
+        return len(tokenizer(" ".join(lines), add_special_tokens=False)["input_ids"])
+
+    assert count(rolling) == 24
+    assert pre.tokens_saved == 10
+    assert count(rolling) - pre.tokens_saved == count(cleaned)
+
+    plain = SubtitlePreprocessor(dedup_overlaps=False, tokenizer=tokenizer)
+    assert list(plain.iter_cleaned(rolling)) == rolling
+    assert plain.tokens_saved == 0
@@ -0,0 +1,138 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import src.sweep as sweep
+from src.utils.config_model import AppConfig, SweepConfig
+
+
+def base_cfg(tmp_path, **sweep_cfg):
+    return AppConfig(
+        model_name="dummy-model",
+        output_dir=str(tmp_path),
+        subtitles_dir=str(tmp_path / "subs"),
+        train_data_path="ignored.json",
+        val_data_path="ignored.json",
+        save_dir=str(tmp_path / "out"),
+        use_lora=True,
+        lora_r=1,
+        lora_alpha=1,
+        lora_dropout=0.0,
+        batch_size=2,
+        num_epochs=1,
+        learning_rate=1e-5,
+        weight_decay=0.0,
+        logging_steps=1,
+        save_total_limit=1,
+        log_level="INFO",
+        log_format="%(message)s",
+        categories={"any": ["url"]},
+        sweep=sweep_cfg,
+    )
+
+
+def fake_trial(cfg_dict, trial, params, history):
+    """Испытание без обучения: метрика зависит от параметров, r=16 падает."""
+    if params["lora_r"] == 16:
+        raise RuntimeError("out of memory")
+    history[trial] = [params["learning_rate"] * params["lora_r"]]
+    return {
+        "trial": trial, **params, "status": "completed",
+        "eval_loss": params["learning_rate"] * params["lora_r"], "cores": ",".join(map(str, sweep._WORKER_CORES)),
+    }
+
+
+@pytest.mark.unit
+def test_expand_grid_and_sampling():
+    """Сетка — все сочетания; max_trials — воспроизводимая выборка; неизвестный параметр — ошибка."""
+    grid = {"lora_r": [4, 8, 16], "learning_rate": [1e-5, 3e-5]}
+    assert len(sweep.expand_grid(SweepConfig(grid=grid))) == 6
+    sampled = sweep.expand_grid(SweepConfig(grid=grid, max_trials=3, seed=1))
+    assert len(sampled) == 3 and sampled == sweep.expand_grid(SweepConfig(grid=grid, max_trials=3, seed=1))
+    with pytest.raises(ValueError):
+        sweep.expand_grid(SweepConfig(grid={"lora_rank": [4]}))
+
+
+@pytest.mark.unit
+def test_median_stopping_rule():
+    """Испытание хуже медианы остальных на той же оценке останавливается, но не раньше grace_evals."""
+    rule = sweep.MedianStoppingRule(mode="min", grace_evals=1, min_trials=3)
+    history = {0: [1.0, 0.8], 1: [1.1, 0.9], 2: [0.9, 0.7], 3: [1.5, 1.4]}
+    assert rule.should_stop(3, history)
+    assert not rule.should_stop(2, history)
+    assert not rule.should_stop(3, {t: v[:1] for t, v in history.items()})  # первая оценка — grace
+    assert not rule.should_stop(3, {0: [1.0, 0.8], 3: [1.5, 1.4]})  # мало испытаний для сравнения
+    assert not sweep.MedianStoppingRule(mode="max", min_trials=3).should_stop(3, history)
+
+
+@pytest.mark.unit
+def test_median_stopping_callback_stops_training():
+    """Колбэк пишет метрику в общую историю и выставляет should_training_stop."""
+    history = {0: [0.5, 0.4], 1: [0.6, 0.5], 2: [0.55, 0.45]}
+    callback = sweep.MedianStoppingCallback(3, history, sweep.MedianStoppingRule(min_trials=3))
+    control = SimpleNamespace(should_training_stop=False)
+    for loss in (0.9, 0.8):
+        callback.on_evaluate(None, None, control, metrics={"eval_loss": loss})
+    assert history[3] == [0.9, 0.8]
+    assert callback.stopped and control.should_training_stop
+
+
+@pytest.mark.unit
+def test_core_slices_are_disjoint():
+    """Наборы ядер воркеров не пересекаются."""
+    slices = sweep.core_slices(2, 1)
+    assert len(slices) == 2 and all(len(s) == 1 for s in slices)
+    if len(os.sched_getaffinity(0)) >= 2:
+        assert set(slices[0]).isdisjoint(slices[1])
+
+
+@pytest.mark.integration
+def test_run_sweep_collects_results(tmp_path, monkeypatch):
+    """
+    Испытания выполняются в пуле процессов на закреплённых ядрах, результаты
+    (включая упавшие испытания) собираются в одну таблицу, отсортированную по метрике.
+    """
+    monkeypatch.setattr(sweep, "prepare_shared_dataset", lambda cfg: None)
+    cfg = base_cfg(
+        tmp_path, grid={"lora_r": [4, 8, 16], "learning_rate": [1e-5, 3e-5]}, workers=2, threads_per_trial=1
+    )
+
+    table = sweep.run_sweep(cfg, trial_fn=fake_trial)
+
+    assert len(table) == 6
+    assert (table["status"] == "failed").sum() == 2
+    completed = table[table["status"] == "completed"]
+    assert list(completed["eval_loss"]) == sorted(completed["eval_loss"])
+    assert completed["cores"].nunique() <= 2 and all(completed["cores"] != "")
+    saved = pd.read_csv(tmp_path / "out" / "sweep" / "results.csv")
+    assert len(saved) == 6
+
+
+@pytest.mark.unit
+def test_shared_dataset_goes_through_token_cache(tmp_path, monkeypatch, fast_tokenizer):
+    """
+    Подготовка датасета перебора строит записи TokenCache, которые затем открывают испытания;
+    изменённый JSON токенизируется заново, а настройка dataset.binary не меняется.
+    """
+    import json
+
+    import src.utils.model_registry as registry
+    from src.token_cache import TokenCache
+
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: fast_tokenizer(["мама", "мыла"]))
+    data = tmp_path / "train.json"
+    data.write_text(json.dumps([{"category": "any", "text": "мама мыла"}]), encoding="utf-8")
+    cfg = base_cfg(tmp_path)
+    cfg.train_data_path = cfg.val_data_path = str(data)
+    cfg.dataset.cache_dir = str(tmp_path / "cache")
+
+    sweep.prepare_shared_dataset(cfg)
+    assert cfg.dataset.binary is False
+    assert TokenCache(cfg.dataset.cache_dir).index["misses"] == 1
+
+    data.write_text(json.dumps([{"category": "any", "text": "мама"}] * 2), encoding="utf-8")
+    sweep.prepare_shared_dataset(cfg)
+    index = TokenCache(cfg.dataset.cache_dir).index
+    assert index["misses"] == 2 and len(index["entries"]) == 2
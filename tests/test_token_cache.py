@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+import src.binary_dataset as bd
+import src.utils.model_registry as registry
+from src.dataset import TextDataset
+from src.token_cache import TokenCache
+
+WORDS = "мама мыла раму папа читал книгу".split()
+CATEGORIES = ["a", "b"]
+
+
+def write_dataset(path, n):
+    records = [{"category": "ab"[i % 2], "text": " ".join(WORDS[: 1 + i % len(WORDS)])} for i in range(n)]
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    """Считает реальные токенизации датасета (промахи кэша)."""
+    calls = []
+    original = bd.convert_json_to_binary
+
+    def counting(json_path, *args, **kwargs):
+        calls.append(json_path)
+        return original(json_path, *args, **kwargs)
+
+    monkeypatch.setattr("src.token_cache.convert_json_to_binary", counting)
+    return calls
+
+
+@pytest.mark.unit
+def test_cache_hits_and_invalidation(tmp_path, fast_tokenizer, conversions):
+    """
+    Повторный запрос того же датасета не токенизирует его заново;
+    изменение данных, max_length или токенизатора даёт новую запись.
+    """
+    tokenizer = fast_tokenizer(WORDS)
+    data = write_dataset(tmp_path / "train.json", 10)
+    cache = TokenCache(str(tmp_path / "cache"))
+
+    first = cache.get_or_build(data, tokenizer, CATEGORIES, 16)
+    assert cache.get_or_build(data, tokenizer, CATEGORIES, 16) == first
+    # новый экземпляр кэша (следующий запуск обучения) тоже попадает
+    again = TokenCache(str(tmp_path / "cache"))
+    assert again.get_or_build(data, tokenizer, CATEGORIES, 16) == first
+    assert len(conversions) == 1
+    assert again.index["hits"] == 2 and again.index["misses"] == 1
+
+    assert again.get_or_build(data, tokenizer, CATEGORIES, 8) != first
+    assert again.get_or_build(data, fast_tokenizer(WORDS + ["кот"]), CATEGORIES, 16) != first
+    write_dataset(tmp_path / "train.json", 12)
+    changed = again.get_or_build(data, tokenizer, CATEGORIES, 16)
+    assert changed != first
+    assert len(conversions) == 4
+    assert bd.BinaryDataset.open(changed).meta["num_examples"] == 12
+
+
+@pytest.mark.unit
+def test_cache_evicts_least_recently_used(tmp_path, fast_tokenizer, conversions):
+    """При превышении лимита удаляются давно не использовавшиеся записи, текущая — никогда."""
+    tokenizer = fast_tokenizer(WORDS)
+    paths = [write_dataset(tmp_path / f"part{i}.json", 50 + i) for i in range(3)]
+    probe = TokenCache(str(tmp_path / "probe"))
+    size = probe._dir_size(probe.get_or_build(paths[0], tokenizer, CATEGORIES, 16))
+
+    cache = TokenCache(str(tmp_path / "cache"), max_bytes=int(size * 2.5))
+    entries = [cache.get_or_build(p, tokenizer, CATEGORIES, 16) for p in paths[:2]]
+    cache.get_or_build(paths[0], tokenizer, CATEGORIES, 16)  # part0 становится самым свежим
+    newest = cache.get_or_build(paths[2], tokenizer, CATEGORIES, 16)
+
+    assert os.path.isdir(entries[0]) and os.path.isdir(newest)
+    assert not os.path.exists(entries[1])
+
+
+@pytest.mark.unit
+def test_text_dataset_uses_cache(tmp_path, monkeypatch, fast_tokenizer, conversions):
+    """TextDataset с включённым кэшем токенизирует JSON один раз на все запуски."""
+    tokenizer = fast_tokenizer(WORDS)
+    monkeypatch.setattr(registry.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    data = write_dataset(tmp_path / "train.json", 10)
+    config = {
+        "categories": {c: [] for c in CATEGORIES},
+        "dataset": {"cache": True, "cache_dir": str(tmp_path / "cache"), "cache_max_gb": 1},
+    }
+
+    cached = [TextDataset(data, config, "local", max_length=16) for _ in range(2)]
+    plain = TextDataset(data, {"categories": config["categories"]}, "local", max_length=16)
+    assert len(conversions) == 1
+    for i in range(len(plain)):
+        assert cached[1][i]["input_ids"].tolist() == plain[i]["input_ids"].tolist()
+        assert cached[1][i]["labels"] == plain[i]["labels"]
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+import torch
+from transformers import BertConfig, BertForSequenceClassification, Trainer, TrainingArguments
+
+from src.batching import PaddingCollator
+from src.training_metrics import ThroughputCallback
+
+
+class RandomDataset(torch.utils.data.Dataset):
+    def __init__(self, size=24):
+        generator = torch.Generator().manual_seed(0)
+        self.items = [
+            {"input_ids": torch.randint(5, 50, (int(n),), generator=generator), "labels": torch.tensor(i % 2)}
+            for i, n in enumerate(torch.randint(4, 16, (size,), generator=generator))
+        ]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, idx):
+        return self.items[idx]
+
+
+@pytest.mark.integration
+def test_throughput_callback_report(tmp_path):
+    """
+    Настоящий Trainer с маленьким BERT: отчёт содержит пропускную способность,
+    токены по счётчикам коллатора, фазы шага и перцентили; пишется JSON и textfile Prometheus.
+    """
+    model = BertForSequenceClassification(BertConfig(
+        vocab_size=50, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32
+    ))
+    collator = PaddingCollator()
+    callback = ThroughputCallback(
+        collator, report_path=str(tmp_path / "run_report.json"), prometheus_path=str(tmp_path / "training.prom")
+    )
+    args = TrainingArguments(
+        output_dir=str(tmp_path / "out"),
+        per_device_train_batch_size=4,
+        gradient_accumulation_steps=2,
+        num_train_epochs=1,
+        eval_strategy="steps",
+        eval_steps=2,
+        save_strategy="no",
+        report_to=[],
+        use_cpu=True,
+        disable_tqdm=True,
+    )
+    trainer = Trainer(
+        model=model, args=args, train_dataset=RandomDataset(), eval_dataset=RandomDataset(8),
+        data_collator=collator, callbacks=[callback],
+    )
+    trainer.train()
+
+    report = json.loads((tmp_path / "run_report.json").read_text(encoding="utf-8"))
+    assert report["steps"] == 3
+    assert report["examples"] == 24
+    assert 0 < report["real_tokens"] <= report["padded_tokens"]
+    assert report["samples_per_sec"] > 0 and report["peak_rss_mb"] > 0
+    assert len(callback.phase_times["forward_backward"]) == 3
+    assert len(callback.phase_times["data_wait"]) < 3  # шаг после оценки не считается ожиданием данных
+    assert report["step_ms"]["p50"] <= report["step_ms"]["p99"] <= report["step_ms"]["max"]
+
+    prom = (tmp_path / "training.prom").read_text(encoding="utf-8")
+    assert 'training_samples_per_second{run="train"}' in prom
+    assert 'training_phase_seconds{phase="forward_backward",run="train"}' in prom
+    assert 'training_step_latency_seconds{quantile="0.99",run="train"}' in prom
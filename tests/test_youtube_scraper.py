@@ -1,3 +1,4 @@
+import io
 import os
 import pytest
 import shutil
@@ -58,3 +59,68 @@ def test_download_subtitles(scraper, cfg):
 
     # чистим
     shutil.rmtree(cfg.subtitles_dir)
+
+
+class FakeResponse(io.BytesIO):
+    """Ответ-заглушка для ydl.urlopen."""
+
+
+class InMemoryYDL:
+    """
+    Заглушка yt_dlp.YoutubeDL для режима fetch_subtitles:
+    считает запросы к экстрактору и запрещает ydl.download.
+    """
+    extract_calls = 0
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        InMemoryYDL.extract_calls += 1
+        return {
+            "id": VIDEO_ID,
+            "subtitles": {},
+            "automatic_captions": {"ru": [
+                {"ext": "json3", "url": "http://subs/json3"},
+                {"ext": "vtt", "url": "http://subs/vtt"},
+            ]},
+        }
+
+    def urlopen(self, url):
+        assert url == "http://subs/vtt"
+        return FakeResponse("WEBVTT\n\n00:00:00.000 --> 00:00:00.500\nПривет".encode("utf-8"))
+
+    def download(self, urls):
+        raise AssertionError("fetch_subtitles не должен вызывать ydl.download")
+
+
+@pytest.mark.unit
+def test_fetch_subtitles_in_memory(tmp_path, monkeypatch):
+    """
+    Проверяем, что fetch_subtitles:
+      1) делает один запрос к экстрактору и не сканирует save_path,
+      2) возвращает VTT в памяти и помечает автоматическую дорожку,
+      3) пишет файл только при persist=True.
+    """
+    InMemoryYDL.extract_calls = 0
+    scraper = YouTubeScraper(save_path=str(tmp_path), ydl_factory=InMemoryYDL)
+    monkeypatch.setattr(os, "listdir", lambda *a: pytest.fail("save_path не должен сканироваться"))
+
+    track = scraper.fetch_subtitles(TEST_VIDEO_URL)
+    assert InMemoryYDL.extract_calls == 1
+    assert track.video_id == VIDEO_ID
+    assert track.automatic is True and track.lang == "ru"
+    assert track.text.endswith("Привет")
+    assert track.path is None
+    assert not (tmp_path / f"{VIDEO_ID}.vtt").exists()
+
+    persisted = scraper.fetch_subtitles(TEST_VIDEO_URL, persist=True)
+    assert persisted.path == os.path.join(str(tmp_path), f"{VIDEO_ID}.vtt")
+    with open(persisted.path, "rb") as f:
+        assert f.read() == persisted.data